@@ -0,0 +1,63 @@
+"""
+Measures the start-up cost of pybibget.
+
+Runs short invocations in fresh interpreters with -X importtime and reports the cumulative import time of the
+pybibget package as well as the heavy third-party modules loaded along the way. With --max-ms, exits with status 1
+if the median import time exceeds the given budget, so that start-up time cannot silently regress in CI.
+
+    python benchmarks/import_time.py [--runs 5] [--max-ms 50]
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+
+HEAVY_MODULES = ["httpx", "lxml", "pybtex", "pylatexenc", "appdirs", "aiolimiter", "asyncio", "sqlite3"]
+
+SCENARIOS = {
+    "import pybibget": "import pybibget",
+    "pybibget --help": "import sys, pybibget; sys.argv = ['pybibget', '--help']\ntry:\n    pybibget.pybibget()\nexcept SystemExit:\n    pass",
+}
+
+
+def measure(code):
+    """
+    Returns the cumulative import time of pybibget in microseconds and the set of modules imported by code.
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True, check=True)
+    total, modules = 0, set()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if not cumulative.strip().isdigit():
+            continue
+        name = name.strip()
+        modules.add(name.split(".")[0])
+        if name == "pybibget":
+            total = int(cumulative)
+    return total, modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the import time of pybibget")
+    parser.add_argument("--runs", type=int, default=5, help="number of runs per scenario (default: 5)")
+    parser.add_argument("--max-ms", type=float, help="fail if the median import time of a scenario exceeds this many milliseconds")
+    args = parser.parse_args()
+    failed = False
+    for scenario, code in SCENARIOS.items():
+        timings, heavy = [], set()
+        for _ in range(args.runs):
+            total, modules = measure(code)
+            timings.append(total / 1000)
+            heavy |= modules.intersection(HEAVY_MODULES)
+        median = statistics.median(timings)
+        print(f"{scenario:<20} median {median:7.1f} ms   min {min(timings):7.1f} ms   heavy modules: {', '.join(sorted(heavy)) or 'none'}")
+        if args.max_ms is not None and median > args.max_ms:
+            print(f"{scenario}: median import time {median:.1f} ms exceeds the budget of {args.max_ms:.1f} ms")
+            failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
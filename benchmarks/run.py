@@ -0,0 +1,161 @@
+"""
+Offline benchmarks of pybibget.
+
+Drives Bibget.citations (through Bibget.iter_citations), Bibget.update_all and sanitize_string against the local
+stand-ins of standins.py, so no network access is needed. For every scenario and size, reports throughput, per-key
+latency percentiles, the number of requests per host and peak memory (traced Python allocations).
+
+    python benchmarks/run.py [--sizes 10 100 1000 10000] [--latency 0.05] [--error-rate 0.01] [--throttle-rate 0.01]
+
+By default the per-host rate limits of pybibget are lifted, so that pybibget's own overhead is measured; pass
+--realistic-limits to keep them.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import logging
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from standins import StandinTransport, make_keys  # noqa: E402
+from pybibget.bibentry import Bibget, sanitize_string  # noqa: E402
+from pybtex.database import Entry, Person  # noqa: E402
+
+HOSTS = ["mathscinet.ams.org", "api.crossref.org", "api.elsevier.com", "export.arxiv.org", "arxiv.org", "pubmed.ncbi.nlm.nih.gov", "eutils.ncbi.nlm.nih.gov"]
+SANITIZE_POOL = ["Schröder, Dominik", "Erdős, Paul", "A mathematical theory of communication", "Über die Hypothesen, welche der Geometrie zu Grunde liegen",
+                 "Deep Residual Learning for Image Recognition", "Proceedings of the National Academy of Sciences", "Gödel, Kurt",
+                 "The large $N$ limit of superconformal field theories and supergravity", "Annales de l'Institut Fourier", "Poincaré, Henri"]
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else float("nan")
+
+
+def setup_config(realistic_limits, parse_pool="inline"):
+    """
+    Points pybibget to a temporary data directory with a benchmark config.json.
+    """
+    data_dir = tempfile.mkdtemp(prefix="pybibget-bench-")
+    os.environ["XDG_DATA_HOME"] = data_dir
+    os.makedirs(os.path.join(data_dir, "pybibget"))
+    config = {"scopus_api_key": "benchmark", "scopus_rate_limit": 6, "parse_pool": parse_pool}
+    if not realistic_limits:
+        config["hosts"] = {host: {"rate": 1e6, "concurrency": 1000} for host in HOSTS}
+    with open(os.path.join(data_dir, "pybibget", "config.json"), "w") as file:
+        json.dump(config, file)
+
+
+async def bench_citations(n, transport):
+    latencies = []
+    async with Bibget(transport=transport, cache=False) as bibget:
+        start = time.perf_counter()
+        async for _ in bibget.iter_citations(make_keys(n)):
+            latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+async def bench_update(n, transport):
+    bibliography = {}
+    for i in range(n):
+        fields = {"title": f"Benchmark title {i}", "journal": "Journal of Benchmarks", "year": "2020"}
+        if i % 3:
+            fields["doi"] = f"10.5555/bench.{i}"
+        entry = Entry("article", fields=fields, persons={"author": [Person("Doe, Jane")]})
+        entry.key = f"entry{i}"
+        bibliography[entry.key] = entry
+    latencies = []
+    async with Bibget(transport=transport, cache=False) as bibget:
+        find_candidate = bibget.find_candidate
+
+        async def timed_find_candidate(entry):
+            start = time.perf_counter()
+            try:
+                return await find_candidate(entry)
+            finally:
+                latencies.append(time.perf_counter() - start)
+
+        bibget.find_candidate = timed_find_candidate
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            await bibget.update_all(bibliography, mode="report")
+    return latencies
+
+
+def bench_sanitize(n, _transport):
+    rng = random.Random(0)
+    pool = [f"{string} {i}" for i in range(max(1, n // 20)) for string in SANITIZE_POOL]
+    strings = [rng.choice(pool) for _ in range(n)]
+    sanitize_string.cache_clear()
+    latencies = []
+    for string in strings:
+        start = time.perf_counter()
+        sanitize_string(string, title=True)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+SCENARIOS = {"citations": bench_citations, "update": bench_update, "sanitize": bench_sanitize}
+
+
+def run(scenario, n, args):
+    transport = StandinTransport(latency=args.latency, error_rate=args.error_rate, throttle_rate=args.throttle_rate)
+    if args.memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    result = SCENARIOS[scenario](n, transport)
+    latencies = asyncio.run(result) if asyncio.iscoroutine(result) else result
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] if args.memory else None
+    tracemalloc.stop()
+    return {
+        "scenario": scenario,
+        "keys": n,
+        "completed": len(latencies),
+        "seconds": elapsed,
+        "keys_per_second": n / elapsed,
+        "p50_ms": percentile(latencies, 0.5) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "requests": sum(transport.requests.values()),
+        "requests_per_host": dict(transport.requests),
+        "responses": {str(status): count for status, count in transport.responses.items()},
+        "peak_memory_mb": peak / 2**20 if peak is not None else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmarks of pybibget")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 10000], help="numbers of keys (default: 10 100 1000 10000)")
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS), help="scenarios to run (default: all)")
+    parser.add_argument("--latency", type=float, default=0.0, help="mean simulated response time in seconds (default: 0)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 500 (default: 0)")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="fraction of requests answered with 429 (default: 0)")
+    parser.add_argument("--realistic-limits", action="store_true", help="keep the per-host rate limits of pybibget")
+    parser.add_argument("--parse-pool", choices=["inline", "thread", "process"], default="inline", help="where responses are parsed (default: inline)")
+    parser.add_argument("--no-memory", dest="memory", action="store_false", help="do not trace memory allocations (they slow down the benchmarks)")
+    parser.add_argument("--json", metavar="FILE", help="also write the results to FILE")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.CRITICAL)
+    setup_config(args.realistic_limits, args.parse_pool)
+
+    results = []
+    print(f"{'scenario':<10} {'keys':>6} {'found':>6} {'keys/s':>10} {'p50 ms':>9} {'p99 ms':>9} {'requests':>9} {'peak MB':>8}")
+    for scenario in args.scenarios:
+        for n in args.sizes:
+            result = run(scenario, n, args)
+            results.append(result)
+            peak = f"{result['peak_memory_mb']:8.1f}" if result["peak_memory_mb"] is not None else f"{'-':>8}"
+            print(f"{scenario:<10} {n:>6} {result['completed']:>6} {result['keys_per_second']:>10.1f} {result['p50_ms']:>9.2f} {result['p99_ms']:>9.2f} {result['requests']:>9} {peak}", flush=True)
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
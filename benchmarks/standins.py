@@ -0,0 +1,137 @@
+"""
+Local stand-ins for the services queried by pybibget.
+
+StandinTransport is an httpx transport answering requests to MathSciNet, Crossref, Scopus, arXiv and PubMed from the
+recorded responses in benchmarks/fixtures, so that Bibget can be driven without network access. Latency, server errors
+and rate limiting (429) can be simulated.
+
+Which identifiers exist where is derived deterministically from the number in the identifier, see make_keys():
+  - MR numbers are found on MathSciNet, DOIs only if their number is divisible by 3
+  - DOIs with number = 1 (mod 3) are found on Scopus, all others on Crossref
+  - every fourth arXiv identifier has a DOI, the others are preprints
+  - all PubMed IDs are found, on Scopus and on PubMed (E-utilities and website)
+"""
+import asyncio
+import json
+import os
+import random
+import re
+from collections import Counter
+from string import Template
+import httpx
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def fixture(name):
+    with open(os.path.join(FIXTURES, name), encoding="utf-8") as file:
+        return Template(file.read())
+
+
+def number(identifier):
+    """
+    The (last) number in an identifier, which determines how the stand-ins answer.
+    """
+    return int(re.findall(r"\d+", identifier)[-1])
+
+
+def make_keys(n):
+    """
+    n distinct citation keys: 30% DOIs, 25% MR numbers, 30% arXiv identifiers and 15% PubMed IDs.
+    """
+    kinds = ["doi"] * 6 + ["mr"] * 5 + ["arxiv"] * 6 + ["pmid"] * 3
+    keys = []
+    for i in range(n):
+        kind = kinds[i % len(kinds)]
+        if kind == "doi":
+            keys.append(f"10.5555/bench.{i}")
+        elif kind == "mr":
+            keys.append(f"MR{1000000 + i}")
+        elif kind == "arxiv":
+            keys.append(f"{2101 + i // 90000}.{i % 90000 + 10000:05d}")
+        else:
+            keys.append(f"PMID:{10000000 + i}")
+    return keys
+
+
+class StandinTransport(httpx.AsyncBaseTransport):
+    """
+    httpx transport serving recorded responses of all backends.
+
+    Parameters
+    ----------
+    latency : float, optional
+        Mean response time in seconds (uniformly distributed between 0.5 and 1.5 times latency). The default is 0.
+    error_rate : float, optional
+        Fraction of requests answered with 500. The default is 0.
+    throttle_rate : float, optional
+        Fraction of requests answered with 429 and "Retry-After: 0". The default is 0.
+    seed : int, optional
+        Seed of the random number generator. The default is 0.
+    """
+    def __init__(self, latency=0.0, error_rate=0.0, throttle_rate=0.0, seed=0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.random = random.Random(seed)
+        self.requests = Counter()
+        self.responses = Counter()
+        self.templates = {name: fixture(name) for name in os.listdir(FIXTURES)}
+
+    async def handle_async_request(self, request):
+        self.requests[request.url.host] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency * self.random.uniform(0.5, 1.5))
+        dice = self.random.random()
+        if dice < self.throttle_rate:
+            response = httpx.Response(429, headers={"Retry-After": "0"})
+        elif dice < self.throttle_rate + self.error_rate:
+            response = httpx.Response(500)
+        else:
+            response = self.route(request)
+        self.responses[response.status_code] += 1
+        return response
+
+    def render(self, name, status_code=200, **fields):
+        return httpx.Response(status_code, text=self.templates[name].substitute(**fields))
+
+    def route(self, request):
+        host, url = request.url.host, request.url
+        if host == "mathscinet.ams.org":
+            query = url.params["s1"]
+            if url.params["pg1"] == "MR":
+                return self.render("mathscinet.html", number=query, n=number(query), doi=f"10.5555/msc.{query}")
+            if number(query) % 3 == 0:
+                return self.render("mathscinet.html", number=f"{number(query):07d}", n=number(query), doi=query)
+            return self.render("mathscinet_empty.html", query=query)
+        if host == "api.crossref.org":
+            if url.path == "/works":
+                dois = [doi[4:] for doi in url.params["filter"].split(",")]
+                items = [json.loads(self.templates["crossref_item.json"].substitute(doi=doi, n=number(doi))) for doi in dois]
+                return httpx.Response(200, json={"status": "ok", "message": {"items": items, "total-results": len(items), "next-cursor": "end"}})
+            doi = url.path.split("/works/", 1)[1].rsplit("/transform", 1)[0]
+            return self.render("crossref.bib", doi=doi, n=number(doi))
+        if host == "api.elsevier.com":
+            if "/search/" in url.path:
+                title = url.params["query"]
+                return self.render("scopus_search.json", title=json.dumps(title)[1:-1], doi=f"10.5555/bench.{3 * (number(title) // 3)}")
+            identifier = url.path.rsplit("/", 1)[1]
+            if "pubmed_id" in url.path:
+                return self.render("scopus_abstract.json", doi=f"10.5555/pubmed.{identifier}", pmid=identifier, n=number(identifier))
+            if number(identifier) % 3 == 1:
+                return self.render("scopus_abstract.json", doi=identifier, pmid="", n=number(identifier))
+            return self.render("scopus_error.json", status_code=404)
+        if host == "export.arxiv.org":
+            ids = url.params["id_list"].split(",")
+            entries = "".join(self.templates["arxiv_entry.xml"].substitute(arxiv_id=arxiv_id + "v1", n=number(arxiv_id),
+                doi=f"\n    <arxiv:doi>10.5555/arxiv.{arxiv_id}</arxiv:doi>" if number(arxiv_id) % 4 == 0 else "") for arxiv_id in ids)
+            return self.render("arxiv_feed.xml", id_list=",".join(ids), total=len(ids), entries=entries)
+        if host == "eutils.ncbi.nlm.nih.gov":
+            pmids = url.params["id"].split(",")
+            result = {pmid: {"uid": pmid, "articleids": [{"idtype": "pubmed", "value": pmid}, {"idtype": "doi", "value": f"10.5555/pubmed.{pmid}"}]}
+                      for pmid in pmids}
+            return httpx.Response(200, json={"result": {"uids": pmids, **result}})
+        if host == "pubmed.ncbi.nlm.nih.gov":
+            pmid = url.path.strip("/")
+            return self.render("pubmed.txt", pmid=pmid, doi=f"10.5555/pubmed.{pmid}")
+        return httpx.Response(404)
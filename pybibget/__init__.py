@@ -1,29 +1,77 @@
 import argparse
-import asyncio
-import re
+import os
 import sys
 import logging as log
 log.getLogger('asyncio').setLevel(log.WARNING)
-from pybibget.bibentry import Bibget
-from pybtex.database import parse_string
+from pybibget.keys import read_keys
+
+# The backends (pybibget.bibentry) import httpx, lxml, pybtex and pylatexenc, which takes a significant fraction of the
+# run time of short invocations. They are therefore only imported once they are needed.
+def __getattr__(name):
+    if name == "Bibget":
+        from pybibget.bibentry import Bibget
+        return Bibget
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 def add_optional_args(parser):
     parser.add_argument('-v', '--verbose', action='store_true', help='verbose output')
     parser.add_argument('-d', '--debug', action='store_true', help='debug output')
     parser.add_argument('--skip-doi-msc', action='store_true', help='skip MathSciNet lookup for DOIs')
-    
+    parser.add_argument('--no-cache', action='store_true', help='neither read nor write the lookup cache')
+    parser.add_argument('--refresh', action='store_true', help='ignore cached lookups and refresh them from the network')
+    parser.add_argument('--offline', action='store_true', help='never connect to the network, only use the local metadata store (see pybibget import) and the lookup cache')
+    parser.add_argument('--stats', action='store_true', help='print statistics per backend and host (lookups, cache hits, fallbacks, timings) to stderr')
+    parser.add_argument('--trace', action='store', metavar='trace.json', help='write a trace of all lookups and requests to a file (OTLP/JSON format)')
+    hedge = parser.add_mutually_exclusive_group()
+    hedge.add_argument('--race', action='store_const', dest='hedge', const=0, help='query MathSciNet, Scopus and Crossref for DOIs at the same time (the result of the first one in this order that finds the DOI is used)')
+    hedge.add_argument('--hedge', action='store', dest='hedge', type=float, metavar='SECONDS', help='query the next backend for a DOI if the previous one did not answer within SECONDS')
+
+
+def bibget_options(args):
+    """
+    Returns the Bibget keyword arguments corresponding to the optional command line arguments
+    """
+    options = {'cache': not args.no_cache, 'refresh': args.refresh, 'hedge': args.hedge, 'offline': args.offline}
+    if args.stats or args.trace:
+        if getattr(args, 'tracer', None) is None:
+            from pybibget.trace import Tracer
+            args.tracer = Tracer()
+        options['tracer'] = args.tracer
+    return options
+
+
+def report_trace(args):
+    """
+    Prints the statistics (--stats) and writes the trace file (--trace) of a run
+    """
+    tracer = getattr(args, 'tracer', None)
+    if tracer is None:
+        return
+    if args.stats:
+        tracer.print_stats(file=sys.stderr)
+    if args.trace:
+        tracer.export(args.trace)
+        print(f"Wrote trace to {args.trace}.", file=sys.stderr)
+
 
 def pybibget():
     """
     Reads citation keys from command line and calls get_citations()
     """
+    if sys.argv[1:2] == ['serve']:
+        return pybibget_serve()
+    if sys.argv[1:2] == ['import']:
+        return pybibget_import()
     parser = argparse.ArgumentParser(prog='pybibget', description='Command line utility to automatically retrieve BibTeX citations from MathSciNet, arXiv and PubMed')
     parser.add_argument('keys', type=str, metavar='citekeys', nargs='*', help='MathSciNet (MRxxxxx), arXiv (xxxx.xxxxx), PubMed (PMID:xxxxxxxx) or DOI (10.xxx/xxxxx) citation keys (separated by spaces)')
     parser.add_argument('-w', action='store', dest='file_name', help='Append output to file (default: write output to stdout)')
-    parser.add_argument('-arxiv', action='store', dest='arxiv_author', help='Get all articles from an arXiv public author identifier (e.g. arxiv.org/a/last_f_1)')
+    parser.add_argument('-i', '--input', action='store', dest='input_file', help='Read additional citation keys from a file ("-" for stdin), separated by whitespace, commas or newlines')
+    parser.add_argument('-arxiv', action='store', dest='arxiv_authors', nargs='+', metavar='AUTHOR_ID', help='Get all articles from one or more arXiv public author identifiers (e.g. arxiv.org/a/last_f_1)')
+    parser.add_argument('--stream', action='store_true', help='write each entry as soon as it is found')
+    parser.add_argument('--no-daemon', action='store_true', help='look up citations in this process even if a daemon (pybibget serve) is running')
     add_optional_args(parser)
     args = parser.parse_args()
-    kwargs = {'file': args.file_name }
+    kwargs = {'file': args.file_name, 'stream': args.stream, 'arxiv_authors': args.arxiv_authors or [], 'daemon': not args.no_daemon, **bibget_options(args)}
     if args.debug:
         kwargs['verbose'] = log.DEBUG
     elif args.verbose:
@@ -31,60 +79,158 @@ def pybibget():
     keys = []
     if args.keys:
         keys += args.keys
-    if args.arxiv_author:
-        bibget = Bibget(mathscinet=True)
-        keys += asyncio.run(bibget.arxiv_list(args.arxiv_author))
-    if not keys:
+    if args.input_file:
+        keys += read_keys(args.input_file)
+    if not keys and not args.arxiv_authors:
         parser.print_help()
         exit(1)
 
     get_citations(keys, **kwargs)
+    report_trace(args)
+
+
+def pybibget_serve():
+    """
+    Runs the daemon (pybibget serve), see pybibget.server
+    """
+    parser = argparse.ArgumentParser(prog='pybibget serve', description='Keep a warm resolver running for pybibget and pybibparse, which forward their lookups to it')
+    parser.add_argument('--socket', action='store', metavar='PATH', help='Unix socket to listen on (default: $PYBIBGET_SOCKET, or pybibget.sock in $XDG_RUNTIME_DIR)')
+    parser.add_argument('--stop', action='store_true', help='stop the running daemon')
+    add_optional_args(parser)
+    args = parser.parse_args(sys.argv[2:])
+    if args.debug:
+        log.basicConfig(format="%(levelname)s: %(message)s", level=log.DEBUG)
+    else:
+        log.basicConfig(format="%(levelname)s: %(message)s", level=log.INFO)
+    if args.stop:
+        from pybibget.client import DaemonClient
+        try:
+            with DaemonClient(args.socket) as client:
+                client.shutdown()
+        except OSError as exc:
+            print(f"No pybibget daemon running ({exc})", file=sys.stderr)
+            sys.exit(1)
+        return
+    from pybibget.server import serve
+    serve(args.socket, **bibget_options(args))
+    report_trace(args)
 
 
 def pybibparse():
     """
-    Reads latex file name from the command line, parses the .blg file and calls get_citations()
+    Reads latex file names from the command line, parses their .blg files and calls get_citations() (or
+    get_project_citations() for several documents)
     """
     parser = argparse.ArgumentParser(prog='pybibget', description='Command line utility to automatically retrieve BibTeX citations from MathSciNet, arXiv and PubMed')
-    parser.add_argument('file_name', type=str, metavar='tex_file(.tex)', nargs=1, help='LaTeX file to be parsed for missing citations')
+    parser.add_argument('file_name', type=str, metavar='tex_file(.tex)', nargs='+', help='LaTeX files to be parsed for missing citations, or directories (searched for .blg files) or glob patterns such as "papers/*/*.tex"')
     parser.add_argument('-w', action='store', dest='write', metavar="output.bib", nargs='?', const=" ", help='Append output to file (default: write output to stdout). A bib file name can be specified via "-w file_name.bib" but usually the .bib file is found automatically.')
+    parser.add_argument('--stream', action='store_true', help='write each entry as soon as it is found')
+    parser.add_argument('--no-daemon', action='store_true', help='look up citations in this process even if a daemon (pybibget serve) is running')
+    parser.add_argument('--watch', action='store_true', help='keep running, and look up citations as soon as they are reported missing by a new run of bibtex/biber')
+    parser.add_argument('--interval', action='store', type=float, default=1.0, metavar='SECONDS', help='with --watch, check for changes every SECONDS if inotify (pip install inotify_simple) is not available (default: 1)')
     add_optional_args(parser)
     args = parser.parse_args()
     if not args.file_name:
         parser.print_help()
         sys.exit()
-    if args.file_name[0].endswith(".tex"):
-        base_file_name = args.file_name[0][:-4]
-    else:
-        base_file_name = args.file_name[0]
-
-    with open(base_file_name+".blg") as file:
-        blg_file = file.read()
-    missing_cites = re.findall(r"I didn't find a database entry for '([A-Za-z0-9\.\-_ :\/]*)'", blg_file) \
-        + re.findall(r'I didn\'t find a database entry for "([A-Za-z0-9\.\-_ :\/]*)"', blg_file)
-    bib_file_names = re.findall(r"Found BibTeX data source '([A-Za-z0-9.\-_\/]*)'", blg_file) \
-        + re.findall(r"Looking for bibtex file '([A-Za-z0-9.\-_\/]*)'", blg_file) \
-        + re.findall(r'Database file #\d: ([A-Za-z0-9.\-_\/]*)\n', blg_file) \
-        + re.findall(r'I couldn\'t open database file ([A-Za-z0-9.\-_\/]*)\n', blg_file)
-
-    if missing_cites:
-        kwargs = {}
-        if args.debug:
-            kwargs['verbose'] = log.DEBUG
-        elif args.verbose:
-            kwargs['verbose'] = log.INFO
+    from pybibget.blg import find_documents, scan_blg, resolve_bib_file
+    documents = find_documents(args.file_name)
+    if not documents:
+        print("No documents found.")
+        sys.exit(1)
+
+    kwargs = {'daemon': not args.no_daemon, **bibget_options(args)}
+    if args.debug:
+        kwargs['verbose'] = log.DEBUG
+    elif args.verbose:
+        kwargs['verbose'] = log.INFO
+
+    if args.watch:
+        if len(documents) > 1:
+            print("--watch follows a single document.")
+            sys.exit(1)
+        import asyncio
+        from pybibget.watch import watch
+        log.basicConfig(format="%(levelname)s: %(message)s", level=log.DEBUG if args.debug else log.INFO)
+        file = None if not args.write else "auto" if args.write == " " else args.write
+        print(f"Watching {documents[0]}.blg for missing citations. Press Ctrl-C to stop.", file=sys.stderr)
+        try:
+            asyncio.run(watch(documents[0], file=file, interval=args.interval, **bibget_options(args)))
+        except KeyboardInterrupt:
+            pass
+        report_trace(args)
+        return
+
+    if len(documents) == 1:
+        with open(documents[0]+".blg") as file:
+            missing_cites, bib_file_names = scan_blg(file.read())
+        if not missing_cites:
+            print("No missing citations found. Make sure that biber/bibtex is run successfully before running pybibget.")
+            return
         if args.write:
             if args.write == " " and not bib_file_names:
                 print("No .bib file found. Please specify the .bib file via '-w file_name.bib'")
                 sys.exit()
-            kwargs['file'] = bib_file_names[0] if args.write == " " else args.write
-        get_citations(missing_cites, **kwargs)        
-    else:
+            kwargs['file'] = resolve_bib_file(bib_file_names[0], documents[0]+".blg") if args.write == " " else args.write
+        get_citations(missing_cites, stream=args.stream, **kwargs)
+        report_trace(args)
+        return
+
+    # all .blg files are scanned concurrently, and each missing key is looked up once for all documents
+    from concurrent.futures import ThreadPoolExecutor
+    def scan(document):
+        try:
+            with open(document+".blg") as file:
+                return scan_blg(file.read())
+        except OSError as exc:
+            log.warning(f"{document}: Skipping, could not read the .blg file ({exc})")
+            return [], []
+    with ThreadPoolExecutor() as pool:
+        scans = list(pool.map(scan, documents))
+    projects = {}
+    for document, (missing_cites, bib_file_names) in zip(documents, scans):
+        if not missing_cites:
+            continue
+        if args.write == " ":
+            if not bib_file_names:
+                print(f"{document}: No .bib file found, skipping {len(missing_cites)} missing citations.")
+                continue
+            file = resolve_bib_file(bib_file_names[0], document+".blg")
+        else:
+            file = args.write
+        projects.setdefault(file, []).extend(missing_cites)
+    if not projects:
         print("No missing citations found. Make sure that biber/bibtex is run successfully before running pybibget.")
+        return
+    get_project_citations(projects, stream=args.stream, **kwargs)
+    report_trace(args)
+
+def pybibget_import():
+    """
+    Imports metadata dumps into the local metadata store (pybibget import), see pybibget.store
+    """
+    parser = argparse.ArgumentParser(prog='pybibget import', description='Import metadata dumps into the local metadata store, which answers lookups before the network (and alone with --offline)')
+    parser.add_argument('file_names', type=str, metavar='DUMP', nargs='+', help='.bib files, JSON lines of Crossref works, the arXiv metadata snapshot (JSON lines) or arXiv OAI-PMH XML, optionally compressed with gzip (.gz)')
+    parser.add_argument('--format', action='store', choices=['bib', 'crossref', 'arxiv'], help='format of the dumps (default: detected from the file name and first line)')
+    parser.add_argument('--workers', action='store', type=int, metavar='N', help='number of processes converting records (default: number of CPUs)')
+    parser.add_argument('-v', '--verbose', action='store_true', help='verbose output')
+    parser.add_argument('-d', '--debug', action='store_true', help='debug output')
+    args = parser.parse_args(sys.argv[2:])
+    log.basicConfig(format="%(levelname)s: %(message)s", level=log.DEBUG if args.debug else log.INFO if args.verbose else log.WARNING)
+    import asyncio
+    for file_name, (number_of_records, failures) in zip(args.file_names, asyncio.run(import_metadata(args.file_names, format=args.format, workers=args.workers))):
+        print(f"Imported {number_of_records} records from {file_name}" + (f", skipped {failures} malformed records." if failures else "."))
+
 
 def pybibupdate():
     parser = argparse.ArgumentParser(prog='pybibget', description='Command line utility to update BibTeX citations from MathSciNet and Scopus')
     parser.add_argument('file_name', type=str, metavar='bib_file(.bib)', help='bib file to be parsed for citations')
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--accept-all', action='store_const', dest='mode', const='accept', default='interactive', help='replace all entries for which an update is found without asking')
+    mode.add_argument('--report', action='store_const', dest='mode', const='report', help='only print the updates found, without modifying the bib file')
+    parser.add_argument('--max-age', action='store', type=float, default=90, metavar='DAYS', help='check entries again which were last checked more than DAYS ago, even if unchanged (default: 90)')
+    parser.add_argument('--full', action='store_true', help='check all entries, including those which are unchanged since the last run')
+    parser.add_argument('--titles', action='append', default=[], metavar='BIB_FILE', help='add the entries of BIB_FILE to the local title index, which is searched before Scopus (can be repeated)')
     add_optional_args(parser)
     args = parser.parse_args()
     if args.debug:
@@ -98,25 +244,166 @@ def pybibupdate():
         sys.exit()
     if not args.file_name.endswith(".bib"):
         args.file_name += ".bib"
-    with open(args.file_name) as file:
-        bib_file = file.read()
-    bibliography = parse_string(bib_file, 'bibtex').entries
+    import asyncio
+    from pybibget.bibfile import BibFile
+    from pybibget.state import UpdateState, state_file_name
+    state = UpdateState(state_file_name(args.file_name), max_age=0 if args.full else args.max_age)
+
+    # only the entries to be checked are parsed, and only replaced entries are rewritten
+    with BibFile(args.file_name) as bib_file:
+        updates = asyncio.run(update_file(bib_file, mode=args.mode, state=state, title_files=args.titles, **bibget_options(args)))
+        report_trace(args)
+        if args.mode == 'report':
+            return
+        replacements = {key: entry for key, (entry, decision) in updates.items() if decision == 'replaced'}
+        if replacements:
+            bib_file.write(replacements)
+            print(f"Replaced {len(replacements)} entries in {args.file_name}.")
+        else:
+            print(f"No changes to {args.file_name}.")
+    state.save()
+
+def with_arxiv_authors(bibget, keys, arxiv_authors, index=None):
+    """
+    The citation keys, followed by the arXiv identifiers of the articles of arxiv_authors as they arrive (see
+    Bibget.iter_arxiv_list()) as async iterable. Identifiers which index (a pybibget.bibfile.BibIndex) answers are skipped.
+    """
+    if not arxiv_authors:
+        return keys
+    from pybibget.keys import group_keys
+    bibget.check_scopus(group_keys(keys))
+
+    async def all_keys():
+        for key in keys:
+            yield key
+        async for key in bibget.iter_arxiv_list(arxiv_authors):
+            if index is not None and index.lookup(key) is not None:
+                log.info(f"{key}: Already in the bib file")
+                continue
+            yield key
+    return all_keys()
+
+async def citations(keys, arxiv_authors=(), index=None, **options):
+    from pybibget.bibentry import Bibget
+    async with Bibget(mathscinet=True, **options) as bibget:
+        return await bibget.citations(with_arxiv_authors(bibget, keys, arxiv_authors, index))
+
+async def update_file(bib_file, mode='interactive', state=None, title_files=(), **options):
+    from pybibget.bibentry import Bibget
+    async with Bibget(mathscinet=True, **options) as bibget:
+        for title_file in title_files:
+            print(f"Indexed {bibget.import_titles(title_file)} titles from {title_file}", file=sys.stderr)
+        return await bibget.update_file(bib_file, mode=mode, state=state)
+
+async def import_metadata(file_names, format=None, workers=None):
+    from pybibget.bibentry import Bibget
+    async with Bibget(cache=False) as bibget:
+        return [bibget.import_metadata(file_name, format=format, workers=workers) for file_name in file_names]
 
-    bibget = Bibget(mathscinet=True)
-    updated_bibliography = asyncio.run(bibget.update_all(bibliography))
-    with open(args.file_name, 'w') as file:
-        file.write(updated_bibliography.to_string('bibtex'))
-        print(f"Wrote the updated bibliography to {args.file_name}.")
+async def stream_citations(keys, file=None, arxiv_authors=(), index=None, **options):
+    """
+    Writes BibTeX entries to file (appending) or stdout as soon as they are found. Returns the number of entries written.
+    """
+    from pybibget.bibentry import Bibget, entry_to_string
+    number_of_entries = 0
+    obj = open(file, 'a') if file else sys.stdout
+    try:
+        async with Bibget(mathscinet=True, **options) as bibget:
+            async for key, entry in bibget.iter_citations(with_arxiv_authors(bibget, keys, arxiv_authors, index)):
+                obj.write("\n" + entry_to_string(entry, key))
+                obj.flush()
+                if file:
+                    os.fsync(obj.fileno())
+                number_of_entries += 1
+    finally:
+        if file:
+            obj.close()
+    return number_of_entries
+
+def local_citations(keys, file):
+    """
+    Answers citation keys from an existing .bib file, using its identifier index (see pybibget.bibfile.BibIndex).
+    Keys which the file already contains are dropped, and keys whose DOI, arXiv identifier, MR number or PubMed ID
+    appears in an entry of the file are answered by a copy of that entry.
+    Returns the remaining keys and a dictionary {key: bibentry} of the answered ones.
+    """
+    from pybibget.bibfile import BibIndex, BibFile
+    index = BibIndex.load(file)
+    remaining, aliases, present = [], {}, 0
+    for key in keys:
+        existing = index.lookup(key)
+        if existing is None:
+            remaining.append(key)
+        elif existing.lower() == key.lower():
+            present += 1
+        else:
+            aliases[key] = existing
+    if present:
+        log.info(f"Skipping {present} citation keys which are already in {file}")
+    if not aliases:
+        return remaining, {}
+    with BibFile(file) as bib_file:
+        entries = {key: bib_file.entry(existing) for key, existing in aliases.items()}
+    for key, existing in aliases.items():
+        log.info(f"{key}: Copying entry {existing} with the same identifier from {file}")
+    return remaining, entries
+
+def daemon_compatible(options):
+    """
+    Whether lookups with the given Bibget options can be forwarded to a daemon: not for fresh, uncached, offline, hedged or traced lookups
+    """
+    return options.get('cache', True) and not options.get('refresh') and not options.get('offline') and options.get('hedge') is None and options.get('tracer') is None
 
-def get_citations(keys, verbose=log.WARNING, file=None):
+def get_citations(keys, verbose=log.WARNING, file=None, stream=False, arxiv_authors=(), daemon=True, **options):
     """
-    Retrieves BibTeX entries for given citation keys and writes them to file or stdout
+    Retrieves BibTeX entries for given citation keys and writes them to file or stdout.
+    With stream=True, each entry is written as soon as it is found. Further keyword arguments are passed to Bibget.
+    If file exists, keys which are already answered by it are not looked up, see local_citations().
+    The articles of the arXiv public author identifiers arxiv_authors are looked up while their feeds are downloaded,
+    except those already in file.
+    If daemon is True and a daemon (pybibget serve) is running, the lookups are forwarded to it, see daemon_compatible().
     """
     log.basicConfig(format="%(levelname)s: %(message)s", level=verbose)
 
-    bibget = Bibget(mathscinet=True)
-    bib_data = asyncio.run(bibget.citations(keys))
-    number_of_entries = len(bib_data.entries)
+    local = {}
+    if file and os.path.exists(file) and arxiv_authors:
+        from pybibget.bibfile import BibIndex
+        options['index'] = BibIndex.load(file)
+    if file and os.path.exists(file):
+        keys, local = local_citations(keys, file)
+        if local:
+            from pybibget.bibentry import entry_to_string
+            with open(file, 'a') as obj:
+                for key, entry in local.items():
+                    obj.write("\n" + entry_to_string(entry, key))
+        if not keys and not arxiv_authors:
+            print(f"Successfully appended {len(local)} BibTeX entries to {file}, no lookups needed.")
+            return len(local)
+
+    if daemon and daemon_compatible(options):
+        from pybibget.client import daemon_citations
+        number_of_entries = daemon_citations(keys, file=file, stream=stream, arxiv_authors=arxiv_authors)
+        if number_of_entries is not None:
+            number_of_entries += len(local)
+            if file:
+                print(f"Successfully appended {number_of_entries} BibTeX entries to {file}.")
+            elif stream:
+                print(f"\nFound {number_of_entries} BibTeX entries.", file=sys.stderr)
+            return number_of_entries
+
+    import asyncio
+    if stream:
+        number_of_entries = len(local) + asyncio.run(stream_citations(keys, file=file, arxiv_authors=arxiv_authors, **options))
+        if file:
+            print(f"Successfully appended {number_of_entries} BibTeX entries to {file}.")
+        elif arxiv_authors:
+            print(f"\nFound {number_of_entries} BibTeX entries.", file=sys.stderr)
+        else:
+            print(f"\nFound {number_of_entries} of {len(keys)} BibTeX entries.", file=sys.stderr)
+        return number_of_entries
+
+    bib_data = asyncio.run(citations(keys, arxiv_authors=arxiv_authors, **options))
+    number_of_entries = len(local) + len(bib_data.entries)
     bib_data = bib_data.to_string('bibtex')
     if file:
         with open(file, 'a') as obj:
@@ -127,5 +414,94 @@ def get_citations(keys, verbose=log.WARNING, file=None):
     return number_of_entries
 
 
+def get_project_citations(projects, verbose=log.WARNING, stream=False, daemon=True, **options):
+    """
+    Retrieves BibTeX entries for the missing citation keys of several documents in a single pass, and appends the
+    entries to the .bib file of every document citing them, once all are found (or each as soon as it is found, with
+    stream=True).
+    projects is a dictionary mapping .bib file names (None for stdout) to the citation keys missing for them. Keys
+    which a .bib file already answers are handled by local_citations(), keys cited by several documents (up to
+    normalization) are looked up once. Lookups are forwarded to a running daemon as in get_citations().
+    Returns a dictionary mapping the .bib file names to the number of entries appended.
+    """
+    log.basicConfig(format="%(levelname)s: %(message)s", level=verbose)
+    counts = {file: 0 for file in projects}
+    files = {}
+    pending = {}  # .bib file -> entries not written yet (without stream)
+    wanted = {}  # citation key (as cited) -> .bib files
+
+    def flush(file, text):
+        if file is None:
+            sys.stdout.write(text)
+            sys.stdout.flush()
+        else:
+            if file not in files:
+                files[file] = open(file, 'a')
+            files[file].write(text)
+            files[file].flush()
+
+    def write(file, key, bibtex):
+        if stream:
+            flush(file, "\n" + bibtex)
+        else:
+            pending.setdefault(file, []).append("\n" + bibtex)
+        counts[file] += 1
+
+    def fan_out(key, bibtex):
+        for file in wanted.get(key, []):
+            write(file, key, bibtex)
+
+    try:
+        for file, keys in projects.items():
+            if file and os.path.exists(file):
+                keys, local = local_citations(keys, file)
+                if local:
+                    from pybibget.bibentry import entry_to_string
+                    for key, entry in local.items():
+                        write(file, key, entry_to_string(entry, key))
+            for key in keys:
+                targets = wanted.setdefault(key.strip(), [])
+                if file not in targets:
+                    targets.append(file)
+        log.info(f"Looking up {len(wanted)} citation keys for {len(projects)} bib files")
+        forwarded = False
+        if wanted and daemon and daemon_compatible(options):
+            from pybibget.client import DaemonClient
+            try:
+                client = DaemonClient()
+            except OSError:
+                pass
+            else:
+                failures = {}
+                with client:
+                    for key, bibtex in client.citations(list(wanted), failures=failures):
+                        fan_out(key, bibtex)
+                for message in dict.fromkeys(failures.values()):
+                    log.error(message)
+                forwarded = True
+        if wanted and not forwarded:
+            import asyncio
+            asyncio.run(fan_out_citations(list(wanted), fan_out, **options))
+    finally:
+        # entries found before an interruption are kept
+        for file, texts in pending.items():
+            flush(file, "".join(texts))
+        for obj in files.values():
+            obj.close()
+    for file, count in counts.items():
+        if file:
+            print(f"Successfully appended {count} BibTeX entries to {file}.")
+    return counts
+
+async def fan_out_citations(keys, write, **options):
+    """
+    Calls write(key, bibtex) for each citation key as soon as its entry is found.
+    """
+    from pybibget.bibentry import Bibget, entry_to_string
+    async with Bibget(mathscinet=True, **options) as bibget:
+        async for key, entry in bibget.iter_citations(keys):
+            write(key, entry_to_string(entry, key))
+
+
 if __name__ == '__main__':
     sys.exit(pybibget())
@@ -0,0 +1,71 @@
+import asyncio
+import logging as log
+
+
+class Batcher():
+    """
+    Collects single lookups and resolves them together in batches.
+
+    Calls to get() are queued and flushed either once max_size distinct keys are pending, or delay
+    seconds after the first key was queued. Each flush calls fetch(keys) once with up to max_size
+    keys. fetch must return a dictionary mapping keys to results; keys missing from it resolve to
+    None. If fetch raises, the exception is passed on to every caller of the batch.
+
+    Parameters
+    ----------
+    fetch : coroutine function
+        Resolves a list of keys, returns a dictionary {key: result}.
+    max_size : int, optional
+        Maximal number of keys per batch. The default is 100.
+    delay : float, optional
+        Time in seconds to wait for further keys before flushing. The default is 0.05.
+    """
+    def __init__(self, fetch, max_size=100, delay=0.05):
+        self.fetch = fetch
+        self.max_size = max_size
+        self.delay = delay
+        self.pending = {}
+        self.timer = None
+        self.tasks = set()
+
+    async def get(self, key):
+        """
+        Queue key for the next batch and wait for its result.
+        """
+        loop = asyncio.get_running_loop()
+        if key not in self.pending:
+            self.pending[key] = loop.create_future()
+        future = self.pending[key]
+        if len(self.pending) >= self.max_size:
+            self.flush()
+        elif self.timer is None:
+            self.timer = loop.call_later(self.delay, self.flush)
+        return await asyncio.shield(future)
+
+    def flush(self):
+        """
+        Start resolving all pending keys.
+        """
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        batch, self.pending = self.pending, {}
+        if batch:
+            task = asyncio.ensure_future(self.resolve(batch))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+    async def resolve(self, batch):
+        log.debug(f"Resolving a batch of {len(batch)} keys")
+        try:
+            results = await self.fetch(list(batch))
+        except BaseException as exc:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(exc)
+            if not isinstance(exc, Exception):
+                raise
+            return
+        for key, future in batch.items():
+            if not future.done():
+                future.set_result(results.get(key))
@@ -2,28 +2,50 @@ from urllib import parse
 import re
 import asyncio
 import logging as log
-from lxml import html, etree
 import os
+import sys
+import shutil
 import textwrap
 import json
 import os.path
 import httpx
+import importlib.util
+import functools
+import time
 from appdirs import AppDirs
 from itertools import zip_longest
-from aiolimiter import AsyncLimiter
-from pybtex.database import Entry, Person, BibliographyData, parse_string
-from pylatexenc.latexencode import unicode_to_latex
-from pylatexenc.latex2text import LatexNodes2Text
+from collections import Counter
+from pybtex.database import Entry, Person, BibliographyData
+from pybtex.database.input.bibtex import Parser as BibtexParser
+from pybtex.database.output.bibtex import Writer as BibtexWriter
+from pybibget.batch import Batcher
+from pybibget.workers import ParsePool
+from pybibget.ratelimit import RateLimiter, retry_after, backoff
+from pybibget.keys import RE_MSC, RE_PMID, RE_DOI, RE_ARXIV_OLD, RE_ARXIV_NEW, clean_key, classify_key, normalize_key, group_keys
+from pybibget.cache import LookupCache, DAY, DEFAULT_NEGATIVE_TTL, DEFAULT_MAX_ENTRIES
+from pybibget.trace import NULL_SPAN
+from pybibget.state import fingerprint
+from pybibget.titles import TitleIndex, title_similarity, DEFAULT_THRESHOLD
 ATOM = 'http://www.w3.org/2005/Atom'
 ARXIV = 'http://arxiv.org/schemas/atom'
-RE_MSC = r'MR\d{4,10}'
-RE_PMID = r'PMID:\d{4,10}'
-RE_DOI = r'10\.\d{4,9}\/[-._;()\/:A-Za-z0-9]+'
-RE_ARXIV_OLD = r'\b[a-zA-Z\-\.]{2,10}\/\d{7}(?:v\d)?\b'
-RE_ARXIV_NEW = r'\b\d{4}\.\d{4,5}(?:v\d)?\b'
+RETRY_STATUS = {429, 500, 502, 503, 504}
+RE_TITLE_WORD = re.compile(r'\b([A-Z].*?)\b')
+SANITIZE_CACHE_SIZE = 65536
+CROSSREF_SELECT = "DOI,type,title,author,container-title,volume,issue,page,published-print,published-online,issued,publisher,ISSN"
+CROSSREF_TYPES = {
+    "journal-article": "article",
+    "proceedings-article": "inproceedings",
+    "book-chapter": "incollection",
+    "book-section": "incollection",
+    "book": "book",
+    "monograph": "book",
+    "edited-book": "book",
+    "report": "techreport",
+    "dissertation": "phdthesis",
+}
 
 def column_print(str1,str2,maxwidth=80):
-    width = min(os.get_terminal_size().columns//2 - 3,maxwidth)
+    width = min(shutil.get_terminal_size().columns//2 - 3,maxwidth)
     lines1, lines2 = str1.splitlines(), str2.splitlines()
     print("-"*(width*2+5))
     for line1, line2 in zip_longest(lines1, lines2, fillvalue=''):
@@ -77,45 +99,562 @@ def create_bibentry(entry_type,sanitize=True,author=None,key=None,**kwargs):
     bibentry = Entry(entry_type)
     if author:
         bibentry.persons['author'] = [Person(sanitize_string(str(person))) for person in author]
-    for key, value in kwargs.items():
-        bibentry.fields[key] = sanitize_string(value, title = key in ['title','booktitle']) if sanitize and key in ["title","author","journal","booktitle","publisher"] else value
+    for field, value in kwargs.items():
+        bibentry.fields[field] = sanitize_string(value, title = field in ['title','booktitle']) if sanitize and field in ["title","author","journal","booktitle","publisher"] else value
     bibentry.key = "" if key is None else key
     return bibentry
 
 
+def parse_bibtex(string):
+    """
+    Parse a BibTeX string into a pybtex.database.BibliographyData.
+
+    Equivalent to pybtex.database.parse_string(string, 'bibtex'), which looks up the parser plugin
+    through the package metadata on every call and is therefore several times slower.
+    """
+    return BibtexParser().parse_string(string)
+
+
+def bibtex_to_string(bib_data):
+    """
+    Serialize a pybtex.database.BibliographyData to BibTeX, see parse_bibtex().
+    """
+    return BibtexWriter().to_string(bib_data)
+
+
+def entry_to_string(entry, key=None):
+    """
+    Serialize a single bibentry to a BibTeX string, using key (or else entry.key) as citation key.
+    """
+    return bibtex_to_string(BibliographyData(entries={key or entry.key or "_": entry}))
+
+
+def entry_from_string(string):
+    """
+    Parse a BibTeX string containing a single bibentry, inverse of entry_to_string().
+    """
+    entry = list(parse_bibtex(string).entries.values())[0]
+    if entry.key == "_":
+        entry.key = ""
+    return entry
+
+
+def with_aliases(entry, keys):
+    """
+    Returns a list of (key, bibentry) pairs, one for each key, each with its own copy of entry.
+    """
+    return [(key, entry if i == 0 else entry_from_string(entry_to_string(entry))) for i, key in enumerate(keys)]
+
+
+def cached_lookup(backend, entry=True):
+    """
+    Decorator for Bibget backend methods which caches and coalesces their results.
+
+    The first identifier passed to the method is used as key. Concurrent calls for the same
+    (backend, normalized identifier) share a single lookup, and each caller receives its own copy
+    of the result. The lookup is cancelled once all of its callers are cancelled. Results are stored in Bibget.cache as BibTeX strings if entry is True, otherwise
+    as plain strings. Entries found are also added to Bibget.titles. A ValueError raised by the method is cached as a not-found result and
+    re-raised on later lookups of the same identifier.
+
+    Each call is traced as a span with attribute backend (see Bibget.span()).
+    """
+    def decorator(method):
+        async def lookup(self, span, identifier, *args, **kwargs):
+            if self.cache is not None and not self.refresh and (cached := self.cache.get(backend, identifier)):
+                value, error = cached
+                span.set(cache="hit")
+                log.debug(f"{identifier}: Using cached result from {backend}")
+                if error is not None:
+                    raise ValueError(error)
+                return value
+            try:
+                result = await method(self, *args, **kwargs)
+            except ValueError as exc:
+                if self.cache is not None:
+                    self.cache.set(backend, identifier, error=str(exc))
+                raise
+            value = entry_to_string(result) if entry else result
+            if self.cache is not None:
+                self.cache.set(backend, identifier, value=value)
+            if entry:
+                self.index_title(result, value, source=backend)
+            return value
+
+        @functools.wraps(method)
+        async def wrapper(self, *args, **kwargs):
+            identifier = next((arg for arg in (*args, *kwargs.values()) if arg), None)
+            if identifier is None:
+                return await method(self, *args, **kwargs)
+            flight = (backend, normalize_key(identifier))
+            with self.span(backend, backend=backend, identifier=flight[1]) as span:
+                if flight in self.inflight:
+                    self.coalesced += 1
+                    span.set(coalesced=True)
+                    log.debug(f"{identifier}: Waiting for running lookup on {backend}")
+                else:
+                    def done(task):
+                        self.inflight.pop(flight, None)
+                        if not task.cancelled():
+                            task.exception()  # mark as retrieved in case all callers were cancelled
+                    task = asyncio.ensure_future(lookup(self, span, identifier, *args, **kwargs))
+                    task.add_done_callback(done)
+                    self.inflight[flight] = task
+                task = self.inflight[flight]
+                self.waiters[flight] += 1
+                try:
+                    value = await asyncio.shield(task)
+                except asyncio.CancelledError:
+                    if self.waiters[flight] == 1:
+                        task.cancel()
+                    raise
+                finally:
+                    self.waiters[flight] -= 1
+                    if not self.waiters[flight]:
+                        del self.waiters[flight]
+            return entry_from_string(value) if entry else value
+        return wrapper
+    return decorator
+
+
 class Bibget():
-    def __init__(self, mathscinet=True):
+    """
+    Retrieves BibTeX entries from MathSciNet, Scopus, Crossref, arXiv and PubMed.
+
+    All backends share one pooled HTTP client which keeps connections to each host alive for the
+    lifetime of the Bibget object. Use it as an async context manager (or call aclose()) so that
+    the pool is closed when done:
+
+        async with Bibget() as bibget:
+            bib_data = await bibget.citations(keys)
+
+    Parameters
+    ----------
+    mathscinet : bool, optional
+        Look up DOIs on MathSciNet first. The default is True.
+    http2 : bool, optional
+        Use HTTP/2 multiplexing (requires the optional h2 package). Defaults to the "http2" entry of config.json, or False.
+    max_connections : int, optional
+        Maximum number of concurrent connections. Defaults to the "max_connections" entry of config.json, or 100.
+    max_keepalive_connections : int, optional
+        Maximum number of idle keep-alive connections. Defaults to the "max_keepalive_connections" entry of config.json, or 20.
+    timeout : float, optional
+        Network timeout in seconds. Defaults to the "timeout" entry of config.json, or 30.
+    transport : httpx.AsyncBaseTransport, optional
+        Custom transport for the HTTP client, e.g. httpx.MockTransport for testing.
+    cache : bool, optional
+        Cache lookups in cache.sqlite next to config.json. TTLs (in days) per backend, the TTL of not-found results and the maximal
+        number of cached lookups are read from the "cache_ttl", "cache_negative_ttl" and "cache_max_entries" entries of config.json.
+        The default is True. Entries found are also indexed by title in titles.sqlite, see lookup_title().
+    refresh : bool, optional
+        Ignore cached results, but store the results of the new lookups. The default is False.
+    tracer : pybibget.trace.Tracer, optional
+        Records a span tree per citation key (backend lookups, HTTP requests, parsing), see span(). The default is None (no tracing).
+    hedge : float, optional
+        Resolve DOIs by racing the backends, see citation_doi(): each backend is started after the higher priority backends
+        failed or after hedge seconds, whichever comes first (0 starts all of them at once). Defaults to the "hedge" entry of
+        config.json, or None, which queries the backends strictly one after the other.
+    interactive : bool, optional
+        Offer to set up Scopus if it would be used but no API key is configured, see check_scopus(). The default is True.
+    offline : bool, optional
+        Never connect to the network: citation keys are only answered by the metadata store (see store) and the lookup
+        cache. The default is False.
+    """
+    def __init__(self, mathscinet=True, http2=None, max_connections=None, max_keepalive_connections=None, timeout=None, transport=None, cache=True, refresh=False, tracer=None, hedge=None, interactive=True, offline=False):
         self.mathscinet = mathscinet
         self.config_file = os.path.join(AppDirs("pybibget", "pybibget").user_data_dir, "config.json")
         if os.path.isfile(self.config_file):
-            self.rate_limit = AsyncLimiter(int(json.load(open(self.config_file))["scopus_rate_limit"]), 1)
-            self.api_key = json.load(open(self.config_file))["scopus_api_key"]
-            self.scopus = len(self.api_key) > 0
+            with open(self.config_file) as file:
+                self.config = json.load(file)
         else:
-            os.makedirs(os.path.dirname(self.config_file), exist_ok=True)
-            with open(self.config_file, "w+") as file:
-                file.write(json.dumps({"scopus_api_key": "", "scopus_rate_limit": 6}))
-            self.scopus = False
+            self.config = {"scopus_api_key": "", "scopus_rate_limit": 6}
+        self.api_key = self.config["scopus_api_key"]
+        self.scopus = len(self.api_key) > 0
+        self.http2 = self.config.get("http2", False) if http2 is None else http2
+        self.max_connections = self.config.get("max_connections", 100) if max_connections is None else max_connections
+        self.max_keepalive_connections = self.config.get("max_keepalive_connections", 20) if max_keepalive_connections is None else max_keepalive_connections
+        self.timeout = self.config.get("timeout", 30) if timeout is None else timeout
+        self.transport = transport
+        self._client = None
+        hosts = {"api.elsevier.com": {"rate": self.config["scopus_rate_limit"]}, **self.config.get("hosts", {})}
+        if self.config.get("ncbi_api_key"):
+            # NCBI admits 10 instead of 3 requests per second with an API key
+            hosts["eutils.ncbi.nlm.nih.gov"] = {"rate": 10, "concurrency": 10, **hosts.get("eutils.ncbi.nlm.nih.gov", {})}
+        self.rate_limiter = RateLimiter(hosts)
+        self.max_retries = self.config.get("max_retries", 4)
+        self.max_retry_after = self.config.get("max_retry_after", 60)
+        self.refresh = refresh
+        self.inflight = {}
+        self.waiters = Counter()
+        self.coalesced = 0
+        self.arxiv_batcher = Batcher(self.fetch_arxiv, max_size=self.config.get("arxiv_batch_size", 100))
+        self.crossref_batcher = Batcher(self.fetch_crossref, max_size=self.config.get("crossref_batch_size", 50))
+        self.pubmed_batcher = Batcher(self.fetch_pubmed, max_size=self.config.get("pubmed_batch_size", 200))
+        self.ncbi_api_key = self.config.get("ncbi_api_key", "")
+        self.use_cache = cache
+        self._cache = None
+        self._titles = None
+        self.title_threshold = self.config.get("title_match_threshold", DEFAULT_THRESHOLD)
+        self.tracer = tracer
+        self.hedge = self.config.get("hedge") if hedge is None else hedge
+        self.interactive = interactive
+        self.offline = offline
+        self.store_file = self.config.get("store") or os.path.join(os.path.dirname(self.config_file), "store.sqlite")
+        self._store = None
+        self.parse_pool = ParsePool(self.config.get("parse_pool", "inline"), workers=self.config.get("parse_workers"), batch_size=self.config.get("parse_batch_size", 16))
+
+    @property
+    def client(self):
+        """
+        The shared httpx.AsyncClient, created on first use.
+        """
+        if self._client is None:
+            if self.http2 and importlib.util.find_spec("h2") is None:
+                log.warning("HTTP/2 requires the h2 package (pip install httpx[http2]). Falling back to HTTP/1.1.")
+                self.http2 = False
+            limits = httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_keepalive_connections)
+            self._client = httpx.AsyncClient(http2=self.http2, limits=limits, timeout=self.timeout, transport=self.transport)
+        return self._client
+
+    @property
+    def cache(self):
+        """
+        The LookupCache, opened on first use, or None if caching is disabled.
+        """
+        if self._cache is None and self.use_cache:
+            self._cache = LookupCache(os.path.join(os.path.dirname(self.config_file), "cache.sqlite"),
+                ttl={backend: days * DAY for backend, days in self.config.get("cache_ttl", {}).items()},
+                negative_ttl=self.config.get("cache_negative_ttl", DEFAULT_NEGATIVE_TTL / DAY) * DAY,
+                max_entries=self.config.get("cache_max_entries", DEFAULT_MAX_ENTRIES))
+        return self._cache
+
+    @property
+    def titles(self):
+        """
+        The TitleIndex, opened on first use, or None if caching is disabled.
+        """
+        if self._titles is None and self.use_cache:
+            self._titles = TitleIndex(os.path.join(os.path.dirname(self.config_file), "titles.sqlite"))
+        return self._titles
+
+    def index_title(self, entry, bibtex=None, source=None):
+        """
+        Add a bibentry (with its BibTeX string, if already serialized) to the title index.
+        """
+        if self.titles is not None and "title" in entry.fields:
+            self.titles.add(latex_to_text(entry.fields["title"]), bibtex or entry_to_string(entry), source=source)
+
+    def import_titles(self, file_name):
+        """
+        Add all entries of a .bib file to the title index.
+
+        Returns
+        ---------
+        number_of_entries : int
+            The number of entries with a title.
+        """
+        from pybibget.bibfile import BibFile
+        if self.titles is None:
+            return 0
+        number_of_entries = 0
+        with BibFile(file_name) as bib_file:
+            for key in bib_file:
+                try:
+                    entry = bib_file.entry(key)
+                except Exception as exc:
+                    log.warning(f"{file_name}: Could not parse {key} ({exc})")
+                    continue
+                if "title" in entry.fields:
+                    self.index_title(entry, source=os.path.basename(file_name))
+                    number_of_entries += 1
+        return number_of_entries
+
+    @property
+    def store(self):
+        """
+        The MetadataStore (store.sqlite next to config.json, or the "store" entry of config.json), opened on first use,
+        or None if no metadata dump was imported (see import_metadata()).
+        """
+        if self._store is None and os.path.exists(self.store_file):
+            from pybibget.store import MetadataStore
+            self._store = MetadataStore(self.store_file)
+        return self._store
+
+    def import_metadata(self, file_name, format=None, workers=None):
+        """
+        Import a metadata dump (a .bib file, Crossref works or arXiv metadata) into the metadata store, see
+        pybibget.store.import_dump().
+
+        Returns
+        ---------
+        number_of_records, failures : int, int
+            The number of records imported, and the number of records which could not be converted.
+        """
+        from pybibget.store import MetadataStore, import_dump
+        if self._store is None:
+            self._store = MetadataStore(self.store_file)
+        return import_dump(self._store, file_name, format=format, workers=workers)
+
+    def stored_citation(self, backend, identifier):
+        """
+        Get a bibentry from the metadata store, or None if it has no record for the normalized identifier (or only one
+        which cannot be parsed, e.g. a raw .bib entry using an @string macro). An arXiv preprint whose published version
+        is stored as well is answered by the published version.
+        """
+        if self.store is None or backend is None:
+            return None
+        bibtex = self.store.get(identifier)
+        if bibtex is None:
+            return None
+        try:
+            entry = entry_from_string(bibtex)
+        except Exception as exc:
+            log.debug(f"{identifier}: Skipping unreadable stored record ({exc})")
+            return None
+        if backend == "arxiv" and "doi" in entry.fields and (published := self.store.get(entry.fields["doi"])):
+            try:
+                entry = entry_from_string(published)
+            except Exception as exc:
+                log.debug(f"{entry.fields['doi']}: Skipping unreadable stored record ({exc})")
+                return entry
+            entry.fields["eprint"] = identifier
+            entry.fields["archiveprefix"] = "arXiv"
+        return entry
+
+    async def parse(self, function, *args):
+        """
+        Run a parse or sanitize job function(*args) in the parse pool (see pybibget.workers.ParsePool), configured by the
+        "parse_pool" ("inline", "thread" or "process"), "parse_workers" and "parse_batch_size" entries of config.json.
+        """
+        return await self.parse_pool.run(function, *args)
+
+    def span(self, name, **attributes):
+        """
+        Context manager tracing a step of a lookup as child of the current span, if a tracer is set.
+
+        Spans are named "citation" (a citation key), after the backend (a backend lookup, with attributes backend,
+        identifier and cache or coalesced), "http" (a request, with attributes host, path, status, bytes, attempts and
+        limiter_wait in seconds) or "parse" (parsing a response).
+        """
+        return self.tracer.span(name, **attributes) if self.tracer is not None else NULL_SPAN
+
+    async def get(self, url, stream=False, **kwargs):
+        """
+        Send a GET request through the shared client.
+
+        Requests are subject to the concurrency and rate limits of the host (see pybibget.ratelimit). Requests which
+        fail with a network error, or with status 429 or 5xx, are retried up to max_retries times after the delay
+        requested by the Retry-After header, or with jittered exponential backoff.
+
+        With stream=True, the response is returned as soon as its headers arrive. Its body must then be read with
+        aiter_bytes() and the response closed with aclose().
+
+        Raises
+        ----------
+        httpx.ConnectError
+            In offline mode.
+        httpx.HTTPStatusError
+            If the server is still unavailable or rate limiting the request after all retries.
+            Such failures are not cached as not-found results.
+        httpx.TransportError
+            If the network error persists after all retries.
+        """
+        url = httpx.URL(url)
+        host = url.host
+        if self.offline:
+            raise httpx.ConnectError(f"{host}: Not connecting in offline mode")
+        limiter = self.rate_limiter[host]
+        follow_redirects = kwargs.pop("follow_redirects", False)
+        with self.span("http", host=host, path=url.path) as span:
+            for attempt in range(self.max_retries + 1):
+                span.set(attempts=attempt + 1)
+                try:
+                    waiting = time.perf_counter()
+                    async with limiter:
+                        span.add("limiter_wait", time.perf_counter() - waiting)
+                        if stream:
+                            page = await self.client.send(self.client.build_request("GET", url, **kwargs), stream=True, follow_redirects=follow_redirects)
+                        else:
+                            page = await self.client.get(url, follow_redirects=follow_redirects, **kwargs)
+                except httpx.TransportError as exc:
+                    if attempt == self.max_retries:
+                        raise
+                    delay = backoff(attempt)
+                    log.debug(f"{host}: {exc!r}. Retrying in {delay:.1f}s")
+                else:
+                    span.set(status=page.status_code)
+                    if not stream:
+                        span.add("bytes", len(page.content))
+                    if page.status_code not in RETRY_STATUS:
+                        limiter.relax()
+                        return page
+                    if stream:
+                        await page.aclose()
+                    delay = retry_after(page)
+                    if page.status_code in (429, 503):
+                        limiter.throttle(delay)
+                    if attempt == self.max_retries or (delay or 0) > self.max_retry_after:
+                        raise httpx.HTTPStatusError(f"{host} temporarily unavailable ({page.status_code})", request=page.request, response=page)
+                    delay = backoff(attempt) if delay is None else delay
+                    log.debug(f"{host} responded with {page.status_code}. Retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+    async def aclose(self):
+        """
+        Close the shared HTTP client and its connection pool.
+        """
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        if self._cache is not None:
+            self._cache.close()
+            self._cache = None
+        if self._titles is not None:
+            self._titles.close()
+            self._titles = None
+        if self._store is not None:
+            self._store.close()
+            self._store = None
+        self.parse_pool.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    def write_config(self):
+        os.makedirs(os.path.dirname(self.config_file), exist_ok=True)
+        with open(self.config_file, "w+") as file:
+            file.write(json.dumps(self.config))
 
     def setup_scopus(self,message):
         self.api_key = input(message)
-        with open(self.config_file, "w+") as file:
-            file.write(json.dumps({"scopus_api_key": self.api_key, "scopus_rate_limit": 6}))
+        self.config["scopus_api_key"] = self.api_key
+        self.write_config()
         self.scopus = len(self.api_key) > 0
 
-    async def citations(self,keys):
-        if any(map(lambda key: re.match(RE_DOI, key) or re.match(RE_PMID, key), keys)) and not self.scopus:
+    def check_scopus(self,groups):
+        """
+        Offer to set up Scopus if the grouped keys (see group_keys()) contain DOIs or PubMed IDs and no API key is configured.
+        """
+        if ("doi" in groups or "pmid" in groups) and not self.scopus and self.interactive and not self.offline:
             self.setup_scopus(f"Scopus can result in more reliable results than crossref.org, but requires an API key. If you want to use Scopus, please register at https://dev.elsevier.com/ and enter your API key below. If you don't want to use Scopus, just press [enter]. You can also enter your API key later in {self.config_file}\n")
-        bibentries = await asyncio.gather(*[self.citation(key) for key in keys],return_exceptions=True)
+
+    def prepare_keys(self,keys):
+        """
+        Classify and deduplicate citation keys before any lookup, see group_keys().
+
+        Returns
+        ---------
+        aliases : list of list of str
+            Lists of citation keys (as cited, e.g. with a doi: prefix) with the same normalized identifier, grouped by backend.
+        """
+        groups = group_keys(keys)
+        self.check_scopus(groups)
+        aliases = [keys for group in groups.values() for keys in group.values()]
+        if (duplicates := sum(len(keys) - 1 for keys in aliases)):
+            log.info(f"Skipping {duplicates} duplicate citation keys")
+        return aliases
+
+    async def citations(self,keys):
+        if hasattr(keys, "__aiter__"):
+            bib_data = BibliographyData()
+            async for key, entry in self.iter_citations(keys):
+                bib_data.entries[key] = entry
+            return bib_data
+        aliases = self.prepare_keys(keys)
+        bibentries = await asyncio.gather(*[self.citation(keys[0]) for keys in aliases],return_exceptions=True)
         bib_data = BibliographyData()
-        for entry_key in bibentries:
+        for keys, entry_key in zip(aliases, bibentries):
             if isinstance(entry_key, Exception):
                 log.error(entry_key)
             else:
-                entry,key = entry_key
-                bib_data.entries[key] = entry
+                entry,_ = entry_key
+                bib_data.entries.update(with_aliases(entry, keys))
+        if self.coalesced:
+            log.info(f"Saved {self.coalesced} requests by sharing concurrent lookups")
         return bib_data
-    
+
+    async def iter_citations(self,keys,failures=None):
+        """
+        Get bibentries for citation keys in the order in which they are found.
+
+        Parameters
+        ----------
+        keys : list of str, or async iterable of str
+            The citation keys. Keys from an async iterable (e.g. iter_arxiv_list()) are looked up as soon as they
+            arrive; a key with the same identifier as a running lookup joins it, see prepare_keys().
+        failures : dict, optional
+            If given, the citation keys which are not found are added to it, mapped to the error message.
+
+        Yields
+        ---------
+        key, bibentry : str, pybtex.database.Entry
+            Citation keys which are not found are logged and skipped.
+        """
+        if not hasattr(keys, "__aiter__"):
+            aliases = self.prepare_keys(keys)
+            async def key_groups():
+                for group in aliases:
+                    yield group
+        else:
+            async def key_groups():
+                async for key in keys:
+                    key = key.strip()
+                    identifier = normalize_key(key)
+                    if identifier in running:
+                        if key not in running[identifier]:
+                            running[identifier].append(key)
+                        continue
+                    yield [key]
+
+        running = {}  # normalized identifier -> citation keys of a running lookup
+        results = asyncio.Queue()
+        tasks = []
+
+        async def citation(identifier, keys):
+            try:
+                entry, _ = await self.citation(keys[0])
+                results.put_nowait(with_aliases(entry, keys))
+            except Exception as exc:
+                if failures is not None:
+                    failures.update(dict.fromkeys(keys, str(exc) or type(exc).__name__))
+                results.put_nowait(exc)
+            finally:
+                running.pop(identifier, None)
+
+        async def start():
+            try:
+                async for group in key_groups():
+                    identifier = normalize_key(group[0])
+                    running[identifier] = group
+                    tasks.append(asyncio.ensure_future(citation(identifier, group)))
+            finally:
+                results.put_nowait(None)
+
+        producer = asyncio.ensure_future(start())
+        try:
+            started = False
+            received = 0
+            while not started or received < len(tasks):
+                entries = await results.get()
+                if entries is None:
+                    started = True
+                    producer.result()  # raise errors of the key source
+                    continue
+                received += 1
+                if isinstance(entries, Exception):
+                    log.error(entries)
+                    continue
+                for key, entry in entries:
+                    yield key, entry
+        finally:
+            producer.cancel()
+            for task in tasks:
+                task.cancel()
+        if self.coalesced:
+            log.info(f"Saved {self.coalesced} requests by sharing concurrent lookups")
+
     async def citation(self,key):
         """
         Get a bibentry from a citation key.
@@ -123,50 +662,128 @@ class Bibget():
         Parameters
         ----------
         key : str
-            The citation key.
+            The citation key. URL prefixes (e.g. https://doi.org/) are ignored (see clean_key()) and identifiers other than DOIs are normalized (see normalize_key()) before the lookup.
+            The metadata store (see stored_citation()) is tried before the backends.
 
         Returns
         ---------
-        bibentry : pybtex.database.Entry
+        bibentry, key : pybtex.database.Entry, str
 
         Raises
         ----------
         ValueError
             If the citation key is invalid or the entry is not found.
         """
-        if re.match(RE_MSC, key):
-            log.info(msg_looking(key, "MathSciNet"))
-            return (await self.citation_msc(mrkey=key), key)
-        elif re.match(RE_PMID, key):
-            if self.scopus:
-                log.info(msg_looking(key, "Scopus"))
-                try:
-                    return (await self.citation_scopus(pmid=key), key)
-                except Exception as exc:
-                    log.warning(exc) 
-            log.info(msg_looking(key, "PubMed"))
-            return (await self.citation_pubmed(key), key)
-        elif re.match(RE_ARXIV_OLD, key) or re.match(RE_ARXIV_NEW, key):
-            log.info(msg_looking(key, "arXiv"))
-            return (await self.citation_arxiv(key), key)
-        elif re.match(RE_DOI, key):
-            if self.mathscinet:
-                try:
-                    log.info(msg_looking(key, "MathSciNet"))
-                    return (await self.citation_msc(doi=key), key)
-                except Exception as exc:
-                    log.warning(exc)
-            if self.scopus:
-                try:
+        with self.span("citation", key=key):
+            cited = clean_key(key)
+            backend = classify_key(cited)
+            identifier = normalize_key(cited, backend)
+            if (entry := self.stored_citation(backend, identifier)) is not None:
+                log.info(msg_found(key, "the local metadata store"))
+                return (entry, key)
+            if backend == "msc":
+                log.info(msg_looking(key, "MathSciNet"))
+                return (await self.citation_msc(mrkey=identifier), key)
+            elif backend == "pmid":
+                if self.scopus:
                     log.info(msg_looking(key, "Scopus"))
-                    return (await self.citation_scopus(doi=key), key)
+                    try:
+                        return (await self.citation_scopus(pmid=identifier), key)
+                    except Exception as exc:
+                        log.warning(exc) 
+                log.info(msg_looking(key, "PubMed"))
+                return (await self.citation_pubmed(identifier), key)
+            elif backend == "arxiv":
+                log.info(msg_looking(key, "arXiv"))
+                return (await self.citation_arxiv(identifier), key)
+            elif backend == "doi":
+                # DOIs are case insensitive, but the backends report them as given
+                return (await self.citation_doi(cited, key), key)
+            else:
+                raise ValueError(f"{key} = Invalid citation key")
+
+    async def citation_doi(self,doi,key=None):
+        """
+        Get a bibentry from a DOI, from MathSciNet, Scopus or Crossref (in this order of priority).
+
+        By default each backend is only queried after the previous one failed. If hedge is set, a backend is also started
+        when the higher priority backends are still running after hedge seconds, so that slow or failing backends cost at
+        most hedge seconds each. The result of the highest priority backend which finds the DOI is returned as soon as
+        all higher priority backends failed, and the remaining lookups are cancelled.
+
+        Parameters
+        ----------
+        doi : str
+            The DOI, must start with 10.xxx/xxx
+        key : str, optional
+            The citation key, used for log messages. The default is doi.
+
+        Returns
+        ---------
+        bibentry : pybtex.database.Entry
+
+        Raises
+        ----------
+        ValueError
+            If the entry is not found on any backend.
+        """
+        key = key or doi
+        lookups = []
+        if self.mathscinet:
+            lookups.append(("MathSciNet", functools.partial(self.citation_msc, doi=doi)))
+        if self.scopus:
+            lookups.append(("Scopus", functools.partial(self.citation_scopus, doi=doi)))
+        lookups.append(("Crossref", functools.partial(self.citation_crossref, doi)))
+        if self.hedge is None:
+            for service, lookup in lookups[:-1]:
+                try:
+                    log.info(msg_looking(key, service))
+                    return await lookup()
                 except Exception as exc:
                     log.warning(exc)
-            log.info(msg_looking(key, "Crossref"))
-            return (await self.citation_crossref(key), key)
-        else:
-            raise ValueError(f"{key} = Invalid citation key")
+            service, lookup = lookups[-1]
+            log.info(msg_looking(key, service))
+            return await lookup()
+
+        def failed(task):
+            return task.done() and (task.cancelled() or task.exception() is not None)
+
+        loop = asyncio.get_running_loop()
+        tasks = []
+        try:
+            while True:
+                # the highest priority lookup which has not failed decides
+                first = next((task for task in tasks if not failed(task)), None)
+                if first is not None and first.done():
+                    for task in tasks[:tasks.index(first)]:
+                        log.warning(task.exception())
+                    return first.result()
+                if first is None and len(tasks) == len(lookups):
+                    for task in tasks[:-1]:
+                        log.warning(task.exception())
+                    return tasks[-1].result()
+                if first is not None:
+                    running = [task for task in tasks if not task.done()]
+                    if len(tasks) == len(lookups):
+                        await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                        continue
+                    timeout = started + self.hedge - loop.time()
+                    if timeout > 0:
+                        done, _ = await asyncio.wait(running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                        if done:
+                            continue
+                service, lookup = lookups[len(tasks)]
+                log.info(msg_looking(key, service) + (" (hedging)" if first is not None else ""))
+                tasks.append(asyncio.ensure_future(lookup()))
+                started = loop.time()
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+                elif not task.cancelled():
+                    task.exception()  # mark as retrieved
 
+    @cached_lookup("mathscinet")
     async def citation_msc(self,mrkey=None, doi=None):
         """
         Get a bibentry from a MathSciNet citation key or DOI.
@@ -191,26 +808,25 @@ class Bibget():
             raise ValueError("Either MRnumber or doi must be specified.")
         base_url = "https://mathscinet.ams.org/mathscinet/search/publications.html?fmt=bibtex&pg1="
         url = base_url + "MR&s1=" + mrkey[2:] if mrkey else base_url + "DOI&s1=" + doi
-        async with httpx.AsyncClient() as client:
-            page = await client.get(url)
-            try:
-                tree = html.fromstring(page.text)
-                bibstrings = tree.xpath('//pre/text()')
-                bibstr = bibstrings[0]
-                if len(bibstrings)>1:
-                    log.warn(f"MathSciNet returned more than one entry for {mrkey if mrkey else doi}. Using the first one but this may be wrong.")
-                entries = parse_string(bibstr, 'bibtex').entries
-                log.info(msg_found(mrkey if mrkey else doi, "MathSciNet"))
-                return list(entries.values())[0]
-            except:
-                reason = str(page.status_code)
-                if page.status_code == 200:
-                    reason += "; " + tree.xpath('//head/title/text()')[0].replace("\n", "")
-                raise ValueError(msg_not_found(mrkey if mrkey else doi, "MathSciNet", reason=reason, continuation="Trying crossref.org" if doi else None))
+        page = await self.get(url)
+        try:
+            with self.span("parse", format="html"):
+                entry, number_of_entries = await self.parse(parse_msc_page, page.text)
+            if number_of_entries > 1:
+                log.warning(f"MathSciNet returned more than one entry for {mrkey if mrkey else doi}. Using the first one but this may be wrong.")
+            log.info(msg_found(mrkey if mrkey else doi, "MathSciNet"))
+            return entry
+        except Exception as exc:
+            reason = str(page.status_code)
+            if page.status_code == 200 and exc.args:
+                reason += "; " + str(exc.args[0])
+            raise ValueError(msg_not_found(mrkey if mrkey else doi, "MathSciNet", reason=reason, continuation="Trying crossref.org" if doi else None))
 
+    @cached_lookup("crossref")
     async def citation_crossref(self,doi):
         """
-        Get a bibentry from a DOI.
+        Get a bibentry from a DOI. Concurrent lookups are resolved together in batches by fetch_crossref(). If a batch
+        fails, the DOI is looked up on its own with crossref_transform().
 
         Parameters
         ----------
@@ -226,22 +842,74 @@ class Bibget():
         ValueError
             If the entry is not found.
         """
+        try:
+            item = await self.crossref_batcher.get(doi)
+        except (httpx.HTTPError, ValueError, KeyError) as exc:
+            log.debug(f"{doi}: Batched lookup on crossref.org failed ({exc!r}), using the BibTeX transform")
+            return await self.crossref_transform(doi)
+        if item is None:
+            raise ValueError(msg_not_found(doi, "crossref.org", reason="no metadata"))
+        with self.span("parse", format="json"):
+            entry = await self.parse(crossref_entry, item)
+        log.info(msg_found(doi, "crossref.org"))
+        return entry
+
+    async def fetch_crossref(self,dois):
+        """
+        Get the Crossref metadata of several DOIs with as few requests as possible, using the /works endpoint filtered
+        by DOI and restricted to the fields used by crossref_entry(). Result pages are followed with the deep paging cursor.
+
+        Parameters
+        ----------
+        dois : list of str
+            The DOIs.
+
+        Returns
+        ---------
+        metadata : dict
+            Dictionary mapping the found DOIs (as given) to their Crossref metadata.
+
+        Raises
+        ----------
+        ValueError
+            If Crossref did not answer with metadata.
+        """
+        requested = {doi.lower(): doi for doi in dois}
+        params = {"filter": ",".join("doi:" + doi for doi in requested), "select": CROSSREF_SELECT, "rows": len(requested), "cursor": "*"}
+        results = {}
+        seen = 0
+        while True:
+            page = await self.get("https://api.crossref.org/works", params=params)
+            if page.status_code != 200:
+                raise ValueError(f"api.crossref.org responded with {page.status_code}")
+            with self.span("parse", format="json"):
+                message = page.json()["message"]
+            for item in message["items"]:
+                if (doi := requested.get(item.get("DOI", "").lower())):
+                    results[doi] = item
+            seen += len(message["items"])
+            if not message["items"] or seen >= message.get("total-results", 0) or len(results) == len(requested) or not message.get("next-cursor"):
+                return results
+            params["cursor"] = message["next-cursor"]
+
+    async def crossref_transform(self,doi):
+        """
+        Get a bibentry from a DOI using the BibTeX transform of Crossref, one request per DOI.
+        """
         url = "https://api.crossref.org/v1/works/" + doi + "/transform"
         headers = {'Accept': 'application/x-bibtex; charset=utf-8'}
-        async with httpx.AsyncClient() as client:
-            page = await client.get(url, headers=headers, follow_redirects=True)
-            try:
-                entries = parse_string(page.text, 'bibtex').entries
-                entry = sanitize_entry(list(entries.values())[0])
-                log.info(msg_found(doi, "crossref.org"))
-                return entry
-            except Exception as exc:
-                log.info(exc)
-                reason = page.status_code
-                entries = parse_string(page.text, 'bibtex').entries
-                entry = list(entries.values())[0]
-                raise ValueError(msg_not_found(doi, "crossref.org", reason=reason))
+        page = await self.get(url, headers=headers, follow_redirects=True)
+        try:
+            with self.span("parse", format="bibtex"):
+                entry = await self.parse(parse_bibtex_entry, page.text)
+            log.info(msg_found(doi, "crossref.org"))
+            return entry
+        except Exception as exc:
+            log.info(exc)
+            reason = page.status_code
+            raise ValueError(msg_not_found(doi, "crossref.org", reason=reason))
 
+    @cached_lookup("scopus")
     async def citation_scopus(self,doi=None, pmid=None):
         """
         Get a bibentry from Scoups via DOI or PMID.
@@ -273,82 +941,25 @@ class Bibget():
             raise ValueError("Either doi or PMID must be specified.")
         url += "?view=FULL&apiKey=" + self.api_key
         headers = {'Accept': 'application/json; charset=utf-8'}
-        async with httpx.AsyncClient() as client:
-            async with self.rate_limit:
-                page = await client.get(url, headers=headers, follow_redirects=True)
-                if log.root.level == log.DEBUG:
-                    with open("test"+key.replace("/","-")+".json","w+") as f:
-                        f.writelines(page.text)
-                try: 
-                    results = page.json()
-                    results_bib = results['abstracts-retrieval-response']['item']['bibrecord']['head']
-                    fields = {}
-                    citation_type = results_bib['source']['@type']
-                    fields['title'] = results_bib['citation-title']
-                    author_flat = []
-                    author_groups = results_bib['author-group']
-                    if type(author_groups) is not list:
-                        author_groups = [author_groups]
-                    for author_group in author_groups:
-                        authors = author_group['author']
-                        if type(authors) is not list:
-                            authors = [authors]
-                        for author in authors:
-                            author_flat.append(f"{author['preferred-name']['ce:surname']}, {author['preferred-name']['ce:given-name']}")
-                    fields['author'] = [Person(author) for author in author_flat]
-                    try: 
-                        fields['year'] = list(results_bib['source']['publicationyear'].values())[0]
-                    except Exception as e:
-                        log.warning(str(e))
-                    if pmid:
-                        doi = results['abstracts-retrieval-response']['coredata']['prism:doi']
-                    fields['doi'] = doi
-                    fields['url'] = "https://doi.org/" + doi
-                    if citation_type == 'j':
-                        citation_type = 'article'
-                        fields['journal'] = results_bib['source']['sourcetitle-abbrev'] if 'sourcetitle-abbrev' in results_bib['source'] else results_bib['source']['sourcetitle']
-                        try:
-                            fields['volume'] = results_bib['source']['volisspag']['voliss']['@volume']
-                            fields['number'] = results_bib['source']['volisspag']['voliss']['@issue']
-                        except KeyError as e:
-                            log.info(f"{key}: No volume or issue found on Scopus.")
-                        try: 
-                            fields['pages'] = '--'.join(results_bib['source']['volisspag']['pagerange'].values())
-                        except KeyError as e:
-                            log.info(f"{key}: No page range found on Scopus.")
-                    elif citation_type in ['p','k']:
-                        citation_type = 'inproceedings' if citation_type == 'p' else 'incollection'
-                        fields['publisher'] = results_bib['source']['publisher']['publishername']
-                        fields['booktitle'] = results_bib['source']['sourcetitle-abbrev']
-                    elif citation_type == 'b':
-                        citation_type = 'book'
-                        fields['publisher'] = results_bib['source']['publisher']['publishername']
-                        fields['title'] = results_bib['source']['sourcetitle']
-                        try:
-                            fields['pages'] = results_bib['source']['volisspag']['pagerange']['@last']
-                        except:
-                            log.warning(f"{key}: Number of pages not found on Scopus.") 
-                    else:
-                        raise ValueError("Unknown citation type: " + citation_type)
-                    if pmid:
-                        fields['pmid'] = pmid[5:]
-                    else:
-                        try: 
-                            fields['pmid'] = results['abstracts-retrieval-response']['coredata']['pubmed-id']
-                        except:
-                            pass
-                    bibentry = create_bibentry(citation_type ,**fields)
-                    log.info(msg_found(key, "Scopus"))
-                    return(bibentry)
-                except Exception as exc:
-                    reason = str(page.status_code)
-                    if page.status_code == 401:
-                        reason += "; Error 401 suggests that either the supplied API key is wrong, or requires a VPN connection"
-                    raise ValueError(msg_not_found(key, "Scopus", reason=reason)) from exc
+        page = await self.get(url, headers=headers, follow_redirects=True)
+        if log.root.level == log.DEBUG:
+            with open("test"+key.replace("/","-")+".json","w+") as f:
+                f.writelines(page.text)
+        try: 
+            with self.span("parse", format="json"):
+                bibentry = await self.parse(parse_scopus, page.text, key, doi, pmid)
+            log.info(msg_found(key, "Scopus"))
+            return(bibentry)
+        except Exception as exc:
+            reason = str(page.status_code)
+            if page.status_code == 401:
+                reason += "; Error 401 suggests that either the supplied API key is wrong, or requires a VPN connection"
+            raise ValueError(msg_not_found(key, "Scopus", reason=reason)) from exc
 
+    @cached_lookup("arxiv")
     async def citation_arxiv(self,arxiv_key):
         """
-        Get a bibentry from an arXiv identifier.
+        Get a bibentry from an arXiv identifier. Concurrent lookups are resolved together in batches by fetch_arxiv().
 
         Parameters
         ----------
@@ -364,48 +975,136 @@ class Bibget():
         ValueError
             If the entry is not found.
         """
-        url = "http://export.arxiv.org/api/query?id_list=" + arxiv_key
-        async with httpx.AsyncClient() as client:
-            page = await client.get(url, follow_redirects=True)
+        metadata = await self.arxiv_batcher.get(arxiv_key)
+        if metadata is None:
+            raise ValueError(msg_not_found(arxiv_key, "arXiv", reason="empty arXiv entry returned"))
+        if metadata["doi"]:
+            log.info(msg_found(arxiv_key, "arXiv", continuation=f"Detected {metadata['doi']}"))
             try:
-                tree = etree.fromstring(page.text.encode())
-                if doi := tree.xpath("//a:entry/b:doi", namespaces={'a': ATOM, 'b': ARXIV}):
-                    log.info(msg_found(arxiv_key, "arXiv", continuation=f"Detected {doi[0].text}"))
-                    bibentry, _ = await self.citation(doi[0].text)
-                elif title := tree.xpath("//a:entry/a:title", namespaces={'a': ATOM}):
-                    fields = [("title", title[0].text)]
-                    if journal := tree.xpath("//a:entry/a:journal", namespaces={'a': ATOM}):
-                        fields += [("note", journal[0].text)]
-                    else:
-                        fields += [("note", "Preprint")]
-                    fields += [("year", tree.xpath("//a:entry/a:published",namespaces={'a': ATOM})[0].text[:4])]
-                    bibentry = Entry("unpublished", fields=fields)
-                    bibentry.persons["author"] = [Person(author.text) for author in tree.xpath("//a:entry/a:author/a:name", namespaces={'a': ATOM})]
-                    bibentry = sanitize_entry(bibentry)
-                    log.info(msg_found(arxiv_key, "arXiv", continuation="No DOI found, using title and authors"))
-                else:
-                    raise ValueError(f"empty arXiv entry returned")
-                bibentry.fields["eprint"] = arxiv_key
-                bibentry.fields["archiveprefix"] = "arXiv"
-                return bibentry
-            except Exception as exc:
-                reason = str(page.status_code) + "; " + exc.args[0]
-                raise ValueError(msg_not_found(arxiv_key, "arXiv", reason=reason))
+                bibentry, _ = await self.citation(metadata["doi"])
+            except ValueError as exc:
+                raise ValueError(msg_not_found(arxiv_key, "arXiv", reason=exc.args[0]))
+        else:
+            bibentry = await self.parse(arxiv_entry, metadata)
+            log.info(msg_found(arxiv_key, "arXiv", continuation="No DOI found, using title and authors"))
+        bibentry.fields["eprint"] = arxiv_key
+        bibentry.fields["archiveprefix"] = "arXiv"
+        return bibentry
+
+    async def fetch_arxiv(self,arxiv_keys):
+        """
+        Get the metadata of several arXiv identifiers with a single request.
+
+        Parameters
+        ----------
+        arxiv_keys : list of str
+            The arXiv identifiers.
+
+        Returns
+        ---------
+        metadata : dict
+            Dictionary mapping the found identifiers to their metadata, see parse_arxiv_feed().
+        """
+        url = "http://export.arxiv.org/api/query?id_list=" + ",".join(arxiv_keys) + f"&max_results={len(arxiv_keys)}"
+        page = await self.get(url, follow_redirects=True)
+        try:
+            with self.span("parse", format="atom"):
+                entries = await self.parse(parse_arxiv_feed, page.text)
+        except Exception as exc:
+            if len(arxiv_keys) == 1:
+                log.debug(msg_not_found(arxiv_keys[0], "arXiv", reason=str(page.status_code) + "; " + str(exc)))
+                return {}
+            # a single malformed identifier spoils the whole batch
+            log.debug(f"arXiv rejected a batch of {len(arxiv_keys)} identifiers ({exc}). Retrying one by one")
+            results = {}
+            for result in await asyncio.gather(*[self.fetch_arxiv([key]) for key in arxiv_keys]):
+                results.update(result)
+            return results
+        return {key: entries[strip_arxiv_version(key)] for key in arxiv_keys if strip_arxiv_version(key) in entries}
 
     async def arxiv_list(self,author_id):
-        url = "http://" + author_id + ".atom2"
-        async with httpx.AsyncClient() as client:
-            page = await client.get(url, follow_redirects=True)
+        """
+        The sorted arXiv identifiers of all articles of an arXiv public author identifier (e.g. arxiv.org/a/last_f_1).
+
+        Raises
+        ----------
+        ValueError
+            If the author feed could not be retrieved.
+        """
+        return sorted([arxiv_key async for arxiv_key in self.iter_arxiv_feed(author_id)])
+
+    async def iter_arxiv_feed(self,author_id):
+        """
+        Yield the arXiv identifiers (without version) in the Atom feed of an arXiv public author identifier while the
+        feed is downloaded.
+
+        Raises
+        ----------
+        ValueError
+            If the author feed could not be retrieved.
+        """
+        from lxml import etree
+        page = await self.get("http://" + author_id + ".atom2", stream=True, follow_redirects=True)
+        try:
+            if page.status_code != 200:
+                raise ValueError(f"status {page.status_code}")
+            parser = etree.XMLPullParser(events=("end",), tag=f"{{{ATOM}}}entry")
+            async for chunk in page.aiter_bytes():
+                parser.feed(chunk)
+                for _, element in parser.read_events():
+                    entry_id = element.findtext(f"{{{ATOM}}}id", default="")
+                    element.clear()
+                    if "/abs/" in entry_id:
+                        yield strip_arxiv_version(entry_id.split("/abs/")[-1].strip())
+            parser.close()
+        except (ValueError, httpx.HTTPError, etree.XMLSyntaxError) as exc:
+            raise ValueError(msg_not_found(author_id, "arXiv", reason=str(exc)))
+        finally:
+            await page.aclose()
+
+    async def iter_arxiv_list(self,author_ids):
+        """
+        Yield the arXiv identifiers of all articles of one or more arXiv public author identifiers, as soon as they
+        arrive.
+
+        The author feeds are downloaded concurrently and parsed incrementally (see iter_arxiv_feed()), so the identifiers
+        can be looked up (e.g. with iter_citations()) before the feeds are complete. Articles in several feeds are
+        yielded once. Feeds which cannot be retrieved are logged and skipped.
+
+        Parameters
+        ----------
+        author_ids : list of str
+            arXiv public author identifiers, e.g. arxiv.org/a/last_f_1.
+
+        Yields
+        ---------
+        arxiv_key : str
+        """
+        queue = asyncio.Queue()
+
+        async def feed(author_id):
             try:
-                tree = etree.fromstring(page.text.encode())
-                ids = []
-                for id in tree.xpath("//a:feed/a:entry/a:id", namespaces={'a': ATOM}):
-                    ids.append(re.search(r"abs\/([a-z0-9.]*)v", id.text).group(1))
-                ids.sort()
-                return ids
+                async for arxiv_key in self.iter_arxiv_feed(author_id):
+                    queue.put_nowait(arxiv_key)
             except Exception as exc:
-                reason = str(page.status_code) + "; " + exc.args[0]
-                raise ValueError(msg_not_found(author_id, "arXiv", reason=reason))
+                log.error(exc)
+            finally:
+                queue.put_nowait(None)
+
+        tasks = [asyncio.ensure_future(feed(author_id)) for author_id in dict.fromkeys(author_ids)]
+        seen = set()
+        try:
+            running = len(tasks)
+            while running:
+                arxiv_key = await queue.get()
+                if arxiv_key is None:
+                    running -= 1
+                elif arxiv_key not in seen:
+                    seen.add(arxiv_key)
+                    yield arxiv_key
+        finally:
+            for task in tasks:
+                task.cancel()
 
     async def citation_pubmed(self,pmid):
         doi = await self.get_doi(pmid=pmid)
@@ -421,9 +1120,11 @@ class Bibget():
         result.fields['pmid'] = pmid[5:]
         return result 
 
+    @cached_lookup("pubmed", entry=False)
     async def get_doi(self,pmid=None):
         """
-        Get a DOI from a PubMed ID.
+        Get a DOI from a PubMed ID. Concurrent lookups are resolved together in batches by fetch_pubmed(). If a batch
+        fails, the DOI is looked up on its own with pubmed_scrape().
 
         Parameters
         ----------
@@ -443,14 +1144,63 @@ class Bibget():
             raise ValueError("No PubMed ID provided.")
         if not re.match(RE_PMID, pmid):
             raise ValueError("Invalid PubMed ID.")
+        try:
+            doi = await self.pubmed_batcher.get(pmid)
+        except (httpx.HTTPError, ValueError, KeyError) as exc:
+            log.debug(f"{pmid}: Batched lookup on NCBI E-utilities failed ({exc!r}), using the PubMed website")
+            return await self.pubmed_scrape(pmid)
+        if doi is None:
+            raise ValueError(f"DOI not found for PubMed ID {pmid}!")
+        return doi
+
+    async def fetch_pubmed(self,pmids):
+        """
+        Get the DOIs of several PubMed IDs with a single request to the esummary endpoint of NCBI E-utilities.
+
+        Parameters
+        ----------
+        pmids : list of str
+            The PubMed IDs (PMID:xxxx).
+
+        Returns
+        ---------
+        dois : dict
+            Dictionary mapping the PubMed IDs with a DOI to the DOI.
+
+        Raises
+        ----------
+        ValueError
+            If E-utilities did not answer with document summaries.
+        """
+        params = {"db": "pubmed", "retmode": "json", "id": ",".join(pmid[5:] for pmid in pmids)}
+        if self.ncbi_api_key:
+            params["api_key"] = self.ncbi_api_key
+        page = await self.get("https://eutils.ncbi.nlm.nih.gov/entrez/eutils/esummary.fcgi", params=params)
+        if page.status_code != 200:
+            raise ValueError(f"eutils.ncbi.nlm.nih.gov responded with {page.status_code}")
+        with self.span("parse", format="json"):
+            result = page.json()["result"]
+        dois = {}
+        for pmid in pmids:
+            summary = result.get(pmid[5:], {})
+            ids = [article_id["value"] for article_id in summary.get("articleids", []) if article_id.get("idtype") == "doi"]
+            if not ids and (match := re.search(RE_DOI, summary.get("elocationid", ""))):
+                ids = [match.group(0)]
+            if ids:
+                dois[pmid] = ids[0]
+        return dois
+
+    async def pubmed_scrape(self,pmid):
+        """
+        Get a DOI from a PubMed ID using the MEDLINE record on the PubMed website, one request per PubMed ID.
+        """
         url = f"https://pubmed.ncbi.nlm.nih.gov/{pmid[5:]}/?format=pubmed"
-        async with httpx.AsyncClient() as client:
-            page = await client.get(url, follow_redirects=True)
-            try:
-                doi = re.search("AID - (10\.\d{4,9}\/[-._;()\/:A-Za-z0-9]+) \[doi\]", page.text)
-                return doi.group(1)
-            except Exception as exc:
-                raise ValueError(f"DOI not found for PubMed ID {pmid}!") from exc
+        page = await self.get(url, follow_redirects=True)
+        try:
+            doi = re.search(r"AID - (10\.\d{4,9}\/[-._;()\/:A-Za-z0-9]+) \[doi\]", page.text)
+            return doi.group(1)
+        except Exception as exc:
+            raise ValueError(f"DOI not found for PubMed ID {pmid}!") from exc
     
     async def prompt(self,entry,candidate=None,prefix=None):
         prompt = prefix + "Press"
@@ -464,21 +1214,87 @@ class Bibget():
         else:
             return await self.update(entry, candidate_doi=ans)
 
+    async def find_candidate(self,entry):
+        """
+        Look up a replacement for a bibentry without user interaction.
+
+        Entries with a DOI are looked up on MathSciNet, entries without DOI are searched by title, see lookup_title().
+
+        Parameters
+        ----------
+        entry : pybtex.database.Entry
+            The bibentry to be updated.
+
+        Returns
+        ---------
+        candidate : pybtex.database.Entry or None
+            The replacement, prepared by merge_candidate(), or None if no replacement was found.
+        prefix : str or None
+            If no replacement was found but the user should be asked for a DOI, the prompt prefix.
+
+        Raises
+        ---------
+        ValueError
+            If the entry could not be looked up: it has no DOI, its title is not in the title index and no Scopus API
+            key is configured.
+        httpx.HTTPError
+            If a lookup failed with a network error or an error status (including in offline mode), see get().
+        """
+        with self.span("update", key=entry.key):
+            title = latex_to_text(entry.fields["title"]) if "title" in entry.fields else None
+            if 'mrnumber' in entry.fields:
+                log.info(f"MR{entry.fields['mrnumber']} ({title}): Skipping MR entry")
+                return None, None
+            if 'doi' in entry.fields:
+                try:
+                    return merge_candidate(entry, await self.citation_msc(doi=entry.fields['doi'])), None
+                except ValueError:
+                    log.info(f"{entry.fields['doi']} ({title}): Not found on MathSciNet, leaving old citation")
+                    return None, None
+            if not title:
+                log.info(f"{entry.key}: No title found, leaving old citation")
+                return None, None
+            try:
+                candidate, similarity = await self.lookup_title(title, exclude_key=entry.key)
+                log.info(f'"{title}": Found "{latex_to_text(candidate.fields["title"])}" (similarity {similarity:.2f})')
+                return merge_candidate(entry, candidate), None
+            except ValueError as exc:
+                log.info(f'"{title}": {str(exc)}')
+                if not self.scopus:
+                    raise
+                return None, f'"{title}": No entry found on Scopus. '
+
+    async def review(self,entry,candidate=None,prefix=None,mode="interactive"):
+        """
+        Decide whether to replace a bibentry by the result of find_candidate().
+
+        Parameters
+        ----------
+        mode : str, optional
+            "interactive" asks the user, "accept" replaces the entry by any candidate found,
+            "report" only prints the candidates and keeps the entry. The default is "interactive".
+
+        Returns
+        ---------
+        entry : pybtex.database.Entry
+            The old or the replaced bibentry.
+        """
+        if candidate:
+            print("Found the following replacement:" if mode != "report" else f"{entry.key}: Found the following replacement:")
+            column_print(entry_to_string(entry), entry_to_string(candidate))
+            if mode == "accept":
+                return candidate
+            if mode == "interactive":
+                return await self.prompt(entry,candidate=candidate,prefix="Replace old citation? ")
+        elif prefix:
+            if mode == "interactive":
+                return await self.prompt(entry, prefix=prefix)
+            print(f"{entry.key}: {prefix}Leaving old citation.")
+        return entry
+
     async def update(self,entry,candidate=None,candidate_doi=None):
-        title = LatexNodes2Text(math_mode='verbatim').latex_to_text(entry.fields["title"]) if "title" in entry.fields else None
-        if 'mrnumber' in entry.fields:
-            log.info(f"MR{entry.fields['mrnumber']} ({title}): Skipping MR entry")
-            return entry
         if candidate:
-            candidate.key = entry.key    
-            if 'eprint' in entry.fields:
-                candidate.fields['eprint'] = entry.fields['eprint']
-                candidate.fields['archiveprefix'] = entry.fields['archiveprefix']
-            if 'pmid' in entry.fields and 'pmid' not in candidate.fields:
-                candidate.fields['pmid'] = entry.fields['pmid']
-            print("Found the following replacement:")
-            column_print(entry.to_string('bibtex'), candidate.to_string('bibtex'))
-            return await self.prompt(entry,candidate=candidate,prefix="Replace old citation? ")
+            return await self.review(entry, merge_candidate(entry, candidate))
         if candidate_doi:
             if not re.match(RE_DOI, candidate_doi):
                 return await self.prompt(entry,prefix="Invalid DOI! ")
@@ -489,50 +1305,382 @@ class Bibget():
                 print(f"{candidate_doi}: No citation found; leaving old citation")
                 print(exc)
                 return entry
-        if 'doi' in entry.fields and 'mrnumber' not in entry.fields:
+        return await self.review(entry, *await self.find_candidate(entry))
+
+    async def update_entries(self,entries,mode="interactive"):
+        """
+        Update bibentries.
+
+        Replacement candidates for all entries are looked up concurrently first (within the rate limits of each
+        host), then the candidates are reviewed one by one, see review().
+
+        Parameters
+        ----------
+        entries : dict
+            Dictionary of pybtex.database.Entry objects.
+        mode : str, optional
+            "interactive", "accept" or "report", see review(). The default is "interactive".
+
+        Returns
+        ---------
+        updates : dict
+            Dictionary mapping the keys of entries to pairs (entry, decision) of the old or replaced bibentry and the
+            decision: "replaced", "kept" (if a replacement was found but rejected), "unchanged" (if none was found),
+            "unchecked" (if the entry could not be looked up, see find_candidate()) or "error" (if a lookup failed).
+        """
+        if mode == "interactive" and not self.offline:
+            while not self.scopus and entries:
+                self.setup_scopus(f"Scopus is required for 'pybibupdate' and requires an API key. Please register at https://dev.elsevier.com/ and enter your API key below.\n")
+        elif not self.scopus and not self.offline:
+            log.warning("No Scopus API key configured, only entries with a DOI are checked (on MathSciNet)")
+
+        done = 0
+        async def find_candidate(entry):
+            nonlocal done
             try:
-                updated_entry = await self.citation_msc(doi=entry.fields['doi'])
-                return await self.update(entry,updated_entry)
-            except:
-                log.info(f"{entry.fields['doi']} ({title}): Not found on MathSciNet, leaving old citation")
-                return entry
-        if not title:
-            log.info(f"{entry.key}: No title found, leaving old citation")
-            return entry
-        try:
-            log.info(f'"{title}": Checking for DOI on Scopus')
-            updated_entry = await self.lookup_scopus(title)
-            return await self.update(entry, candidate=updated_entry)
-        except Exception as exc:
-            log.debug(f'"{title}": {str(exc)}')
-            return await self.prompt(entry, prefix=f'"{title}": No entry found on Scopus. ')
+                return await self.find_candidate(entry)
+            except ValueError:
+                return "unchecked"
+            except Exception as exc:
+                log.warning(f"{entry.key}: Could not be checked ({str(exc) or type(exc).__name__})")
+                return "error"
+            finally:
+                done += 1
+                print(f"\rLooked up {done}/{len(entries)} entries", end="\n" if done == len(entries) else "", file=sys.stderr, flush=True)
+        candidates = await asyncio.gather(*[find_candidate(entry) for entry in entries.values()])
+
+        updates = {}
+        for (key,entry), result in zip(entries.items(), candidates):
+            if isinstance(result, str):
+                updates[key] = entry, result
+                continue
+            candidate, prefix = result
+            updated = await self.review(entry, candidate, prefix, mode=mode)
+            updates[key] = updated, "replaced" if updated is not entry else "kept" if candidate or prefix else "unchanged"
+        if mode != "interactive":
+            replaced = sum(not isinstance(result, str) and result[0] is not None for result in candidates)
+            print(f"Found replacements for {replaced} of {len(entries)} entries.")
+        return updates
 
-    async def update_all(self,bibliography):
-        while not self.scopus:
-            self.setup_scopus(f"Scopus is required for 'pybibupdate' and requires an API key. Please register at https://dev.elsevier.com/ and enter your API key below.\n")
+    async def update_all(self,bibliography,mode="interactive"):
+        """
+        Update all entries of a bibliography, see update_entries().
 
+        Parameters
+        ----------
+        bibliography : dict
+            Dictionary of pybtex.database.Entry objects.
+        mode : str, optional
+            "interactive", "accept" or "report", see review(). The default is "interactive".
+
+        Returns
+        ---------
+        updated_bibliography : pybtex.database.BibliographyData
+        """
+        updates = await self.update_entries(bibliography, mode=mode)
         updated_bibliography = BibliographyData()
-        for key,entry in bibliography.items():
-            updated_bibliography.entries[key] = await self.update(entry)
-        
+        for key, entry in bibliography.items():
+            updated_bibliography.entries[key], _ = updates.get(key, (entry, None))
         return updated_bibliography
 
+    async def update_file(self,bib_file,mode="interactive",state=None):
+        """
+        Update the entries of a .bib file, see update_entries(). Only the entries to be checked are parsed.
+
+        Parameters
+        ----------
+        bib_file : pybibget.bibfile.BibFile
+            The .bib file. It is not modified, see pybibget.bibfile.BibFile.write().
+        mode : str, optional
+            "interactive", "accept" or "report", see review(). The default is "interactive".
+        state : pybibget.state.UpdateState, optional
+            Entries which are unchanged since they were last checked (within state.max_age) are skipped, and the
+            decisions for the checked entries are recorded in state (except in "report" mode). Entries are fingerprinted
+            as they appear in the file, replaced entries as they will be written (see pybibget.bibfile.entry_text()).
+            Entries which were not checked ("unchecked" or "error") are not recorded.
+            The default is None.
+
+        Returns
+        ---------
+        updates : dict
+            Dictionary mapping the checked citation keys to (bibentry, decision), see update_entries().
+        """
+        from pybibget.bibfile import entry_text
+        fingerprints = {key: bib_file.fingerprint(key) for key in bib_file}
+        pending = list(bib_file)
+        if state is not None:
+            pending = [key for key in bib_file if not state.is_current(key, fingerprints[key])]
+            if len(pending) < len(bib_file):
+                print(f"Skipping {len(bib_file) - len(pending)} entries checked within the last {state.max_age:g} days", file=sys.stderr)
+        updates = await self.update_entries(bib_file.entries(pending), mode=mode)
+        if state is not None and mode != "report":
+            for key, (entry, decision) in updates.items():
+                if decision in ("unchecked", "error"):
+                    continue
+                state.record(key, fingerprint(entry_text(entry, key)) if decision == "replaced" else fingerprints[key], decision)
+            state.prune(fingerprints)
+        return updates
+
+    async def lookup_title(self,title,exclude_key=None):
+        """
+        Find the bibentry with a given (plain text) title.
+
+        The title index (see titles) is tried first, skipping entries with the citation key exclude_key. Scopus is only
+        searched if no indexed title has a similarity of at least title_threshold (the "title_match_threshold" entry of
+        config.json, default 0.8), see pybibget.titles.
+
+        Returns
+        ---------
+        bibentry : pybtex.database.Entry
+        similarity : float
+            Similarity of the title of bibentry to title, between 0 and 1.
+        """
+        if self.titles is not None and (match := self.titles.find(title, self.title_threshold, exclude_key=exclude_key)):
+            bibtex, similarity = match
+            log.debug(f'"{title}": Found in the title index')
+            return entry_from_string(bibtex), similarity
+        if not self.scopus:
+            raise ValueError('No match in the title index and no Scopus API key')
+        log.info(f'"{title}": Checking for DOI on Scopus')
+        return await self.lookup_scopus(title)
+
     async def lookup_scopus(self,title):
+        """
+        Search Scopus for a (plain text) title, and look up the DOI of the result with the most similar title on
+        MathSciNet or Scopus. Results with a similarity below title_threshold are rejected.
+
+        Returns
+        ---------
+        bibentry : pybtex.database.Entry
+        similarity : float
+        """
         url = "https://api.elsevier.com/content/search/scopus?query=TITLE%28%22" + parse.quote(title,safe="") + "%22%29"
         url += "&apiKey=" + self.api_key
         headers = {'Accept': 'application/json; charset=utf-8'}
-        async with httpx.AsyncClient() as client:
-            async with self.rate_limit:
-                page = await client.get(url, headers=headers, follow_redirects=True)
-                try: 
-                    results = page.json()
-                    doi = results['search-results']['entry'][0]['prism:doi']
-                    try:
-                        return await self.citation_msc(doi)
-                    except Exception as exc:
-                        return await self.citation_scopus(doi=doi)
-                except Exception as exc:   
-                    raise ValueError(msg_not_found(title, "Scopus", reason=str(exc)))
+        page = await self.get(url, headers=headers, follow_redirects=True)
+        try: 
+            results = [result for result in page.json()['search-results']['entry'] if result.get('prism:doi') and result.get('dc:title')]
+            if not results:
+                raise ValueError("No results with DOI")
+            similarity, doi, found = max((title_similarity(title, result['dc:title']), result['prism:doi'], result['dc:title']) for result in results)
+            if similarity < self.title_threshold:
+                raise ValueError(f'Best match "{found}" has similarity {similarity:.2f}')
+            try:
+                return await self.citation_msc(doi=doi), similarity
+            except Exception as exc:
+                return await self.citation_scopus(doi=doi), similarity
+        except Exception as exc:   
+            raise ValueError(msg_not_found(title, "Scopus", reason=str(exc)))
+
+
+def strip_arxiv_version(arxiv_key):
+    """
+    Remove the version suffix (e.g. v2) from an arXiv identifier.
+    """
+    return re.sub(r'v\d+$', '', arxiv_key)
+
+
+def parse_arxiv_feed(text):
+    """
+    Parse an arXiv API Atom feed.
+
+    Returns
+    ---------
+    entries : dict
+        Dictionary mapping arXiv identifiers (without version) to dictionaries with the keys doi, title, journal, published
+        and authors. Entries without title and DOI are skipped.
+
+    Raises
+    ----------
+    ValueError
+        If arXiv returned an error instead of entries.
+    """
+    from lxml import etree
+    tree = etree.fromstring(text.encode())
+    namespaces = {'a': ATOM, 'b': ARXIV}
+    entries = {}
+    for entry in tree.xpath("//a:entry", namespaces=namespaces):
+        entry_id = entry.findtext("a:id", default="", namespaces=namespaces)
+        if "/api/errors" in entry_id:
+            raise ValueError(entry.findtext("a:summary", default="arXiv API error", namespaces=namespaces).strip())
+        doi = entry.findtext("b:doi", namespaces=namespaces)
+        title = entry.findtext("a:title", namespaces=namespaces)
+        if not doi and not title:
+            continue
+        arxiv_key = strip_arxiv_version(entry_id.split("/abs/")[-1])
+        entries[arxiv_key] = {
+            "doi": doi,
+            "title": title,
+            "journal": entry.findtext("a:journal", namespaces=namespaces),
+            "published": entry.findtext("a:published", default="", namespaces=namespaces),
+            "authors": [author.text for author in entry.xpath("a:author/a:name", namespaces=namespaces)],
+        }
+    return entries
+
+
+def parse_msc_page(text):
+    """
+    Parse a MathSciNet search result page in BibTeX format.
+
+    Returns
+    ---------
+    bibentry : pybtex.database.Entry
+        The first entry of the page.
+    number_of_entries : int
+
+    Raises
+    ----------
+    ValueError
+        If the page contains no entry, with the title of the page as message.
+    """
+    from lxml import html
+    tree = html.fromstring(text)
+    bibstrings = tree.xpath('//pre/text()')
+    if not bibstrings:
+        raise ValueError("".join(tree.xpath('//head/title/text()')).replace("\n", ""))
+    return list(parse_bibtex(bibstrings[0]).entries.values())[0], len(bibstrings)
+
+
+def parse_bibtex_entry(text):
+    """
+    Parse and sanitize the first entry of a BibTeX string, see sanitize_entry().
+    """
+    return sanitize_entry(list(parse_bibtex(text).entries.values())[0])
+
+
+def parse_scopus(text, key, doi=None, pmid=None):
+    """
+    Create a bibentry from a Scopus abstract retrieval response (JSON) for a DOI or PMID (key is the one which was
+    looked up).
+    """
+    results = json.loads(text)
+    results_bib = results['abstracts-retrieval-response']['item']['bibrecord']['head']
+    fields = {}
+    citation_type = results_bib['source']['@type']
+    fields['title'] = results_bib['citation-title']
+    author_flat = []
+    author_groups = results_bib['author-group']
+    if type(author_groups) is not list:
+        author_groups = [author_groups]
+    for author_group in author_groups:
+        authors = author_group['author']
+        if type(authors) is not list:
+            authors = [authors]
+        for author in authors:
+            author_flat.append(f"{author['preferred-name']['ce:surname']}, {author['preferred-name']['ce:given-name']}")
+    fields['author'] = [Person(author) for author in author_flat]
+    try: 
+        fields['year'] = list(results_bib['source']['publicationyear'].values())[0]
+    except Exception as e:
+        log.warning(str(e))
+    if pmid:
+        doi = results['abstracts-retrieval-response']['coredata']['prism:doi']
+    fields['doi'] = doi
+    fields['url'] = "https://doi.org/" + doi
+    if citation_type == 'j':
+        citation_type = 'article'
+        fields['journal'] = results_bib['source']['sourcetitle-abbrev'] if 'sourcetitle-abbrev' in results_bib['source'] else results_bib['source']['sourcetitle']
+        try:
+            fields['volume'] = results_bib['source']['volisspag']['voliss']['@volume']
+            fields['number'] = results_bib['source']['volisspag']['voliss']['@issue']
+        except KeyError as e:
+            log.info(f"{key}: No volume or issue found on Scopus.")
+        try: 
+            fields['pages'] = '--'.join(results_bib['source']['volisspag']['pagerange'].values())
+        except KeyError as e:
+            log.info(f"{key}: No page range found on Scopus.")
+    elif citation_type in ['p','k']:
+        citation_type = 'inproceedings' if citation_type == 'p' else 'incollection'
+        fields['publisher'] = results_bib['source']['publisher']['publishername']
+        fields['booktitle'] = results_bib['source']['sourcetitle-abbrev']
+    elif citation_type == 'b':
+        citation_type = 'book'
+        fields['publisher'] = results_bib['source']['publisher']['publishername']
+        fields['title'] = results_bib['source']['sourcetitle']
+        try:
+            fields['pages'] = results_bib['source']['volisspag']['pagerange']['@last']
+        except:
+            log.warning(f"{key}: Number of pages not found on Scopus.") 
+    else:
+        raise ValueError("Unknown citation type: " + citation_type)
+    if pmid:
+        fields['pmid'] = pmid[5:]
+    else:
+        try: 
+            fields['pmid'] = results['abstracts-retrieval-response']['coredata']['pubmed-id']
+        except:
+            pass
+    return create_bibentry(citation_type ,**fields)
+
+
+def arxiv_entry(metadata):
+    """
+    Create a bibentry for an arXiv preprint without DOI from its metadata, see parse_arxiv_feed().
+    """
+    fields = [("title", metadata["title"]), ("note", metadata["journal"] or "Preprint"), ("year", metadata["published"][:4])]
+    bibentry = Entry("unpublished", fields=fields)
+    bibentry.persons["author"] = [Person(author) for author in metadata["authors"]]
+    return sanitize_entry(bibentry)
+
+
+def crossref_entry(item):
+    """
+    Create a bibentry from Crossref metadata (an item of the /works endpoint), with the same fields as the BibTeX
+    transform of Crossref (see Bibget.crossref_transform()), sanitized by sanitize_entry().
+    """
+    entry_type = CROSSREF_TYPES.get(item.get("type"), "misc")
+    container = next(iter(item.get("container-title") or []), None)
+    authors = [f"{author['family']}, {author['given']}" if "given" in author else author.get("family") or author.get("name")
+               for author in item.get("author", [])]
+    date = next((item[key]["date-parts"][0] for key in ("published-print", "published-online", "issued")
+                 if item.get(key, {}).get("date-parts", [[None]])[0][0]), [None])
+    fields = {
+        "title": next(iter(item.get("title") or []), None),
+        "volume": item.get("volume"),
+        "ISSN": next(iter(item.get("ISSN") or []), None),
+        "url": "http://dx.doi.org/" + item["DOI"],
+        "DOI": item["DOI"],
+        "number": item.get("issue"),
+        "journal" if entry_type == "article" else "booktitle": container if entry_type in ("article", "inproceedings", "incollection") else None,
+        "publisher": item.get("publisher"),
+        "year": str(date[0]) if date[0] else None,
+        "pages": item["page"].replace("-", "--") if "page" in item else None,
+    }
+    key = f"{item['author'][0].get('family', '')}_{date[0]}" if item.get("author") and date[0] else ""
+    entry = create_bibentry(entry_type, sanitize=False, key=key, **{name: value for name, value in fields.items() if value})
+    if authors:
+        entry.persons["author"] = [Person(author) for author in authors if author]
+    return sanitize_entry(entry)
+
+
+def merge_candidate(entry, candidate):
+    """
+    Prepare a replacement candidate for entry: Keeps the citation key, the arXiv identifier and the PubMed ID of the old entry.
+    """
+    candidate.key = entry.key
+    if 'eprint' in entry.fields:
+        candidate.fields['eprint'] = entry.fields['eprint']
+        candidate.fields['archiveprefix'] = entry.fields['archiveprefix']
+    if 'pmid' in entry.fields and 'pmid' not in candidate.fields:
+        candidate.fields['pmid'] = entry.fields['pmid']
+    return candidate
+
+
+@functools.lru_cache(maxsize=None)
+def latex_converter():
+    """
+    Shared LatexNodes2Text instance.
+    """
+    from pylatexenc.latex2text import LatexNodes2Text
+    return LatexNodes2Text(math_mode='verbatim')
+
+
+@functools.lru_cache(maxsize=SANITIZE_CACHE_SIZE)
+def latex_to_text(string):
+    """
+    Convert LaTeX to plain text.
+    """
+    return latex_converter().latex_to_text(string)
 
 
 def sanitize_entry(entry):
@@ -552,13 +1700,26 @@ def sanitize_entry(entry):
     return entry
 
 
+def sanitize_bibliography(bib_data):
+    """
+    Sanitize all entries of a pybtex.database.BibliographyData in place, see sanitize_entry(). Strings which repeat
+    across the entries (journal and author names) are converted only once, see sanitize_string().
+    """
+    for entry in bib_data.entries.values():
+        sanitize_entry(entry)
+    return bib_data
+
+
+@functools.lru_cache(maxsize=SANITIZE_CACHE_SIZE)
 def sanitize_string(string, title=False):
     """
     Sanitize a string: Removes newlines and tabs, and converts unicode characters to LaTeX. If title is True, also protects title capitalization.
+    Results are cached since journal and author names repeat a lot.
     """
     string = string.replace("\n", "").replace("\t", "").replace("\\\\","\\")
-    string = LatexNodes2Text(math_mode='verbatim').latex_to_text(string)
+    from pylatexenc.latexencode import unicode_to_latex
+    string = latex_converter().latex_to_text(string)
     string = unicode_to_latex(string,non_ascii_only=True)
     if title:
-        string = re.sub(r'\b([A-Z].*?)\b',r'{\1}',string)
-    return string
\ No newline at end of file
+        string = RE_TITLE_WORD.sub(r'{\1}',string)
+    return string
@@ -0,0 +1,295 @@
+import os
+import re
+import mmap
+import json
+import shutil
+import hashlib
+import tempfile
+import logging as log
+from typing import NamedTuple
+from pybibget.state import fingerprint
+from pybibget.keys import clean_key, classify_key, normalize_key
+
+ENTRY_START = re.compile(rb'@[ \t\r\n]*([A-Za-z][\w\-]*)[ \t\r\n]*([{(])')
+BRACES = re.compile(rb'[{}]')
+BRACES_PARENS = re.compile(rb'[{}()]')
+ENTRY_KEY = re.compile(rb'[ \t\r\n]*([^,\s})]*)')
+NON_ENTRIES = {"comment", "preamble", "string"}
+IDENTIFIER_FIELD = re.compile(rb'(?<![\w\-])(doi|eprint|mrnumber|pmid)[ \t\r\n]*=[ \t\r\n]*[{"]?[ \t\r\n]*([^,{}"\s]+)', re.IGNORECASE)
+INDEX_VERSION = 1
+
+
+class BibSpan(NamedTuple):
+    """
+    Location of an @-block in a .bib file: data[start:end] runs from the "@" to the closing brace (or parenthesis).
+    key is None for @comment, @preamble and @string.
+    """
+    entry_type: str
+    key: str
+    start: int
+    end: int
+
+
+def scan_bib(data, start=0):
+    """
+    Find the @-blocks of a .bib file without parsing their fields.
+
+    Like BibTeX, braces must be balanced within a block, and text outside of blocks is ignored. A block which is not
+    closed until the end of data is not reported.
+
+    Parameters
+    ----------
+    data : bytes-like
+        The contents of the .bib file, e.g. an mmap.
+    start : int, optional
+        Offset at which to start scanning. The default is 0.
+
+    Yields
+    ---------
+    span : BibSpan
+    """
+    pos = start
+    while (match := ENTRY_START.search(data, pos)):
+        entry_type = match.group(1).decode("ascii").lower()
+        parens = match.group(2) == b"("
+        depth = 0 if parens else 1
+        end = None
+        for brace in (BRACES_PARENS if parens else BRACES).finditer(data, match.end()):
+            char = brace.group(0)
+            if char == b"{":
+                depth += 1
+            elif char == b"}":
+                depth -= 1
+                if depth == 0 and not parens:
+                    end = brace.end()
+                    break
+            elif char == b")" and depth == 0:
+                end = brace.end()
+                break
+        if end is None:
+            line = data[:match.start()].count(b"\n") + 1
+            log.warning(f"Unbalanced braces in the @{entry_type} starting on line {line}, ignoring the rest of the file")
+            return
+        key = None
+        if entry_type not in NON_ENTRIES:
+            key = ENTRY_KEY.match(data, match.end()).group(1).decode("utf-8", errors="replace")
+        yield BibSpan(entry_type, key, match.start(), end)
+        pos = end
+
+
+class BibFile():
+    """
+    A .bib file, scanned for entry boundaries (see scan_bib()) but not parsed.
+
+    The file is memory mapped. Entries are only parsed when requested (entry()), and write() copies all entries which are
+    not replaced byte by byte, so that their formatting is preserved. Use as context manager, or call close().
+
+    Parameters
+    ----------
+    path : str
+        Location of the .bib file.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+        size = os.fstat(self.file.fileno()).st_size
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        self.spans = {}
+        self.strings = []
+        for span in scan_bib(self.data):
+            if span.entry_type == "string":
+                self.strings.append(span)
+            elif span.key is None:
+                continue
+            elif span.key in self.spans:
+                log.warning(f"{path}: Duplicate entry {span.key}, only the first one is used")
+            else:
+                self.spans[span.key] = span
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return len(self.spans)
+
+    def __iter__(self):
+        return iter(self.spans)
+
+    def __contains__(self, key):
+        return key in self.spans
+
+    def raw(self, key):
+        """
+        The entry key as it appears in the file (bytes).
+        """
+        span = self.spans[key]
+        return self.data[span.start:span.end]
+
+    def fingerprint(self, key):
+        """
+        Fingerprint of the entry as it appears in the file, see pybibget.state.fingerprint().
+        """
+        return fingerprint(self.raw(key))
+
+    def entry(self, key):
+        """
+        Parse the entry key (together with the @string definitions of the file).
+
+        Returns
+        ---------
+        bibentry : pybtex.database.Entry
+        """
+        from pybibget.bibentry import parse_bibtex
+        text = b"\n".join([self.data[span.start:span.end] for span in self.strings] + [self.raw(key)])
+        return list(parse_bibtex(text.decode("utf-8")).entries.values())[0]
+
+    def entries(self, keys=None):
+        """
+        Dictionary of parsed entries, for all keys (default) or the given ones.
+        """
+        return {key: self.entry(key) for key in (self.spans if keys is None else keys)}
+
+    def write(self, replacements, path=None):
+        """
+        Write the file with some entries replaced, and close it.
+
+        Entries which are not replaced, and all text between entries, are copied unchanged. The file is written to a
+        temporary file first, which then replaces the target, so that the target is never left partially written.
+
+        Parameters
+        ----------
+        replacements : dict
+            Dictionary mapping citation keys of this file to pybtex.database.Entry objects, serialized with entry_text().
+        path : str, optional
+            Target file. The default is the file itself.
+        """
+        path = path or self.path
+        directory = os.path.dirname(os.path.abspath(path))
+        replaced = sorted(((self.spans[key], entry_text(entry, key)) for key, entry in replacements.items()), key=lambda item: item[0].start)
+        with tempfile.NamedTemporaryFile("wb", dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp", delete=False) as out:
+            try:
+                with memoryview(self.data) as view:
+                    pos = 0
+                    for span, text in replaced:
+                        out.write(view[pos:span.start])
+                        out.write(text.encode("utf-8"))
+                        pos = span.end
+                    out.write(view[pos:])
+                out.flush()
+                os.fsync(out.fileno())
+                if os.path.exists(path):
+                    shutil.copymode(path, out.name)
+            except BaseException:
+                os.unlink(out.name)
+                raise
+        self.close()
+        os.replace(out.name, path)
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        self.data = b""
+        self.file.close()
+
+
+def entry_text(entry, key=None):
+    """
+    Serialize a bibentry to the BibTeX text written to .bib files, from the "@" to the closing brace.
+    """
+    from pybibget.bibentry import entry_to_string
+    return entry_to_string(entry, key).strip()
+
+
+def entry_identifiers(raw):
+    """
+    The normalized identifiers (see pybibget.keys.normalize_key()) in the doi, eprint, mrnumber and pmid fields of an
+    entry, given as raw bytes from a .bib file.
+    """
+    identifiers = []
+    for field, value in IDENTIFIER_FIELD.findall(raw):
+        field, value = field.lower(), value.decode("utf-8", errors="replace")
+        if field == b"mrnumber":
+            value = "MR" + re.sub(r'^MR', '', value.upper())
+        elif field == b"pmid":
+            value = "PMID:" + value
+        value = clean_key(value)
+        if (backend := classify_key(value)):
+            identifiers.append(normalize_key(value, backend))
+    return identifiers
+
+
+class BibIndex():
+    """
+    Citation keys and identifiers (DOI, arXiv, MathSciNet and PubMed IDs) of the entries of a .bib file.
+
+    load() caches the index in the user cache directory, and rebuilds it only if the modification time or size of the
+    .bib file changed.
+
+    Parameters
+    ----------
+    keys : iterable of str
+        The citation keys of the file.
+    identifiers : dict
+        Dictionary mapping normalized identifiers to the citation key of the first entry containing them.
+    """
+    def __init__(self, keys=(), identifiers=None):
+        self.keys = {key.lower(): key for key in keys}
+        self.identifiers = identifiers or {}
+
+    @classmethod
+    def build(cls, path):
+        """
+        Scan the .bib file path, see scan_bib().
+        """
+        index = cls()
+        with BibFile(path) as bib_file:
+            for key in bib_file:
+                index.keys[key.lower()] = key
+                for identifier in entry_identifiers(bib_file.raw(key)):
+                    index.identifiers.setdefault(identifier, key)
+        return index
+
+    @classmethod
+    def load(cls, path, cache_dir=None):
+        """
+        The index of the .bib file path, from the cache in cache_dir (default: the user cache directory) if up to date.
+        """
+        if cache_dir is None:
+            from appdirs import AppDirs
+            cache_dir = os.path.join(AppDirs("pybibget", "pybibget").user_cache_dir, "bibindex")
+        path = os.path.abspath(path)
+        cache_file = os.path.join(cache_dir, hashlib.sha1(path.encode()).hexdigest() + ".json")
+        stat = os.stat(path)
+        try:
+            with open(cache_file) as file:
+                cached = json.load(file)
+            if [cached["version"], cached["path"], cached["mtime_ns"], cached["size"]] == [INDEX_VERSION, path, stat.st_mtime_ns, stat.st_size]:
+                return cls(cached["keys"], cached["identifiers"])
+        except (OSError, ValueError, KeyError):
+            pass
+        log.debug(f"Indexing {path}")
+        index = cls.build(path)
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            with tempfile.NamedTemporaryFile("w", dir=cache_dir, suffix=".tmp", delete=False) as file:
+                json.dump({"version": INDEX_VERSION, "path": path, "mtime_ns": stat.st_mtime_ns, "size": stat.st_size,
+                           "keys": list(index.keys.values()), "identifiers": index.identifiers}, file)
+            os.replace(file.name, cache_file)
+        except OSError as exc:
+            log.debug(f"Could not cache the index of {path} ({exc})")
+        return index
+
+    def lookup(self, key):
+        """
+        The citation key of the entry answering the citation key key: key itself (up to case) if the file contains it,
+        otherwise the key of an entry with the same identifier, or None.
+        """
+        if key.lower() in self.keys:
+            return self.keys[key.lower()]
+        key = clean_key(key)
+        if (backend := classify_key(key)):
+            return self.identifiers.get(normalize_key(key, backend))
+        return None
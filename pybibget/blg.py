@@ -0,0 +1,61 @@
+import os
+import re
+import glob
+
+# One pass over the .blg file (of BibTeX or biber) finds both the missing citation keys and the .bib files
+BLG_PATTERN = re.compile(
+    r"I didn't find a database entry for (?:'(?P<missing>[A-Za-z0-9\.\-_ :\/]*)'|\"(?P<missing_quoted>[A-Za-z0-9\.\-_ :\/]*)\")"
+    r"|Found BibTeX data source '(?P<biber_source>[A-Za-z0-9.\-_\/]*)'"
+    r"|Looking for bibtex file '(?P<biber_file>[A-Za-z0-9.\-_\/]*)'"
+    r"|Database file #\d: (?P<database>[A-Za-z0-9.\-_\/]*)\n"
+    r"|I couldn't open database file (?P<unopened>[A-Za-z0-9.\-_\/]*)\n")
+
+
+def scan_blg(text):
+    """
+    Find the missing citation keys and the .bib files in the log of BibTeX or biber (.blg file).
+
+    Returns
+    ---------
+    missing_cites : list of str
+        The citation keys without database entry, in order of appearance.
+    bib_file_names : list of str
+        The .bib files, as given in the log, in order of appearance.
+    """
+    missing_cites, bib_file_names = [], []
+    for match in BLG_PATTERN.finditer(text):
+        (missing_cites if match.lastgroup in ("missing", "missing_quoted") else bib_file_names).append(match.group(match.lastgroup))
+    return missing_cites, bib_file_names
+
+
+def base_name(file_name):
+    """
+    The name of a LaTeX document without the extension .tex or .blg.
+    """
+    root, extension = os.path.splitext(file_name)
+    return root if extension in (".tex", ".blg") else file_name
+
+
+def find_documents(patterns):
+    """
+    Expand documents, directories (searched recursively for .blg files) and glob patterns to document base names
+    (see base_name()), without duplicates.
+    """
+    documents = {}
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            file_names = sorted(glob.glob(os.path.join(pattern, "**", "*.blg"), recursive=True))
+        elif any(char in pattern for char in "*?["):
+            file_names = sorted(name for name in glob.glob(pattern, recursive=True) if name.endswith((".tex", ".blg")))
+        else:
+            file_names = [pattern]
+        documents.update((base_name(name), None) for name in file_names)
+    return list(documents)
+
+
+def resolve_bib_file(bib_file_name, blg_file_name):
+    """
+    Locate a .bib file named in a .blg file: relative to the directory of the .blg file, where bibtex/biber ran. The
+    file is created there if it does not exist.
+    """
+    return os.path.join(os.path.dirname(blg_file_name), bib_file_name)
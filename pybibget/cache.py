@@ -0,0 +1,104 @@
+import os
+import sqlite3
+import time
+import logging as log
+from pybibget.keys import normalize_key
+
+DAY = 24 * 60 * 60
+DEFAULT_TTL = {
+    "mathscinet": 180 * DAY,
+    "crossref": 90 * DAY,
+    "scopus": 90 * DAY,
+    "arxiv": 14 * DAY,
+    "pubmed": 365 * DAY,
+}
+DEFAULT_NEGATIVE_TTL = 1 * DAY
+DEFAULT_MAX_ENTRIES = 100000
+
+
+class LookupCache():
+    """
+    Persistent SQLite cache of backend lookups.
+
+    Results are keyed by backend and normalized identifier. Successful lookups store the result
+    (a BibTeX string or DOI), failed lookups store the error message so that identifiers which are
+    known to be missing are not looked up again until their (shorter) negative TTL expires.
+    The least recently used results are evicted once the cache holds more than max_entries.
+
+    Parameters
+    ----------
+    path : str
+        Location of the SQLite database.
+    ttl : dict, optional
+        Time to live in seconds per backend. Backends without entry use DEFAULT_TTL.
+    negative_ttl : float, optional
+        Time to live in seconds of not-found results. The default is one day.
+    max_entries : int, optional
+        Maximum number of cached results. The default is 100000.
+    """
+    def __init__(self, path, ttl=None, negative_ttl=DEFAULT_NEGATIVE_TTL, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.ttl = {**DEFAULT_TTL, **(ttl or {})}
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self._writes = 0
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.db = sqlite3.connect(path, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("""CREATE TABLE IF NOT EXISTS lookups (
+            backend TEXT NOT NULL,
+            identifier TEXT NOT NULL,
+            value TEXT,
+            error TEXT,
+            created REAL NOT NULL,
+            accessed REAL NOT NULL,
+            PRIMARY KEY (backend, identifier))""")
+        self.db.execute("CREATE INDEX IF NOT EXISTS lookups_accessed ON lookups (accessed)")
+
+    def get(self, backend, identifier):
+        """
+        Look up a cached result.
+
+        Returns
+        ---------
+        result : tuple or None
+            (value, error) if a non-expired result is cached, None otherwise. Exactly one of value and error is not None.
+        """
+        identifier = normalize_key(identifier)
+        row = self.db.execute("SELECT value, error, created FROM lookups WHERE backend = ? AND identifier = ?", (backend, identifier)).fetchone()
+        if row is None:
+            return None
+        value, error, created = row
+        now = time.time()
+        ttl = self.negative_ttl if error is not None else self.ttl.get(backend, 0)
+        if created + ttl < now:
+            self.db.execute("DELETE FROM lookups WHERE backend = ? AND identifier = ?", (backend, identifier))
+            return None
+        self.db.execute("UPDATE lookups SET accessed = ? WHERE backend = ? AND identifier = ?", (now, backend, identifier))
+        return value, error
+
+    def set(self, backend, identifier, value=None, error=None):
+        """
+        Store a result (value) or a not-found result (error).
+        """
+        now = time.time()
+        self.db.execute("INSERT OR REPLACE INTO lookups VALUES (?, ?, ?, ?, ?, ?)", (backend, normalize_key(identifier), value, error, now, now))
+        self._writes += 1
+        if self._writes % 100 == 0:
+            self.evict()
+
+    def evict(self):
+        """
+        Remove the least recently used results exceeding max_entries.
+        """
+        count = self.db.execute("SELECT COUNT(*) FROM lookups").fetchone()[0]
+        if count > self.max_entries:
+            log.debug(f"Evicting {count - self.max_entries} entries from the lookup cache")
+            self.db.execute("DELETE FROM lookups WHERE rowid IN (SELECT rowid FROM lookups ORDER BY accessed LIMIT ?)", (count - self.max_entries,))
+
+    def clear(self):
+        self.db.execute("DELETE FROM lookups")
+
+    def close(self):
+        self.evict()
+        self.db.close()
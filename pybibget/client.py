@@ -0,0 +1,149 @@
+import os
+import sys
+import json
+import logging as log
+
+# The client only uses the standard library, so that forwarding a lookup to a running daemon (see pybibget.server)
+# does not pay for importing the backends.
+
+
+def socket_path():
+    """
+    Location of the Unix socket of the pybibget daemon: $PYBIBGET_SOCKET, or pybibget.sock in $XDG_RUNTIME_DIR
+    (falling back to the temporary directory, with the user id in the file name).
+    """
+    if os.environ.get("PYBIBGET_SOCKET"):
+        return os.environ["PYBIBGET_SOCKET"]
+    if os.environ.get("XDG_RUNTIME_DIR"):
+        return os.path.join(os.environ["XDG_RUNTIME_DIR"], "pybibget.sock")
+    import tempfile
+    return os.path.join(tempfile.gettempdir(), f"pybibget-{os.getuid()}.sock")
+
+
+class DaemonClient():
+    """
+    Connection to a running pybibget daemon, speaking its JSON lines protocol (see pybibget.server.Server).
+
+    Parameters
+    ----------
+    path : str, optional
+        Location of the socket. The default is socket_path().
+    timeout : float, optional
+        Timeout in seconds for connecting. Once connected, lookups are waited for without timeout. The default is 0.5.
+
+    Raises
+    ----------
+    OSError
+        If no daemon is listening on the socket.
+    """
+    def __init__(self, path=None, timeout=0.5):
+        import socket
+        if not hasattr(socket, "AF_UNIX"):
+            raise OSError("Unix sockets are not supported on this platform")
+        self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            self.socket.settimeout(timeout)
+            self.socket.connect(path or socket_path())
+            self.socket.settimeout(None)
+        except OSError:
+            self.socket.close()
+            raise
+        self.file = self.socket.makefile("rwb")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def request(self, command, **arguments):
+        """
+        Send a request and yield the responses (dictionaries) until the daemon signals that it is done.
+
+        Raises
+        ----------
+        OSError
+            If the connection to the daemon is lost, or the daemon reports an error.
+        """
+        self.file.write(json.dumps({"command": command, **arguments}).encode() + b"\n")
+        self.file.flush()
+        while True:
+            line = self.file.readline()
+            if not line:
+                raise OSError("Connection to the pybibget daemon lost")
+            response = json.loads(line)
+            if "error" in response:
+                raise OSError(f"pybibget daemon: {response['error']}")
+            yield response
+            if response.get("done"):
+                return
+
+    def ping(self):
+        """
+        Returns the process id of the daemon.
+        """
+        return list(self.request("ping"))[-1]["pid"]
+
+    def citations(self, keys, arxiv_authors=(), file=None, failures=None):
+        """
+        Look up citation keys (and the articles of arXiv public author identifiers) on the daemon, see
+        pybibget.get_citations(). If failures is given, the keys which were not found are added to it, mapped to the
+        error message.
+
+        Yields
+        ---------
+        key, bibtex : str, str
+            Citation keys and their BibTeX entries in the order in which they are found.
+        """
+        arguments = {"keys": list(keys), "arxiv_authors": list(arxiv_authors), "file": os.path.abspath(file) if file else None}
+        for response in self.request("citations", **arguments):
+            if "key" in response:
+                yield response["key"], response["bibtex"]
+            elif failures is not None:
+                failures.update(response.get("missing", {}))
+
+    def shutdown(self):
+        list(self.request("shutdown"))
+
+    def close(self):
+        self.file.close()
+        self.socket.close()
+
+
+def daemon_citations(keys, file=None, stream=False, arxiv_authors=()):
+    """
+    Retrieves BibTeX entries through a running daemon and writes them to file (appending) or stdout, like
+    pybibget.get_citations().
+
+    Returns
+    ---------
+    number_of_entries : int or None
+        The number of entries written, or None if no daemon is running (nothing is written then).
+    """
+    try:
+        client = DaemonClient()
+    except OSError:
+        return None
+    log.debug(f"Forwarding lookups to the pybibget daemon at {socket_path()}")
+    number_of_entries = 0
+    failures = {}
+    obj = open(file, 'a') if file else sys.stdout
+    try:
+        with client:
+            entries = []
+            for key, bibtex in client.citations(keys, arxiv_authors, file, failures):
+                number_of_entries += 1
+                if stream:
+                    obj.write("\n" + bibtex)
+                    obj.flush()
+                else:
+                    entries.append(bibtex)
+            if entries or not (stream or file):
+                obj.write("\n" + "\n".join(entries))
+    finally:
+        if file:
+            obj.close()
+    # reported like the lookups in this process (once per lookup, aliases share the message)
+    for message in dict.fromkeys(failures.values()):
+        log.error(message)
+    return number_of_entries
@@ -0,0 +1,97 @@
+import re
+import sys
+
+RE_MSC = r'MR\d{4,10}'
+RE_PMID = r'PMID:\d{4,10}'
+RE_DOI = r'10\.\d{4,9}\/[-._;()\/:A-Za-z0-9]+'
+RE_ARXIV_OLD = r'\b[a-zA-Z\-\.]{2,10}\/\d{7}(?:v\d)?\b'
+RE_ARXIV_NEW = r'\b\d{4}\.\d{4,5}(?:v\d)?\b'
+
+# order matters: the first matching alternative determines the backend
+KEY_PATTERN = re.compile(f"(?P<msc>{RE_MSC})|(?P<pmid>{RE_PMID})|(?P<arxiv>{RE_ARXIV_OLD}|{RE_ARXIV_NEW})|(?P<doi>{RE_DOI})")
+PREFIX_PATTERN = re.compile(r'^(?:https?://(?:dx\.)?doi\.org/|doi:\s*|https?://arxiv\.org/(?:abs|pdf)/|arxiv:\s*|https?://pubmed\.ncbi\.nlm\.nih\.gov/(?=\d)|https?://mathscinet\.ams\.org/mathscinet-getitem\?mr=)', re.IGNORECASE)
+
+
+def clean_key(key):
+    """
+    Strip whitespace and URL or scheme prefixes (https://doi.org/, doi:, arXiv:, arxiv.org/abs/, ...) from a citation key.
+    """
+    key = key.strip()
+    if match := PREFIX_PATTERN.match(key):
+        prefix = match.group(0).lower()
+        key = key[match.end():]
+        if "pubmed" in prefix:
+            key = "PMID:" + key.rstrip("/")
+        elif "mathscinet" in prefix:
+            key = key if key.upper().startswith("MR") else "MR" + key
+        elif "arxiv.org/pdf" in prefix:
+            key = re.sub(r'\.pdf$', '', key)
+    if key[:5].upper() == "PMID:":
+        key = "PMID:" + key[5:].strip()
+    return key
+
+
+def classify_key(key):
+    """
+    Returns the backend responsible for a citation key: "msc", "pmid", "arxiv", "doi", or None for invalid keys.
+    """
+    match = KEY_PATTERN.match(key)
+    return match.lastgroup if match else None
+
+
+def normalize_key(key, backend=None):
+    """
+    Returns the canonical form of a citation key, used to identify duplicates: DOIs are lower case, arXiv identifiers
+    have no version suffix and MathSciNet numbers are zero-padded to seven digits.
+    """
+    key = clean_key(key)
+    backend = backend or classify_key(key)
+    if backend == "doi":
+        return key.lower()
+    if backend == "arxiv":
+        return re.sub(r'v\d+$', '', key)
+    if backend == "msc":
+        return "MR" + key[2:].zfill(7)
+    return key
+
+
+def group_keys(keys):
+    """
+    Classify and deduplicate citation keys.
+
+    Parameters
+    ----------
+    keys : iterable of str
+        The citation keys. Prefixes such as doi: or arXiv: are only ignored for classification and deduplication (see
+        clean_key()), the keys themselves are kept as cited.
+
+    Returns
+    ---------
+    groups : dict
+        Dictionary mapping each backend ("msc", "pmid", "arxiv", "doi" or None for invalid keys) to a dictionary
+        {normalized key: [citation keys]}, preserving the order of first occurrence.
+    """
+    groups = {}
+    for key in keys:
+        key = key.strip()
+        backend = classify_key(clean_key(key))
+        normalized = normalize_key(key, backend)
+        aliases = groups.setdefault(backend, {}).setdefault(normalized, [])
+        if key not in aliases:
+            aliases.append(key)
+    return groups
+
+
+def read_keys(file_name):
+    """
+    Read citation keys from a file ("-" for stdin). Keys are separated by whitespace or commas, "#" starts a comment.
+    """
+    file = sys.stdin if file_name == "-" else open(file_name)
+    try:
+        for line in file:
+            for key in re.split(r'[\s,]+', line.split("#", 1)[0]):
+                if key:
+                    yield key
+    finally:
+        if file is not sys.stdin:
+            file.close()
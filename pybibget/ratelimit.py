@@ -0,0 +1,159 @@
+import asyncio
+import random
+import time
+import logging as log
+from email.utils import parsedate_to_datetime
+
+DEFAULT_HOSTS = {
+    "mathscinet.ams.org": {"rate": 5, "concurrency": 5},
+    "api.crossref.org": {"rate": 5, "concurrency": 5},
+    "api.elsevier.com": {"rate": 6, "concurrency": 6},
+    "export.arxiv.org": {"rate": 1/3, "concurrency": 1},
+    "arxiv.org": {"rate": 1, "concurrency": 2},
+    "pubmed.ncbi.nlm.nih.gov": {"rate": 3, "concurrency": 3},
+    "eutils.ncbi.nlm.nih.gov": {"rate": 3, "concurrency": 3},
+}
+DEFAULT_LIMITS = {"rate": 10, "concurrency": 10}
+
+
+class TokenBucket():
+    """
+    Token bucket admitting rate requests per second, in bursts of up to max(1, rate) requests.
+
+    Unlike aiolimiter.AsyncLimiter, the rate can be changed while requests are waiting, without emptying the bucket.
+    Waiting requests are admitted in order.
+    """
+    def __init__(self, rate):
+        self.rate = rate
+        self.level = 0.0
+        self.last_check = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    @property
+    def capacity(self):
+        return max(1.0, self.rate)
+
+    def leak(self):
+        now = time.monotonic()
+        self.level = max(0.0, self.level - (now - self.last_check) * self.rate)
+        self.last_check = now
+
+    def set_rate(self, rate):
+        self.leak()
+        self.rate = rate
+
+    async def acquire(self):
+        async with self.lock:
+            self.leak()
+            while self.level + 1 > self.capacity:
+                await asyncio.sleep((self.level + 1 - self.capacity) / self.rate)
+                self.leak()
+            self.level += 1
+
+
+def retry_after(response):
+    """
+    Seconds to wait according to the Retry-After header of response, or None if not present.
+    """
+    value = response.headers.get("Retry-After")
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff(attempt, base=0.5, cap=30):
+    """
+    Exponential backoff with full jitter for the given (zero based) retry attempt.
+    """
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class HostLimiter():
+    """
+    Limits concurrency and request rate for a single host.
+
+    The rate adapts to the responses of the host: it is halved (at most once per second, down to
+    1/16 of the configured rate) whenever the host answers 429 or 503, and grows back additively
+    towards the configured rate with every successful request.
+
+    Parameters
+    ----------
+    host : str
+        Name of the host, used for log messages.
+    rate : float
+        Maximal number of requests per second.
+    concurrency : int
+        Maximal number of simultaneous requests.
+    """
+    def __init__(self, host, rate, concurrency):
+        self.host = host
+        self.max_rate = self.rate = rate
+        self.min_rate = rate / 16
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.limiter = TokenBucket(rate)
+        self.blocked_until = 0.0
+        self.last_throttle = 0.0
+
+    async def __aenter__(self):
+        await self.semaphore.acquire()
+        try:
+            await self.limiter.acquire()
+            if (delay := self.blocked_until - time.monotonic()) > 0:
+                await asyncio.sleep(delay)
+        except BaseException:
+            self.semaphore.release()
+            raise
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.semaphore.release()
+
+    def throttle(self, delay=None):
+        """
+        Reduce the request rate after the host signalled overload, and pause for delay seconds if given.
+        """
+        now = time.monotonic()
+        if delay:
+            self.blocked_until = max(self.blocked_until, now + delay)
+        if now - self.last_throttle >= 1 and self.rate > self.min_rate:
+            self.last_throttle = now
+            self.set_rate(max(self.min_rate, self.rate / 2))
+            log.info(f"{self.host} is overloaded, reducing the request rate to {self.rate:.2g}/s")
+
+    def relax(self):
+        """
+        Increase the request rate after a successful request.
+        """
+        if self.rate < self.max_rate:
+            self.set_rate(min(self.max_rate, self.rate + self.max_rate / 20))
+
+    def set_rate(self, rate):
+        self.rate = rate
+        self.limiter.set_rate(rate)
+
+
+class RateLimiter():
+    """
+    Per-host HostLimiters, created on first use.
+
+    Parameters
+    ----------
+    hosts : dict, optional
+        Limits per host, e.g. {"api.crossref.org": {"rate": 5, "concurrency": 5}}, overriding DEFAULT_HOSTS.
+    """
+    def __init__(self, hosts=None):
+        self.hosts = {host: {**DEFAULT_HOSTS.get(host, DEFAULT_LIMITS), **limits} for host, limits in {**DEFAULT_HOSTS, **(hosts or {})}.items()}
+        self.limiters = {}
+
+    def __getitem__(self, host):
+        if host not in self.limiters:
+            limits = self.hosts.get(host, DEFAULT_LIMITS)
+            self.limiters[host] = HostLimiter(host, limits["rate"], limits["concurrency"])
+        return self.limiters[host]
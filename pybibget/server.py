@@ -0,0 +1,146 @@
+import os
+import json
+import asyncio
+import logging as log
+from collections import OrderedDict
+from pybibget.bibentry import Bibget, entry_to_string, entry_from_string
+from pybibget.client import DaemonClient, socket_path
+from pybibget.keys import normalize_key
+
+MAX_RESULTS = 10000
+
+
+class Server():
+    """
+    Daemon answering lookups of pybibget clients (see pybibget.client) over a Unix socket.
+
+    All clients share one Bibget, so that connections are kept alive between requests, the rate limits of each host
+    apply to all clients together, and concurrent lookups of the same identifier are coalesced. Entries found are also
+    kept in memory (by normalized identifier), so that repeated requests (e.g. from an editor) are answered without a
+    cache or network lookup.
+
+    The protocol is line based: each request is a JSON object with a "command" ("citations", "ping" or "shutdown")
+    and its arguments. The daemon answers a "citations" request with one object {"key", "bibtex"} per entry found,
+    in the order in which they are found, and every request with a final object containing "done": true. The final
+    object of a "citations" request maps the keys which were not found to the error message in "missing". Failed
+    requests are answered with {"error": message, "done": true}.
+
+    Parameters
+    ----------
+    path : str, optional
+        Location of the socket. The default is pybibget.client.socket_path().
+    **options
+        Keyword arguments for Bibget.
+    """
+    def __init__(self, path=None, **options):
+        self.path = path or socket_path()
+        self.options = options
+        self.results = OrderedDict()
+        self.bibget = None
+        self.server = None
+
+    async def serve(self):
+        """
+        Listen on the socket until a client sends "shutdown" (or the task is cancelled).
+
+        Raises
+        ----------
+        OSError
+            If another daemon is already listening on the socket.
+        """
+        try:
+            with DaemonClient(self.path) as client:
+                raise OSError(f"A pybibget daemon (pid {client.ping()}) is already listening on {self.path}")
+        except FileNotFoundError:
+            pass
+        except ConnectionRefusedError:
+            os.unlink(self.path)  # left over by a daemon which was killed
+        async with Bibget(interactive=False, **self.options) as self.bibget:
+            # the socket is created accessible to the user only, also in a shared temporary directory
+            umask = os.umask(0o177)
+            try:
+                self.server = await asyncio.start_unix_server(self.handle, path=self.path)
+            finally:
+                os.umask(umask)
+            log.info(f"Listening on {self.path}")
+            try:
+                async with self.server:
+                    await self.server.serve_forever()
+            except asyncio.CancelledError:
+                pass
+            finally:
+                if os.path.exists(self.path):
+                    os.unlink(self.path)
+
+    async def handle(self, reader, writer):
+        """
+        Answer the requests of one client connection.
+        """
+        def send(response):
+            writer.write(json.dumps(response).encode() + b"\n")
+
+        try:
+            while (line := await reader.readline()):
+                try:
+                    request = json.loads(line)
+                    command = request.get("command")
+                    if command == "citations":
+                        found, failures = 0, {}
+                        async for key, bibtex in self.citations(request.get("keys", []), request.get("arxiv_authors", []), request.get("file"), failures):
+                            send({"key": key, "bibtex": bibtex})
+                            await writer.drain()
+                            found += 1
+                        send({"done": True, "found": found, "missing": failures})
+                    elif command == "ping":
+                        send({"done": True, "pid": os.getpid()})
+                    elif command == "shutdown":
+                        send({"done": True})
+                        await writer.drain()
+                        self.server.close()
+                        return
+                    else:
+                        send({"error": f"Unknown command {command!r}", "done": True})
+                except Exception as exc:
+                    log.exception("Request failed")
+                    send({"error": str(exc) or type(exc).__name__, "done": True})
+                await writer.drain()
+        except ConnectionError:
+            log.debug("Client disconnected")
+        finally:
+            writer.close()
+
+    async def citations(self, keys, arxiv_authors=(), file=None, failures=None):
+        """
+        Yield (key, BibTeX string) for the citation keys and arXiv public author identifiers of a request, from memory
+        if a key was found before, otherwise through Bibget.iter_citations(), which adds the keys not found to failures.
+        """
+        from pybibget import with_arxiv_authors
+        missing = []
+        for key in (key.strip() for key in keys):
+            identifier = normalize_key(key)
+            if identifier in self.results:
+                self.results.move_to_end(identifier)
+                yield key, entry_to_string(entry_from_string(self.results[identifier]), key)
+            else:
+                missing.append(key)
+        index = None
+        if arxiv_authors and file and os.path.exists(file):
+            from pybibget.bibfile import BibIndex
+            index = BibIndex.load(file)
+        if not missing and not arxiv_authors:
+            return
+        async for key, entry in self.bibget.iter_citations(with_arxiv_authors(self.bibget, missing, arxiv_authors, index), failures):
+            self.results[normalize_key(key)] = entry_to_string(entry)
+            if len(self.results) > MAX_RESULTS:
+                self.results.popitem(last=False)
+            yield key, entry_to_string(entry, key)
+
+
+def serve(path=None, **options):
+    """
+    Run the daemon in the foreground, see Server.
+    """
+    try:
+        asyncio.run(Server(path, **options).serve())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,80 @@
+import os
+import json
+import time
+import hashlib
+import tempfile
+import logging as log
+
+STATE_VERSION = 2
+DEFAULT_MAX_AGE = 90  # days
+
+
+def fingerprint(text):
+    """
+    Content fingerprint of a bibentry, given as it appears in the .bib file (str or bytes).
+    """
+    return hashlib.sha256(text.encode("utf-8") if isinstance(text, str) else text).hexdigest()
+
+
+def state_file_name(bib_file_name):
+    """
+    Location of the update state of a .bib file: a hidden file next to it, e.g. .references.bib.pybibupdate.json
+    """
+    directory, name = os.path.split(bib_file_name)
+    return os.path.join(directory, f".{name}.pybibupdate.json")
+
+
+class UpdateState():
+    """
+    Records which entries of a .bib file pybibupdate has checked, so that later runs only revisit new or changed entries.
+
+    For each citation key, the state holds the fingerprint of the entry after the check, the decision ("replaced",
+    "kept" if a replacement was found but rejected, "unchanged" if none was found) and the time of the check.
+
+    Parameters
+    ----------
+    path : str
+        Location of the state file (see state_file_name()). A missing, unreadable or outdated file is treated as empty.
+    max_age : float, optional
+        Entries checked more than max_age days ago are checked again. The default is 90.
+    """
+    def __init__(self, path, max_age=DEFAULT_MAX_AGE):
+        self.path = path
+        self.max_age = max_age
+        self.entries = {}
+        try:
+            with open(path) as file:
+                state = json.load(file)
+            if state.get("version") == STATE_VERSION:
+                self.entries = state["entries"]
+            else:
+                log.info(f"Ignoring {path} written by an incompatible version")
+        except FileNotFoundError:
+            pass
+        except (ValueError, KeyError, AttributeError) as exc:
+            log.warning(f"Ignoring corrupt update state {path} ({exc})")
+
+    def is_current(self, key, fingerprint):
+        """
+        True if the entry key with the given fingerprint was checked within the last max_age days.
+        """
+        record = self.entries.get(key)
+        return record is not None and record["fingerprint"] == fingerprint and time.time() - record["checked"] < self.max_age * 24 * 60 * 60
+
+    def record(self, key, fingerprint, decision):
+        self.entries[key] = {"fingerprint": fingerprint, "decision": decision, "checked": time.time()}
+
+    def prune(self, keys):
+        """
+        Forget entries which are no longer part of the bibliography.
+        """
+        self.entries = {key: record for key, record in self.entries.items() if key in keys}
+
+    def save(self):
+        """
+        Write the state file atomically.
+        """
+        directory = os.path.dirname(os.path.abspath(self.path))
+        with tempfile.NamedTemporaryFile("w", dir=directory, prefix=os.path.basename(self.path), suffix=".tmp", delete=False) as file:
+            json.dump({"version": STATE_VERSION, "entries": self.entries}, file)
+        os.replace(file.name, self.path)
@@ -0,0 +1,318 @@
+import os
+import json
+import gzip
+import mmap
+import zlib
+import shutil
+import sqlite3
+import tempfile
+import itertools
+import logging as log
+from xml.etree import ElementTree
+from pybibget.keys import classify_key, normalize_key
+
+STORE_VERSION = 1
+# Single records are too short to compress well on their own. A preset dictionary with the text shared by most
+# entries roughly halves them again. It is part of the format: changing it requires a new STORE_VERSION.
+ZDICT = b"""archiveprefix = "arXiv",\n    eprint = "\n    mrnumber = "\n    pmid = "\n    note = "Preprint",\n
+    ISSN = "\n    url = "http://dx.doi.org/10.\n    DOI = "10.\n    doi = "10.\n    number = "\n    volume = "
+    pages = "\n    year = "20\n    year = "19\n    publisher = "Springer Science and Business Media LLC",
+    publisher = "Elsevier BV",\n    publisher = "Wiley",\n    publisher = "American Physical Society (APS)",
+    booktitle = "Proceedings of the \n    journal = "Journal of \n    journal = "Physical Review \n    title = "{
+    author = "\n}\n@inproceedings{\n@incollection{\n@unpublished{_,\n@book{\n@misc{\n@article{"""
+CHUNK_SIZE = 1000
+FORMATS = ("bib", "crossref", "arxiv")
+ARXIV_OAI = "{http://arxiv.org/OAI/arXiv/}"
+OAI_RECORD = "{http://www.openarchives.org/OAI/2.0/}record"
+
+
+def compress(bibtex):
+    compressor = zlib.compressobj(9, zdict=ZDICT)
+    return compressor.compress(bibtex.encode()) + compressor.flush()
+
+
+def decompress(data):
+    decompressor = zlib.decompressobj(zdict=ZDICT)
+    return (decompressor.decompress(data) + decompressor.flush()).decode()
+
+
+class MetadataStore():
+    """
+    Persistent SQLite store of bibentries imported from metadata dumps, for lookups without network access.
+
+    Each record is a BibTeX string, compressed with zlib (see ZDICT), reachable through any number of normalized
+    identifiers (DOI, arXiv identifier, MR number or PMID, see pybibget.keys.normalize_key()). The identifiers are the
+    primary key of a table without rowids, so that a lookup is a single B-tree search (and one more for the record)
+    also in a store of tens of millions of records.
+
+    Parameters
+    ----------
+    path : str
+        Location of the SQLite database.
+    """
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.db = sqlite3.connect(path, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)")
+        self.db.execute("INSERT OR IGNORE INTO meta VALUES ('version', ?)", (str(STORE_VERSION),))
+        version = int(self.db.execute("SELECT value FROM meta WHERE name = 'version'").fetchone()[0])
+        if version != STORE_VERSION:
+            self.db.close()
+            raise ValueError(f"{path}: Metadata store version {version} is not supported, please import the dumps again")
+        self.db.execute("CREATE TABLE IF NOT EXISTS records (id INTEGER PRIMARY KEY, data BLOB NOT NULL)")
+        self.db.execute("CREATE TABLE IF NOT EXISTS identifiers (identifier TEXT PRIMARY KEY, record INTEGER NOT NULL) WITHOUT ROWID")
+
+    def get(self, identifier):
+        """
+        The BibTeX string of the record with the given identifier (normalized before the lookup), or None.
+        """
+        row = self.db.execute("SELECT data FROM records WHERE id = (SELECT record FROM identifiers WHERE identifier = ?)",
+                              (normalize_key(identifier),)).fetchone()
+        return decompress(row[0]) if row is not None else None
+
+    def add_many(self, records):
+        """
+        Add records in a single transaction.
+
+        A record which shares an identifier with a stored record replaces it, so that importing a newer dump updates
+        the store.
+
+        Parameters
+        ----------
+        records : iterable of tuple
+            (identifiers, bibtex) pairs, with normalized identifiers.
+        """
+        self.db.execute("BEGIN")
+        try:
+            for identifiers, bibtex in records:
+                if not identifiers:
+                    continue
+                data = compress(bibtex)
+                row = self.db.execute(f"SELECT record FROM identifiers WHERE identifier IN ({','.join('?' * len(identifiers))})", identifiers).fetchone()
+                if row is not None:
+                    record = row[0]
+                    self.db.execute("UPDATE records SET data = ? WHERE id = ?", (data, record))
+                else:
+                    record = self.db.execute("INSERT INTO records (data) VALUES (?)", (data,)).lastrowid
+                self.db.executemany("INSERT OR REPLACE INTO identifiers VALUES (?, ?)", [(identifier, record) for identifier in identifiers])
+            self.db.execute("COMMIT")
+        except BaseException:
+            self.db.execute("ROLLBACK")
+            raise
+
+    def __len__(self):
+        return self.db.execute("SELECT COUNT(*) FROM records").fetchone()[0]
+
+    def close(self):
+        self.db.close()
+
+
+def open_dump(file_name):
+    """
+    Open a text file for reading, decompressing it on the fly if its name ends with .gz.
+    """
+    if file_name.endswith(".gz"):
+        return gzip.open(file_name, "rt", encoding="utf-8")
+    return open(file_name, encoding="utf-8")
+
+
+def detect_format(file_name):
+    """
+    Guess the format of a metadata dump from its name and first line: "bib" (.bib files), "crossref" (JSON lines of
+    Crossref works) or "arxiv" (JSON lines of the arXiv metadata snapshot, or arXiv OAI-PMH XML).
+    """
+    name = file_name[:-3] if file_name.endswith(".gz") else file_name
+    if name.endswith(".bib"):
+        return "bib"
+    if name.endswith(".xml"):
+        return "arxiv"
+    with open_dump(file_name) as file:
+        first = json.loads(file.readline() or "{}")
+    if "authors_parsed" in first or "submitter" in first:
+        return "arxiv"
+    if "DOI" in first or "items" in first or "message" in first:
+        return "crossref"
+    raise ValueError(f"{file_name}: Unknown metadata format, please specify it")
+
+
+def read_bib(file_name):
+    """
+    Yield the raw text of the entries of a .bib file, without parsing them (see pybibget.bibfile.scan_bib()), each
+    together with the @string definitions which precede it.
+    """
+    from pybibget.bibfile import scan_bib
+    with tempfile.TemporaryFile() if file_name.endswith(".gz") else open(file_name, "rb") as file:
+        if file_name.endswith(".gz"):
+            # decompressed to disk, not to memory
+            with gzip.open(file_name, "rb") as compressed:
+                shutil.copyfileobj(compressed, file)
+            file.flush()
+        if not os.fstat(file.fileno()).st_size:
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            # a new string only when a definition is added, so that pickling a chunk stores it once
+            strings = ""
+            for span in scan_bib(data):
+                text = data[span.start:span.end].decode("utf-8", errors="replace")
+                if span.entry_type == "string":
+                    strings += text + "\n"
+                elif span.key is not None:
+                    yield strings, text
+
+
+def read_lines(file_name):
+    """
+    Yield the non-empty lines of a (JSON lines) file.
+    """
+    with open_dump(file_name) as file:
+        for line in file:
+            if line.strip():
+                yield line
+
+
+def read_arxiv_oai(file_name):
+    """
+    Yield the records of arXiv OAI-PMH XML (metadata format "arXiv") as dictionaries with the keys of the arXiv metadata
+    snapshot (see convert_arxiv()). Records are discarded once read, so that memory stays bounded.
+    """
+    with gzip.open(file_name, "rb") if file_name.endswith(".gz") else open(file_name, "rb") as file:
+        stack = []
+        for event, element in ElementTree.iterparse(file, events=("start", "end")):
+            if event == "start":
+                stack.append(element)
+                continue
+            stack.pop()
+            if element.tag == ARXIV_OAI + "arXiv":
+                yield {
+                    "id": element.findtext(ARXIV_OAI + "id"),
+                    "title": element.findtext(ARXIV_OAI + "title"),
+                    "journal-ref": element.findtext(ARXIV_OAI + "journal-ref"),
+                    "doi": element.findtext(ARXIV_OAI + "doi"),
+                    "created": element.findtext(ARXIV_OAI + "created") or "",
+                    "authors_parsed": [[author.findtext(ARXIV_OAI + "keyname") or "", author.findtext(ARXIV_OAI + "forenames") or ""]
+                                       for author in element.iter(ARXIV_OAI + "author")],
+                }
+            if element.tag in (OAI_RECORD, ARXIV_OAI + "arXiv") and stack:
+                stack[-1].remove(element)
+
+
+def convert_bib(item):
+    """
+    The record of a raw .bib entry, given with the preceding @string definitions (see read_bib()): its identifiers (see
+    pybibget.bibfile.entry_identifiers()) and its text with the macros expanded, so that it can be parsed on its own.
+    Entries using undefined macros cannot be converted.
+    """
+    from pybibget.bibentry import parse_bibtex, entry_to_string
+    from pybibget.bibfile import entry_identifiers
+    strings, raw = item
+    entry = list(parse_bibtex(strings + raw).entries.values())[0]
+    return [(entry_identifiers(raw.encode()), entry_to_string(entry))]
+
+
+def convert_crossref(line):
+    """
+    The records of a JSON line with a Crossref work, an API response ({"message": work}) or a page of works
+    ({"items": [...]}), see pybibget.bibentry.crossref_entry(). Works which cannot be converted are None.
+    """
+    from pybibget.bibentry import crossref_entry, entry_to_string
+    item = json.loads(line)
+    item = item.get("message", item)
+    records = []
+    for work in item["items"] if "items" in item else [item]:
+        try:
+            records.append(([normalize_key(work["DOI"], "doi")], entry_to_string(crossref_entry(work))))
+        except Exception as exc:
+            log.debug(f"Skipping malformed Crossref work ({exc!r})")
+            records.append(None)
+    return records
+
+
+def convert_arxiv(item):
+    """
+    The record of an article of the arXiv metadata snapshot (a JSON line, or a dictionary from read_arxiv_oai()), see
+    pybibget.bibentry.arxiv_entry(). Its DOI is kept in the doi field, so that lookups can prefer a stored record of the
+    published version.
+    """
+    from pybibget.bibentry import arxiv_entry, entry_to_string
+    if isinstance(item, str):
+        item = json.loads(item)
+    arxiv_key = item["id"].strip()
+    if item.get("versions"):
+        published = item["versions"][0]["created"].split()[3]  # e.g. "Mon, 2 Apr 2007 19:18:42 GMT"
+    elif item.get("created"):
+        published = item["created"]
+    else:
+        published = "20" + arxiv_key[:2] if classify_key(arxiv_key) == "arxiv" and "/" not in arxiv_key else ""
+    authors = [f"{last}, {first}" if first else last for last, first, *_ in item.get("authors_parsed") or []]
+    metadata = {"title": " ".join((item.get("title") or "").split()), "journal": item.get("journal-ref"), "published": published, "authors": authors}
+    entry = arxiv_entry(metadata)
+    if item.get("doi"):
+        entry.fields["doi"] = item["doi"].split()[0]
+    entry.fields["eprint"] = arxiv_key
+    entry.fields["archiveprefix"] = "arXiv"
+    return [([normalize_key(arxiv_key, "arxiv")], entry_to_string(entry))]
+
+
+def convert_chunk(convert, items):
+    """
+    Convert a chunk of dump items to records. Returns the records and the number of items which could not be converted.
+    """
+    records, failures = [], 0
+    for item in items:
+        try:
+            converted = convert(item)
+        except Exception as exc:
+            log.debug(f"Skipping malformed record ({exc!r})")
+            failures += 1
+            continue
+        records.extend(record for record in converted if record is not None)
+        failures += converted.count(None)
+    return records, failures
+
+
+def import_dump(store, file_name, format=None, workers=None, chunk_size=CHUNK_SIZE):
+    """
+    Import a metadata dump into a MetadataStore.
+
+    The dump is read as a stream, in chunks of chunk_size items. Chunks are converted to BibTeX in worker processes
+    (see pybibget.workers.imap_bounded()) and each converted chunk is written in one transaction, so that memory stays
+    bounded for dumps of any size.
+
+    Parameters
+    ----------
+    store : MetadataStore
+    file_name : str
+        A .bib file, JSON lines of Crossref works, the arXiv metadata snapshot (JSON lines) or arXiv OAI-PMH XML,
+        optionally compressed with gzip.
+    format : str, optional
+        "bib", "crossref" or "arxiv". The default is None, which detects the format (see detect_format()).
+    workers : int, optional
+        Number of worker processes. The default is the number of CPUs, 1 converts in this process.
+
+    Returns
+    ---------
+    number_of_records, failures : int, int
+        The number of records imported, and the number of items which could not be converted.
+    """
+    from pybibget.workers import imap_bounded
+    format = format or detect_format(file_name)
+    if format == "bib":
+        items, convert = read_bib(file_name), convert_bib
+    elif format == "crossref":
+        items, convert = read_lines(file_name), convert_crossref
+    elif format == "arxiv":
+        name = file_name[:-3] if file_name.endswith(".gz") else file_name
+        items, convert = (read_arxiv_oai(file_name) if name.endswith(".xml") else read_lines(file_name)), convert_arxiv
+    else:
+        raise ValueError(f"Unknown metadata format {format!r}, must be one of {', '.join(FORMATS)}")
+    chunks = iter(lambda: list(itertools.islice(items, chunk_size)), [])
+    number_of_records, failures = 0, 0
+    for records, chunk_failures in imap_bounded(convert_chunk, ((convert, chunk) for chunk in chunks), workers):
+        store.add_many(records)
+        number_of_records += len(records)
+        failures += chunk_failures
+        log.debug(f"{file_name}: {number_of_records} records imported")
+    return number_of_records, failures
@@ -0,0 +1,17 @@
+import json
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def user_data_dir(tmp_path, monkeypatch):
+    """
+    Isolates config.json (and everything else pybibget keeps in its data directory) per test
+    """
+    monkeypatch.setenv("XDG_DATA_HOME", str(tmp_path / "data"))
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    monkeypatch.setenv("PYBIBGET_SOCKET", str(tmp_path / "pybibget.sock"))
+    monkeypatch.setattr("builtins.input", lambda *args: "")
+    config_dir = tmp_path / "data" / "pybibget"
+    config_dir.mkdir(parents=True)
+    (config_dir / "config.json").write_text(json.dumps({"scopus_api_key": "", "scopus_rate_limit": 6}))
+    return config_dir
@@ -0,0 +1,16 @@
+import json
+import os
+import subprocess
+import sys
+
+BENCHMARKS = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "benchmarks")
+
+
+def test_benchmarks_run_offline(tmp_path):
+    results = tmp_path / "results.json"
+    subprocess.run([sys.executable, os.path.join(BENCHMARKS, "run.py"), "--sizes", "20", "--no-memory", "--error-rate", "0.05",
+                    "--json", str(results)], capture_output=True, text=True, check=True, timeout=120)
+    results = {result["scenario"]: result for result in json.loads(results.read_text())}
+    assert set(results) == {"citations", "update", "sanitize"}
+    assert all(result["completed"] == 20 for result in results.values())
+    assert results["citations"]["requests_per_host"]["mathscinet.ams.org"] > 0
@@ -0,0 +1,96 @@
+import sys
+import pybibget
+from pybtex.database import Entry
+from pybibget.bibfile import BibFile, scan_bib
+
+BIB = b"""% comment with an @ sign
+@String{pnas = "Proc. Natl. Acad. Sci."}
+@article{sanger,
+  title  = {{DNA} sequencing {with {nested}} braces},
+  journal = pnas,
+  note = "quoted {braces}",
+}
+
+@comment{ignored {entry}}
+@Book( knuth , title = {The {\\TeX}book}, year = 1984 )
+Some text in between.
+@misc{last,title={Last}}
+"""
+
+
+def test_scan_bib():
+    spans = list(scan_bib(BIB))
+    assert [(span.entry_type, span.key) for span in spans] == [("string", None), ("article", "sanger"), ("comment", None), ("book", "knuth"), ("misc", "last")]
+    assert BIB[spans[1].start:spans[1].end].endswith(b'braces}",\n}')
+    assert BIB[spans[3].start:spans[3].end] == b"@Book( knuth , title = {The {\\TeX}book}, year = 1984 )"
+    assert list(scan_bib(b"@article{broken, title = {unbalanced}")) == []
+
+
+def test_bib_file(tmp_path):
+    path = tmp_path / "references.bib"
+    path.write_bytes(BIB)
+    with BibFile(str(path)) as bib_file:
+        assert list(bib_file) == ["sanger", "knuth", "last"]
+        assert bib_file.entry("sanger").fields["journal"] == "Proc. Natl. Acad. Sci."
+        bib_file.write({"knuth": Entry("book", fields={"title": "Replaced"})})
+    text = path.read_bytes()
+    assert text.startswith(BIB[:BIB.index(b"@Book")])
+    assert text.endswith(BIB[BIB.index(b"\nSome text"):])
+    assert b"@book{knuth,\n    title = \"Replaced\"\n}" in text
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_pybibupdate_rewrites_only_replaced_entries(tmp_path, monkeypatch):
+    path = tmp_path / "references.bib"
+    path.write_bytes(BIB)
+    checked = []
+
+    async def update_entries(self, entries, mode='interactive'):
+        checked.append(list(entries))
+        return {key: (Entry("misc", fields={"title": "New"}), "replaced") if key == "last" else (entry, "unchanged") for key, entry in entries.items()}
+
+    monkeypatch.setattr("pybibget.bibentry.Bibget.update_entries", update_entries)
+    monkeypatch.setattr(sys, "argv", ["pybibupdate", str(path), "--accept-all"])
+    pybibget.pybibupdate()
+    assert path.read_bytes() == BIB.replace(b"@misc{last,title={Last}}", b'@misc{last,\n    title = "New"\n}')
+    pybibget.pybibupdate()
+    assert checked == [["sanger", "knuth", "last"], []]
+
+
+INDEXED = b"""@article{shannon, doi = {10.1002/J.1538-7305.1948.TB01338.X}, mrnumber = {26286}, title = {Communication}}
+@misc{perelman, eprint = "math/0211159v1", archiveprefix = {arXiv}}
+@article{sanger, pmid = {271968}, DOI = "https://doi.org/10.1073/pnas.74.12.5463"}
+"""
+
+
+def test_bib_index(tmp_path):
+    from pybibget.bibfile import BibIndex
+    path = tmp_path / "references.bib"
+    path.write_bytes(INDEXED)
+    index = BibIndex.load(str(path), cache_dir=str(tmp_path / "cache"))
+    assert index.lookup("SHANNON") == "shannon"
+    assert index.lookup("10.1002/j.1538-7305.1948.tb01338.x") == "shannon"
+    assert index.lookup("MR0026286") == "shannon"
+    assert index.lookup("math/0211159") == "perelman"
+    assert index.lookup("PMID:271968") == index.lookup("doi:10.1073/PNAS.74.12.5463") == "sanger"
+    assert index.lookup("10.1000/unknown") is None
+    assert BibIndex.load(str(path), cache_dir=str(tmp_path / "cache")).identifiers == index.identifiers
+    path.write_bytes(INDEXED + b"@misc{new, doi = {10.1000/new}}\n")
+    assert BibIndex.load(str(path), cache_dir=str(tmp_path / "cache")).lookup("10.1000/NEW") == "new"
+
+
+def test_get_citations_uses_target_file(tmp_path, monkeypatch):
+    path = tmp_path / "references.bib"
+    path.write_bytes(INDEXED)
+    looked_up = []
+
+    async def citations(keys, **options):
+        from pybtex.database import BibliographyData
+        looked_up.extend(keys)
+        return BibliographyData()
+
+    monkeypatch.setattr(pybibget, "citations", citations)
+    pybibget.get_citations(["shannon", "MR26286", "10.1000/unknown"], file=str(path))
+    assert looked_up == ["10.1000/unknown"]
+    with BibFile(str(path)) as bib_file:
+        assert bib_file.entry("MR26286").fields["title"] == "Communication"
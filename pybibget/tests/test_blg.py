@@ -0,0 +1,195 @@
+import asyncio
+import httpx
+from pybibget.bibentry import Bibget
+from pybibget.blg import scan_blg, resolve_bib_file
+from pybibget.watch import changes, watch
+from pybibget.tests.test_offline import mock_transport
+
+BIBTEX_BLG = """This is BibTeX, Version 0.99d
+Database file #1: {bib}
+Warning--I didn't find a database entry for "{key}"
+"""
+
+
+async def wait_for(condition):
+    for _ in range(100):
+        if condition():
+            return
+        await asyncio.sleep(0.05)
+    raise TimeoutError
+
+
+def test_scan_blg():
+    blg = BIBTEX_BLG.format(bib="references.bib", key="MR0026286") + """I couldn't open database file other.bib
+[0] Config.pm:307> INFO - This is Biber 2.17
+INFO - Looking for bibtex file 'example.bib' for section 0
+INFO - Found BibTeX data source 'example.bib'
+WARN - I didn't find a database entry for '2101.00001' (section 0)
+"""
+    assert scan_blg(blg) == (["MR0026286", "2101.00001"], ["references.bib", "other.bib", "example.bib", "example.bib"])
+
+
+def test_resolve_bib_file(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "refs.bib").write_text("% unrelated\n")
+    assert resolve_bib_file("refs.bib", "paper.blg") == "refs.bib"
+    assert resolve_bib_file("refs.bib", "thesis/thesis.blg") == "thesis/refs.bib"
+    assert resolve_bib_file(str(tmp_path / "refs.bib"), "thesis/thesis.blg") == str(tmp_path / "refs.bib")
+
+
+def test_changes_inotify(tmp_path, monkeypatch):
+    import os
+    import sys
+    import types
+    import importlib.machinery
+    reads = []
+
+    class INotify():
+        # a pipe stands in for the inotify file descriptor
+        def __init__(self):
+            self.read_end, self.write_end = os.pipe()
+            os.set_blocking(self.read_end, False)
+            inotify.append(self)
+
+        def add_watch(self, path, mask):
+            pass
+
+        def fileno(self):
+            return self.read_end
+
+        def read(self, timeout=None):
+            try:
+                reads.append(os.read(self.read_end, 4096))
+            except BlockingIOError:
+                pass
+            return []
+
+        def close(self):
+            os.close(self.read_end)
+            os.close(self.write_end)
+
+    inotify = []
+    module = types.ModuleType("inotify_simple")
+    module.__spec__ = importlib.machinery.ModuleSpec("inotify_simple", None)
+    module.INotify, module.flags = INotify, types.SimpleNamespace(CLOSE_WRITE=1, MOVED_TO=2, CREATE=4)
+    monkeypatch.setitem(sys.modules, "inotify_simple", module)
+    path = tmp_path / "paper.blg"
+
+    async def run():
+        files = changes([str(path)], interval=0.05)
+        assert await files.__anext__() == {str(path)}
+        change = asyncio.ensure_future(files.__anext__())
+        await wait_for(lambda: inotify)
+        path.write_text("changed")
+        os.write(inotify[0].write_end, b"event")
+        assert await asyncio.wait_for(change, 1) == {str(path)}
+        await files.aclose()
+
+    asyncio.run(run())
+    # the events are read as soon as they arrive
+    assert reads == [b"event"]
+
+
+def test_watch(tmp_path, monkeypatch):
+    # the .blg file names the .bib file relative to its own directory, not the working directory
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "references.bib").write_text("% unrelated\n")
+    project = tmp_path / "project"
+    project.mkdir()
+    requests = []
+    monkeypatch.setattr("pybibget.bibentry.Bibget", lambda **options: Bibget(transport=mock_transport(requests), **options))
+    bib_file = project / "references.bib"
+    bib_file.write_text("@article{shannon, title = {Communication}, mrnumber = {26286}}\n")
+    blg_file = project / "paper.blg"
+    blg_file.write_text(BIBTEX_BLG.format(bib="references.bib", key="MR12345"))
+
+    async def run():
+        task = asyncio.ensure_future(watch(str(project / "paper"), file="auto", interval=0.05, cache=False))
+        try:
+            await wait_for(lambda: "@article{MR12345," in bib_file.read_text())
+            assert len(requests) == 1
+            # a new compile reports the same key again, one which the bib file answers and a new one
+            blg_file.write_text(BIBTEX_BLG.format(bib=bib_file, key="MR12345") + 'Warning--I didn\'t find a database entry for "MR26286"\n'
+                                + 'Warning--I didn\'t find a database entry for "10.1073/pnas.74.12.5463"\n')
+            await wait_for(lambda: "@article{10.1073/pnas.74.12.5463," in bib_file.read_text())
+            assert "@article{MR26286," in bib_file.read_text()
+            assert all("MR&s1=0012345" not in str(request.url) for request in requests[1:])
+            assert (tmp_path / "references.bib").read_text() == "% unrelated\n"
+        finally:
+            task.cancel()
+
+    asyncio.run(run())
+
+
+def test_watch_retries_failed_keys(tmp_path, monkeypatch, caplog):
+    requests = []
+    transport = mock_transport(requests)
+    down = [True]
+
+    def handler(request):
+        if down[0] and request.url.host == "api.crossref.org":
+            return httpx.Response(404, text="")
+        return transport.handler(request)
+
+    monkeypatch.setattr("pybibget.bibentry.Bibget", lambda **options: Bibget(transport=httpx.MockTransport(handler), **options))
+    bib_file = tmp_path / "references.bib"
+    bib_file.write_text("% refs\n")
+    blg_file = tmp_path / "paper.blg"
+    blg_file.write_text(BIBTEX_BLG.format(bib=bib_file, key="10.1073/pnas.74.12.5463"))
+
+    async def run():
+        task = asyncio.ensure_future(watch(str(tmp_path / "paper"), file="auto", interval=0.05, cache=False))
+        try:
+            await wait_for(lambda: any(record.levelname == "ERROR" for record in caplog.records))
+            assert len(requests) == 1
+            # the next compile reports the key again, and this time it is found
+            down[0] = False
+            blg_file.write_text(BIBTEX_BLG.format(bib=bib_file, key="10.1073/pnas.74.12.5463") + "\n")
+            await wait_for(lambda: "@article{10.1073/pnas.74.12.5463," in bib_file.read_text())
+        finally:
+            task.cancel()
+
+    asyncio.run(run())
+
+
+def test_pybibparse_projects(tmp_path, monkeypatch, capsys):
+    import sys
+    import pybibget
+    requests = []
+    monkeypatch.setattr("pybibget.bibentry.Bibget", lambda **options: Bibget(transport=mock_transport(requests), **options))
+    for name, keys in [("paper", ["MR0026286", "10.1073/pnas.74.12.5463"]), ("thesis", ["MR26286", "arXiv:2101.00002"]), ("notes", [])]:
+        (tmp_path / name).mkdir()
+        (tmp_path / name / "refs.bib").write_text("% refs\n")
+        (tmp_path / name / f"{name}.blg").write_text("This is BibTeX, Version 0.99d\nDatabase file #1: refs.bib\n"
+            + "".join(f'Warning--I didn\'t find a database entry for "{key}"\n' for key in keys))
+    monkeypatch.setattr(sys, "argv", ["pybibparse", str(tmp_path), "-w"])
+    pybibget.pybibparse()
+    paper, thesis = (tmp_path / "paper" / "refs.bib").read_text(), (tmp_path / "thesis" / "refs.bib").read_text()
+    assert "@article{MR0026286," in paper and "@article{10.1073/pnas.74.12.5463," in paper
+    assert "@article{MR26286," in thesis and "@article{arXiv:2101.00002," in thesis
+    assert (tmp_path / "notes" / "refs.bib").read_text() == "% refs\n"
+    # MR0026286 and MR26286 are looked up once, and so is the DOI of arXiv:2101.00002
+    assert sum("mathscinet" in str(request.url) and "MR" in str(request.url) for request in requests) == 1
+    assert sum(request.url.path == "/works" for request in requests) == 1
+    assert "Successfully appended 2 BibTeX entries" in capsys.readouterr().out
+
+
+def test_project_citations_stream(tmp_path, monkeypatch):
+    import pybibget
+    bib_file = tmp_path / "refs.bib"
+    bib_file.write_text("% refs\n")
+    written = []
+
+    async def fan_out_citations(keys, write, **options):
+        for key in keys:
+            write(key, f"@misc{{{key}}}\n")
+            written.append(bib_file.read_text())
+
+    monkeypatch.setattr(pybibget, "fan_out_citations", fan_out_citations)
+    for stream in [False, True]:
+        bib_file.write_text("% refs\n")
+        written.clear()
+        assert pybibget.get_project_citations({str(bib_file): ["a", "b"]}, stream=stream, daemon=False) == {str(bib_file): 2}
+        assert bib_file.read_text() == "% refs\n\n@misc{a}\n\n@misc{b}\n"
+        # without stream, the entries are appended once all are found
+        assert ("@misc{a}" in written[0]) == stream
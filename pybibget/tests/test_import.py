@@ -0,0 +1,24 @@
+import subprocess
+import sys
+
+HEAVY_MODULES = ["httpx", "lxml", "pybtex", "pylatexenc", "aiolimiter", "asyncio", "sqlite3"]
+
+
+def loaded_modules(code):
+    code += "\nimport sys\nprint(' '.join(sys.modules))"
+    return set(subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout.split())
+
+
+def test_import_is_lightweight():
+    assert not loaded_modules("import pybibget").intersection(HEAVY_MODULES)
+
+
+def test_help_is_lightweight():
+    code = "import sys, pybibget\nsys.argv = ['pybibget', '--help']\ntry:\n    pybibget.pybibget()\nexcept SystemExit:\n    pass"
+    assert not loaded_modules(code).intersection(HEAVY_MODULES)
+
+
+def test_no_missing_citations_is_lightweight(tmp_path):
+    (tmp_path / "paper.blg").write_text("This is BibTeX, Version 0.99d\nDatabase file #1: references.bib\n")
+    code = f"import sys, pybibget\nsys.argv = ['pybibparse', {str(tmp_path / 'paper.tex')!r}]\npybibget.pybibparse()"
+    assert not loaded_modules(code).intersection(HEAVY_MODULES)
@@ -0,0 +1,39 @@
+from pybibget.keys import clean_key, classify_key, normalize_key, group_keys, read_keys
+
+
+def test_classify_key():
+    assert classify_key("MR0026286") == "msc"
+    assert classify_key("PMID:271968") == "pmid"
+    assert classify_key("math/0211159") == "arxiv"
+    assert classify_key("2101.00001v2") == "arxiv"
+    assert classify_key("10.1109/CVPR.2016.90") == "doi"
+    assert classify_key("Perelman2002") is None
+
+
+def test_normalize_key():
+    assert clean_key(" https://doi.org/10.1109/CVPR.2016.90 ") == "10.1109/CVPR.2016.90"
+    assert clean_key("arXiv:2101.00001") == "2101.00001"
+    assert clean_key("https://pubmed.ncbi.nlm.nih.gov/271968/") == "PMID:271968"
+    assert normalize_key("doi:10.1109/CVPR.2016.90") == "10.1109/cvpr.2016.90"
+    assert normalize_key("2101.00001v2") == "2101.00001"
+    assert normalize_key("MR26286") == "MR0026286"
+    assert normalize_key("pmid:271968") == "PMID:271968"
+
+
+def test_group_keys():
+    groups = group_keys(["10.1109/CVPR.2016.90", "MR26286", "10.1109/cvpr.2016.90", "MR0026286", "MR0026286", "2101.00001"])
+    assert groups == {
+        "doi": {"10.1109/cvpr.2016.90": ["10.1109/CVPR.2016.90", "10.1109/cvpr.2016.90"]},
+        "msc": {"MR0026286": ["MR26286", "MR0026286"]},
+        "arxiv": {"2101.00001": ["2101.00001"]},
+    }
+    assert group_keys(["arXiv:2101.00001v2", "2101.00001", "doi:10.1109/CVPR.2016.90"]) == {
+        "arxiv": {"2101.00001": ["arXiv:2101.00001v2", "2101.00001"]},
+        "doi": {"10.1109/cvpr.2016.90": ["doi:10.1109/CVPR.2016.90"]},
+    }
+
+
+def test_read_keys(tmp_path):
+    file = tmp_path / "keys.txt"
+    file.write_text("MR0026286, 10.1109/CVPR.2016.90\n# comment\n  math/0211159 # trailing comment\n")
+    assert list(read_keys(str(file))) == ["MR0026286", "10.1109/CVPR.2016.90", "math/0211159"]
@@ -0,0 +1,577 @@
+import asyncio
+import json
+import httpx
+import pytest
+from pybibget.bibentry import Bibget
+
+MSC_PAGE = """<html><head><title>MathSciNet</title></head><body><pre>@article {MR0026286,
+    AUTHOR = {Shannon, C. E.},
+     TITLE = {A mathematical theory of communication},
+   JOURNAL = {Bell System Tech. J.},
+    VOLUME = {27},
+      YEAR = {1948},
+     PAGES = {379--423, 623--656},
+}</pre></body></html>"""
+
+CROSSREF_BIBTEX = """@article{Sanger_1977, title={DNA sequencing with chain-terminating inhibitors}, volume={74},
+DOI={10.1073/pnas.74.12.5463}, number={12}, journal={Proceedings of the National Academy of Sciences},
+publisher={Proceedings of the National Academy of Sciences}, author={Sanger, F. and Nicklen, S. and Coulson, A. R.},
+year={1977}, month=dec, pages={5463--5467} }"""
+
+CROSSREF_ITEM = {"DOI": "10.1073/pnas.74.12.5463", "type": "journal-article", "title": ["DNA sequencing with chain-terminating inhibitors"],
+                 "volume": "74", "issue": "12", "page": "5463-5467", "publisher": "Proceedings of the National Academy of Sciences",
+                 "container-title": ["Proceedings of the National Academy of Sciences"], "ISSN": ["0027-8424", "1091-6490"],
+                 "published-print": {"date-parts": [[1977, 12]]},
+                 "author": [{"given": "F.", "family": "Sanger"}, {"given": "S.", "family": "Nicklen"}, {"given": "A. R.", "family": "Coulson"}]}
+
+
+def crossref_response(request):
+    if request.url.path != "/works":
+        return httpx.Response(200, text=CROSSREF_BIBTEX)
+    dois = [doi[4:] for doi in request.url.params["filter"].split(",")]
+    items = [CROSSREF_ITEM] if CROSSREF_ITEM["DOI"] in dois else []
+    return httpx.Response(200, json={"status": "ok", "message": {"items": items, "total-results": len(items), "next-cursor": "next"}})
+
+
+ARXIV_ENTRY = """<entry><id>http://arxiv.org/abs/{key}v1</id><published>2002-11-11T16:11:49Z</published>
+<title>Title of {key}</title><author><name>Perelman, Grisha</name></author>{doi}</entry>"""
+
+
+def arxiv_feed(keys):
+    entries = "".join(ARXIV_ENTRY.format(key=key, doi="<arxiv:doi>10.1073/pnas.74.12.5463</arxiv:doi>" if key == "2101.00002" else "") for key in keys if key != "2101.99999")
+    return f'<feed xmlns="http://www.w3.org/2005/Atom" xmlns:arxiv="http://arxiv.org/schemas/atom">{entries}</feed>'
+
+
+def mock_transport(requests):
+    def handler(request):
+        requests.append(request)
+        if request.url.host == "mathscinet.ams.org":
+            if "MR" in str(request.url):
+                return httpx.Response(200, text=MSC_PAGE)
+            return httpx.Response(200, text="<html><head><title>No results</title></head></html>")
+        if request.url.host == "api.crossref.org":
+            return crossref_response(request)
+        if request.url.host == "export.arxiv.org":
+            keys = [key.rsplit("v", 1)[0] if key[-2:-1] == "v" else key for key in request.url.params["id_list"].split(",")]
+            return httpx.Response(200, text=arxiv_feed(keys))
+        return httpx.Response(404, text="")
+    return httpx.MockTransport(handler)
+
+
+def test_shared_client():
+    requests = []
+
+    async def run():
+        async with Bibget(transport=mock_transport(requests)) as bibget:
+            client = bibget.client
+            bib_data = await bibget.citations(["MR0026286", "10.1073/pnas.74.12.5463"])
+            assert bibget.client is client
+        assert bibget._client is None
+        return bib_data
+
+    bib_data = asyncio.run(run())
+    assert set(bib_data.entries) == {"MR0026286", "10.1073/pnas.74.12.5463"}
+    assert bib_data.entries["10.1073/pnas.74.12.5463"].fields["volume"] == "74"
+    assert len(requests) == 3
+
+
+def test_cache(user_data_dir):
+    requests = []
+
+    async def run(keys, **options):
+        async with Bibget(transport=mock_transport(requests), **options) as bibget:
+            return await bibget.citations(keys)
+
+    keys = ["MR0026286", "10.1073/PNAS.74.12.5463"]
+    first = asyncio.run(run(keys))
+    assert len(requests) == 3
+    assert (user_data_dir / "cache.sqlite").exists()
+    second = asyncio.run(run(["MR0026286", "10.1073/pnas.74.12.5463"]))
+    assert len(requests) == 3
+    assert second.entries["MR0026286"].fields["title"] == first.entries["MR0026286"].fields["title"]
+    assert second.entries["10.1073/pnas.74.12.5463"].persons["author"][0].last_names == ["Sanger"]
+    asyncio.run(run(keys, refresh=True))
+    assert len(requests) == 6
+    asyncio.run(run(keys, cache=False))
+    assert len(requests) == 9
+
+
+def test_negative_cache():
+    async def run():
+        async with Bibget(transport=mock_transport([])) as bibget:
+            for _ in range(2):
+                try:
+                    await bibget.citation_msc(doi="10.1000/missing")
+                except ValueError as exc:
+                    error = str(exc)
+            return error, bibget.cache.get("mathscinet", "10.1000/missing")
+
+    error, cached = asyncio.run(run())
+    assert "not found on MathSciNet" in error
+    assert cached == (None, error)
+
+
+def test_cache_eviction(tmp_path):
+    from pybibget.cache import LookupCache
+    cache = LookupCache(str(tmp_path / "cache.sqlite"), max_entries=2, ttl={"arxiv": -1})
+    for key in ["a", "b", "c"]:
+        cache.set("crossref", key, value=key)
+    cache.get("crossref", "a")
+    cache.evict()
+    assert cache.get("crossref", "a") == ("a", None)
+    assert cache.get("crossref", "b") is None
+    cache.set("arxiv", "x", value="x")
+    assert cache.get("arxiv", "x") is None
+
+
+def test_coalescing():
+    requests = []
+
+    async def run():
+        async with Bibget(transport=mock_transport(requests), cache=False) as bibget:
+            results = await asyncio.gather(*[bibget.citation_msc(mrkey="MR0026286") for _ in range(5)])
+            return bibget.coalesced, results
+
+    coalesced, results = asyncio.run(run())
+    assert len(requests) == 1
+    assert coalesced == 4
+    assert len({id(entry) for entry in results}) == 5
+
+
+def test_arxiv_batch():
+    requests = []
+
+    async def run():
+        async with Bibget(transport=mock_transport(requests), cache=False, mathscinet=False) as bibget:
+            return await bibget.citations(["math/0211159", "2101.00001v2", "2101.00002", "2101.99999"])
+
+    bib_data = asyncio.run(run())
+    arxiv_requests = [request for request in requests if request.url.host == "export.arxiv.org"]
+    assert len(arxiv_requests) == 1
+    assert set(bib_data.entries) == {"math/0211159", "2101.00001v2", "2101.00002"}
+    assert bib_data.entries["math/0211159"].fields["note"] == "Preprint"
+    assert bib_data.entries["2101.00001v2"].fields["eprint"] == "2101.00001"
+    assert bib_data.entries["2101.00002"].fields["doi"] == "10.1073/pnas.74.12.5463"
+
+
+def test_arxiv_author_feeds(user_data_dir):
+    hosts = {"arxiv.org": {"rate": 100, "concurrency": 10}, "export.arxiv.org": {"rate": 100, "concurrency": 10}}
+    (user_data_dir / "config.json").write_text(json.dumps({"scopus_api_key": "", "scopus_rate_limit": 6, "hosts": hosts}))
+    requests = []
+    transport = mock_transport(requests)
+    looked_up = asyncio.Event()
+
+    async def author_feed(keys):
+        yield b'<feed xmlns="http://www.w3.org/2005/Atom">'
+        for key in keys:
+            yield f"<entry><id>http://arxiv.org/abs/{key}v2</id><title>Title</title></entry>".encode()
+            # the rest of the feed only arrives once the first article is being looked up
+            await asyncio.wait_for(looked_up.wait(), 5)
+        yield b"</feed>"
+
+    async def handler(request):
+        if request.url.path.endswith(".atom2"):
+            requests.append(request)
+            keys = {"/a/perelman_g_1.atom2": ["math/0211159", "2101.00001"], "/a/coauthor_a_1.atom2": ["2101.00001", "2101.00002"]}
+            if request.url.path not in keys:
+                return httpx.Response(404)
+            return httpx.Response(200, content=author_feed(keys[request.url.path]))
+        looked_up.set()
+        return transport.handle_request(request)
+
+    async def run():
+        async with Bibget(transport=httpx.MockTransport(handler), cache=False, mathscinet=False) as bibget:
+            authors = ["arxiv.org/a/perelman_g_1", "arxiv.org/a/coauthor_a_1", "arxiv.org/a/unknown_1"]
+            keys = [key async for key, _ in bibget.iter_citations(bibget.iter_arxiv_list(authors))]
+            return keys, await bibget.arxiv_list("arxiv.org/a/coauthor_a_1")
+
+    keys, arxiv_list = asyncio.run(run())
+    assert sorted(keys) == ["2101.00001", "2101.00002", "math/0211159"]
+    assert arxiv_list == ["2101.00001", "2101.00002"]
+
+
+@pytest.mark.parametrize("parse_pool", ["thread", "process"])
+def test_parse_pool(user_data_dir, parse_pool):
+    (user_data_dir / "config.json").write_text(json.dumps({"scopus_api_key": "", "scopus_rate_limit": 6, "parse_pool": parse_pool, "parse_workers": 2}))
+    requests = []
+
+    async def run():
+        async with Bibget(transport=mock_transport(requests), cache=False) as bibget:
+            bib_data = await bibget.citations(["MR0026286", "math/0211159", "2101.00001", "10.1073/pnas.74.12.5463", "10.1000/unknown"])
+            assert bibget.parse_pool.executor is not None
+            return bib_data
+
+    bib_data = asyncio.run(run())
+    assert set(bib_data.entries) == {"MR0026286", "math/0211159", "2101.00001", "10.1073/pnas.74.12.5463"}
+    assert bib_data.entries["MR0026286"].fields["journal"] == "Bell System Tech. J."
+    assert bib_data.entries["math/0211159"].persons["author"][0].last_names == ["Perelman"]
+    assert bib_data.entries["10.1073/pnas.74.12.5463"].fields["pages"] == "5463--5467"
+
+
+def test_crossref_batch():
+    from pybibget.bibentry import crossref_entry, parse_bibtex, sanitize_entry
+    items = [dict(CROSSREF_ITEM, DOI=f"10.1000/{i}", title=[f"Title {i}"]) for i in range(3)]
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        if request.url.path != "/works":
+            return httpx.Response(200, text=CROSSREF_BIBTEX)
+        if "10.1000/fail" in request.url.params["filter"]:
+            return httpx.Response(400, text="bad filter")
+        # two items per page, in a different order than requested
+        page = 0 if request.url.params["cursor"] == "*" else 1
+        return httpx.Response(200, json={"message": {"items": items[::-1][2 * page:2 * page + 2], "total-results": 3, "next-cursor": "page1"}})
+
+    async def run(dois):
+        async with Bibget(transport=httpx.MockTransport(handler), cache=False) as bibget:
+            return await asyncio.gather(*[bibget.citation_crossref(doi) for doi in dois], return_exceptions=True)
+
+    entries = asyncio.run(run(["10.1000/0", "10.1000/1", "10.1000/2", "10.1000/missing"]))
+    assert len(requests) == 2
+    assert [entry.fields["title"] for entry in entries[:3]] == ["{Title} 0", "{Title} 1", "{Title} 2"]
+    assert isinstance(entries[3], ValueError)
+    requests.clear()
+    entries = asyncio.run(run(["10.1000/fail"]))
+    assert [request.url.path for request in requests] == ["/works", "/v1/works/10.1000/fail/transform"]
+    assert entries[0].fields["volume"] == "74"
+    # same fields as the BibTeX transform
+    transform = sanitize_entry(list(parse_bibtex(CROSSREF_BIBTEX).entries.values())[0])
+    entry = crossref_entry(CROSSREF_ITEM)
+    for field in ["title", "volume", "number", "journal", "publisher", "year", "DOI"]:
+        assert entry.fields[field] == transform.fields[field]
+    assert entry.persons["author"] == transform.persons["author"]
+    assert entry.fields["pages"] == "5463--5467"
+
+
+def test_sanitize_bibliography():
+    from pybibget.bibentry import parse_bibtex, sanitize_bibliography, sanitize_string
+    bib_data = parse_bibtex("".join(f"@article{{a{i}, author = {{Gödel, Kurt}}, title = {{On formally undecidable propositions {i}}}}}\n" for i in range(3)))
+    sanitize_string.cache_clear()
+    assert sanitize_bibliography(bib_data) is bib_data
+    assert [entry.persons["author"][0].last_names for entry in bib_data.entries.values()] == [['G\\"odel']] * 3
+    assert bib_data.entries["a0"].fields["title"] == "{On} formally undecidable propositions 0"
+    # the author names are converted once
+    assert sanitize_string.cache_info().misses == 5
+
+
+def test_pubmed_batch():
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        if request.url.host == "pubmed.ncbi.nlm.nih.gov":
+            return httpx.Response(200, text=f"PMID- 271968\nAID - 10.1073/pnas.74.12.5463 [doi]\n")
+        if "666" in request.url.params["id"]:
+            return httpx.Response(200, text="<html>Service unavailable</html>")
+        result = {"uids": ["271968", "123456"],
+                  "271968": {"uid": "271968", "articleids": [{"idtype": "pubmed", "value": "271968"}, {"idtype": "doi", "value": "10.1073/pnas.74.12.5463"}]},
+                  "123456": {"uid": "123456", "articleids": [], "elocationid": "doi: 10.1000/elocation"},
+                  "999999": {"uid": "999999", "error": "cannot get document summary"}}
+        return httpx.Response(200, json={"result": result})
+
+    async def run(pmids):
+        async with Bibget(transport=httpx.MockTransport(handler), cache=False) as bibget:
+            return await asyncio.gather(*[bibget.get_doi(pmid=pmid) for pmid in pmids], return_exceptions=True)
+
+    dois = asyncio.run(run(["PMID:271968", "PMID:123456", "PMID:999999"]))
+    assert len(requests) == 1 and requests[0].url.params["id"] == "271968,123456,999999"
+    assert dois[:2] == ["10.1073/pnas.74.12.5463", "10.1000/elocation"]
+    assert isinstance(dois[2], ValueError)
+    requests.clear()
+    assert asyncio.run(run(["PMID:666666"])) == ["10.1073/pnas.74.12.5463"]
+    assert [request.url.host for request in requests] == ["eutils.ncbi.nlm.nih.gov", "pubmed.ncbi.nlm.nih.gov"]
+
+
+def test_retry_after():
+    responses = [httpx.Response(429, headers={"Retry-After": "0"}), httpx.Response(503, headers={"Retry-After": "0"}), httpx.Response(200, text=MSC_PAGE)]
+
+    def handler(request):
+        return responses.pop(0)
+
+    async def run():
+        async with Bibget(transport=httpx.MockTransport(handler), cache=False) as bibget:
+            entry = await bibget.citation_msc(mrkey="MR0026286")
+            return entry, bibget.rate_limiter["mathscinet.ams.org"]
+
+    entry, limiter = asyncio.run(run())
+    assert not responses
+    assert entry.fields["year"] == "1948"
+    assert limiter.rate < limiter.max_rate
+
+
+def test_throttle_spacing():
+    import time
+    from pybibget.ratelimit import HostLimiter
+
+    async def run():
+        limiter = HostLimiter("example.org", rate=100, concurrency=1)
+        for _ in range(60):
+            async with limiter:
+                pass
+        limiter.throttle()
+        start = time.monotonic()
+        times = []
+        for _ in range(6):
+            async with limiter:
+                times.append(time.monotonic() - start)
+            limiter.relax()
+        return times
+
+    times = asyncio.run(run())
+    # the earlier requests still count against the halved rate, 50/s: the next one waits about 11/50 s
+    assert times[0] > 0.15
+    assert times[-1] < 1
+
+
+def test_retries_exhausted():
+    def handler(request):
+        return httpx.Response(503, headers={"Retry-After": "0"})
+
+    async def run():
+        async with Bibget(transport=httpx.MockTransport(handler), cache=True) as bibget:
+            bibget.max_retries = 1
+            try:
+                await bibget.citation_msc(mrkey="MR0026286")
+            except httpx.HTTPStatusError:
+                return bibget.cache.get("mathscinet", "MR0026286")
+
+    assert asyncio.run(run()) is None
+
+
+def test_trace(tmp_path):
+    import json
+    from pybibget.trace import Tracer
+    tracer = Tracer()
+    keys = ["MR0026286", "10.1073/pnas.74.12.5463", "10.1073/PNAS.74.12.5463"]
+
+    async def run():
+        async with Bibget(transport=mock_transport([]), cache=False, tracer=tracer) as bibget:
+            return await bibget.citations(keys)
+
+    asyncio.run(run())
+    roots = {root.attributes["key"]: root for root in tracer.roots}
+    assert set(roots) == {"MR0026286", "10.1073/pnas.74.12.5463"}
+    doi = roots["10.1073/pnas.74.12.5463"]
+    assert [(child.name, child.status) for child in doi.children] == [("mathscinet", "not_found"), ("crossref", "ok")]
+    http = doi.children[1].children[0]
+    assert http.name == "http" and http.attributes["status"] == 200 and http.attributes["bytes"] > 0 and "limiter_wait" in http.attributes
+    stats = tracer.stats()
+    assert stats["backends"]["mathscinet"]["lookups"] == 2
+    assert stats["hosts"]["api.crossref.org"]["requests"] == 1
+    assert stats["paths"] == {"mathscinet:ok": 1, "mathscinet:not_found > crossref:ok": 1}
+    tracer.export(tmp_path / "trace.json")
+    spans = json.loads((tmp_path / "trace.json").read_text())["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    ids = {span["spanId"]: span for span in spans}
+    assert len(spans) == len(list(tracer.spans()))
+    assert all(span["parentSpanId"] in ids for span in spans if span["parentSpanId"])
+
+
+def test_hedged_doi():
+    import time
+    requests = []
+
+    def handler(delays, msc_page):
+        async def handle(request):
+            requests.append(request.url.host)
+            await asyncio.sleep(delays[request.url.host])
+            if request.url.host == "mathscinet.ams.org":
+                return httpx.Response(200, text=msc_page)
+            return crossref_response(request)
+        return handle
+
+    async def run(delays, msc_page, hedge):
+        async with Bibget(transport=httpx.MockTransport(handler(delays, msc_page)), cache=False, hedge=hedge) as bibget:
+            start = time.perf_counter()
+            entry = await bibget.citation_doi("10.1073/pnas.74.12.5463")
+            elapsed = time.perf_counter() - start
+            await asyncio.sleep(0.01)
+            return entry, elapsed, bibget.inflight
+
+    # MathSciNet fails slowly: Crossref is started after the hedge delay instead of after the failure
+    no_results = "<html><head><title>No results</title></head></html>"
+    entry, elapsed, _ = asyncio.run(run({"mathscinet.ams.org": 0.5, "api.crossref.org": 0.4}, no_results, hedge=0.05))
+    assert entry.fields["volume"] == "74"
+    assert requests == ["mathscinet.ams.org", "api.crossref.org"]
+    assert elapsed < 0.8
+    # MathSciNet has priority: its result is used and the slower Crossref lookup is cancelled
+    requests.clear()
+    entry, elapsed, inflight = asyncio.run(run({"mathscinet.ams.org": 0.1, "api.crossref.org": 2}, MSC_PAGE, hedge=0))
+    assert entry.fields["journal"] == "Bell System Tech. J."
+    assert requests == ["mathscinet.ams.org", "api.crossref.org"]
+    assert elapsed < 1 and not inflight
+
+
+def test_update_all_accept():
+    from pybtex.database import parse_string
+    bibliography = parse_string("""
+@article{shannon, author = {Shannon, C.}, title = {Communication}, doi = {10.1000/shannon}, eprint = {1234.5678}, archiveprefix = {arXiv}}
+@article{missing, author = {Doe, J.}, title = {Unknown}, doi = {10.1000/missing}}
+@article{mr, title = {Skipped}, mrnumber = {123}}
+""", 'bibtex').entries
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        if "shannon" in str(request.url):
+            return httpx.Response(200, text=MSC_PAGE)
+        return httpx.Response(200, text="<html><head><title>No results</title></head></html>")
+
+    async def run(mode):
+        async with Bibget(transport=httpx.MockTransport(handler), cache=False) as bibget:
+            return await bibget.update_all(bibliography, mode=mode)
+
+    updated = asyncio.run(run("accept")).entries
+    assert len(requests) == 2
+    assert updated["shannon"].fields["journal"] == "Bell System Tech. J."
+    assert updated["shannon"].fields["eprint"] == "1234.5678"
+    assert updated["missing"] is bibliography["missing"]
+    assert updated["mr"] is bibliography["mr"]
+    reported = asyncio.run(run("report")).entries
+    assert reported["shannon"] is bibliography["shannon"]
+
+
+def test_update_state(tmp_path):
+    from pybibget.bibfile import BibFile
+    from pybibget.state import UpdateState, state_file_name
+    bib_file = tmp_path / "references.bib"
+    bib_file.write_text("""
+@article{shannon, author = {Shannon, C.}, title = {Communication}, doi = {10.1000/shannon}}
+@article{missing, author = {Doe, J.}, title = {Unknown}, doi = {10.1000/missing}}
+""")
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        if "shannon" in str(request.url):
+            return httpx.Response(200, text=MSC_PAGE)
+        return httpx.Response(200, text="<html><head><title>No results</title></head></html>")
+
+    def run(**options):
+        state = UpdateState(state_file_name(str(bib_file)), **options)
+
+        async def update(bibliography):
+            async with Bibget(transport=httpx.MockTransport(handler), cache=False) as bibget:
+                return await bibget.update_file(bibliography, mode="accept", state=state)
+
+        with BibFile(str(bib_file)) as bibliography:
+            updates = asyncio.run(update(bibliography))
+            bibliography.write({key: entry for key, (entry, decision) in updates.items() if decision == "replaced"})
+        state.save()
+        return state
+
+    state = run()
+    assert len(requests) == 2
+    assert {key: record["decision"] for key, record in state.entries.items()} == {"shannon": "replaced", "missing": "unchanged"}
+    assert (tmp_path / ".references.bib.pybibupdate.json").exists()
+    run()
+    assert len(requests) == 2
+    bib_file.write_text(bib_file.read_text().replace("Unknown", "Changed"))
+    run()
+    assert len(requests) == 3
+    run(max_age=0)
+    assert len(requests) == 4  # the replaced entry has no DOI, and without Scopus only DOIs are looked up
+
+
+def test_update_state_network_errors(tmp_path):
+    from pybibget.bibfile import BibFile
+    from pybibget.state import UpdateState, state_file_name
+    bib_file = tmp_path / "references.bib"
+    bib_file.write_text("""
+@article{shannon, author = {Shannon, C.}, title = {Communication}, doi = {10.1000/shannon}}
+@article{nodoi, author = {Doe, J.}, title = {Unknown}}
+""")
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        raise httpx.ConnectError("Network is unreachable")
+
+    async def update(bibliography, state):
+        async with Bibget(transport=httpx.MockTransport(handler), cache=False) as bibget:
+            bibget.max_retries = 0
+            return await bibget.update_file(bibliography, mode="accept", state=state)
+
+    state = UpdateState(state_file_name(str(bib_file)))
+    with BibFile(str(bib_file)) as bibliography:
+        updates = asyncio.run(update(bibliography, state))
+        # neither entry was checked, so both are checked again next time
+        assert {key: decision for key, (entry, decision) in updates.items()} == {"shannon": "error", "nodoi": "unchecked"}
+        assert not state.is_current("shannon", bibliography.fingerprint("shannon"))
+        assert not state.is_current("nodoi", bibliography.fingerprint("nodoi"))
+    assert len(requests) == 1
+
+
+def test_stream_citations(tmp_path, monkeypatch):
+    import pybibget
+    monkeypatch.setattr("pybibget.bibentry.Bibget", lambda **options: Bibget(transport=mock_transport([]), **options))
+    file = tmp_path / "out.bib"
+    file.write_text("% existing\n")
+    assert pybibget.get_citations(["MR0026286", "2101.99999", "10.1073/pnas.74.12.5463"], file=str(file), stream=True) == 2
+    content = file.read_text()
+    assert content.startswith("% existing\n")
+    assert "@article{MR0026286," in content and "@article{10.1073/pnas.74.12.5463," in content
+
+
+def test_duplicate_keys():
+    requests = []
+
+    async def run():
+        async with Bibget(transport=mock_transport(requests), cache=False) as bibget:
+            return await bibget.citations(["MR0026286", "MR26286", " MR0026286"])
+
+    bib_data = asyncio.run(run())
+    assert len(requests) == 1
+    assert list(bib_data.entries) == ["MR0026286", "MR26286"]
+    assert bib_data.entries["MR0026286"] is not bib_data.entries["MR26286"]
+
+
+def test_prefixed_keys():
+    requests = []
+    keys = ["arXiv:2101.00001", "doi:10.1073/pnas.74.12.5463", "https://doi.org/10.1073/PNAS.74.12.5463"]
+
+    async def run():
+        async with Bibget(transport=mock_transport(requests), cache=False) as bibget:
+            async def stream():
+                for key in keys:
+                    yield key
+            return await bibget.citations(keys), [key async for key, _ in bibget.iter_citations(stream())]
+
+    bib_data, streamed = asyncio.run(run())
+    # prefixes are ignored for the lookup, but the entries keep the keys as cited
+    assert set(bib_data.entries) == set(streamed) == set(keys)
+    assert bib_data.entries["arXiv:2101.00001"].fields["eprint"] == "2101.00001"
+
+
+def test_doi_case(user_data_dir):
+    (user_data_dir / "config.json").write_text(json.dumps({"scopus_api_key": "key", "scopus_rate_limit": 6}))
+    abstract = {"abstracts-retrieval-response": {"coredata": {}, "item": {"bibrecord": {"head": {
+        "citation-title": "Deep residual learning", "author-group": {"author": {"preferred-name": {"ce:surname": "He", "ce:given-name": "K."}}},
+        "source": {"@type": "p", "publicationyear": {"@first": "2016"}, "publisher": {"publishername": "IEEE"}, "sourcetitle-abbrev": "CVPR"}}}}}}
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        if request.url.host == "api.elsevier.com":
+            return httpx.Response(200, json=abstract)
+        return httpx.Response(200, text="<html><head><title>No results</title></head></html>")
+
+    async def run():
+        async with Bibget(transport=httpx.MockTransport(handler), cache=False) as bibget:
+            entry, _ = await bibget.citation("doi:10.1109/CVPR.2016.90")
+            return entry
+
+    entry = asyncio.run(run())
+    # the DOI is looked up and reported as cited, not normalized to lower case
+    assert requests[-1].url.path == "/content/abstract/doi/10.1109/CVPR.2016.90"
+    assert entry.fields["doi"] == "10.1109/CVPR.2016.90"
+    assert entry.fields["url"] == "https://doi.org/10.1109/CVPR.2016.90"
+
+
+def test_sanitize_string():
+    from pybibget.bibentry import sanitize_string
+    sanitize_string.cache_clear()
+    assert sanitize_string("Schröder") == 'Schr\\"oder'
+    assert sanitize_string("Deep Residual\n Learning", title=True) == "{Deep} {Residual} {Learning}"
+    sanitize_string("Schröder")
+    assert sanitize_string.cache_info().hits == 1
@@ -0,0 +1,54 @@
+import os
+import json
+import time
+import asyncio
+import threading
+import pybibget
+from pybibget.client import DaemonClient, socket_path
+from pybibget.bibentry import Bibget
+from pybibget.server import Server
+from pybibget.tests.test_offline import mock_transport
+
+
+def test_daemon(tmp_path, capsys, monkeypatch, user_data_dir):
+    hosts = {"export.arxiv.org": {"rate": 100}}
+    (user_data_dir / "config.json").write_text(json.dumps({"scopus_api_key": "", "scopus_rate_limit": 6, "hosts": hosts}))
+    requests, local_requests = [], []
+    monkeypatch.setattr("pybibget.bibentry.Bibget", lambda **options: Bibget(transport=mock_transport(local_requests), **options))
+    server = Server(transport=mock_transport(requests), cache=False)
+    thread = threading.Thread(target=asyncio.run, args=(server.serve(),))
+    thread.start()
+    try:
+        for _ in range(100):
+            if os.path.exists(socket_path()):
+                break
+            time.sleep(0.05)
+        assert os.stat(socket_path()).st_mode & 0o777 == 0o600
+        with DaemonClient() as client:
+            assert client.ping() == os.getpid()
+            failures = {}
+            assert [key for key, _ in client.citations(["arXiv:2101.99999", "2101.99999v1", "invalid"], failures=failures)] == []
+            assert set(failures) == {"arXiv:2101.99999", "2101.99999v1", "invalid"}
+            assert "Invalid citation key" in failures["invalid"]
+
+        file = tmp_path / "references.bib"
+        assert pybibget.get_citations(["MR0026286", "2101.99999", "10.1073/pnas.74.12.5463"], file=str(file)) == 2
+        content = file.read_text()
+        assert "@article{MR0026286," in content and "@article{10.1073/pnas.74.12.5463," in content
+        number_of_requests = len(requests)
+
+        # answered from the memory of the daemon
+        assert pybibget.get_citations(["MR26286"], stream=True) == 1
+        assert "@article{MR26286," in capsys.readouterr().out
+        assert len(requests) == number_of_requests
+
+        # options which the daemon cannot honor are looked up locally
+        assert pybibget.get_citations(["MR0026286"], refresh=True, cache=False) == 1
+        assert len(requests) == number_of_requests and len(local_requests) == 1
+    finally:
+        with DaemonClient() as client:
+            client.shutdown()
+        thread.join(5)
+    assert not thread.is_alive()
+    assert not os.path.exists(socket_path())
+    assert pybibget.get_citations([], daemon=True) == 0
@@ -0,0 +1,111 @@
+import asyncio
+import gzip
+import json
+import sys
+import pytest
+from pybibget.bibentry import Bibget, entry_from_string
+from pybibget.store import MetadataStore, compress, decompress, detect_format, import_dump
+from pybibget.tests.test_offline import CROSSREF_ITEM, mock_transport
+
+ARXIV_RECORDS = [
+    {"id": "2101.00001", "submitter": "Grisha Perelman", "title": "The entropy formula\n  for the Ricci flow", "journal-ref": None, "doi": None,
+     "versions": [{"version": "v1", "created": "Mon, 11 Nov 2002 16:11:49 GMT"}], "authors_parsed": [["Perelman", "Grisha", ""]]},
+    {"id": "2101.00002", "submitter": "F. Sanger", "title": "DNA sequencing", "journal-ref": "PNAS 74", "doi": "10.1073/pnas.74.12.5463",
+     "versions": [{"version": "v1", "created": "Thu, 1 Dec 1977 00:00:00 GMT"}], "authors_parsed": [["Sanger", "F.", ""]]},
+]
+
+ARXIV_OAI = """<?xml version="1.0" encoding="UTF-8"?>
+<OAI-PMH xmlns="http://www.openarchives.org/OAI/2.0/"><ListRecords>
+<record><header><identifier>oai:arXiv.org:math/0211159</identifier></header><metadata>
+<arXiv xmlns="http://arxiv.org/OAI/arXiv/"><id>math/0211159</id><created>2002-11-11</created>
+<authors><author><keyname>Perelman</keyname><forenames>Grisha</forenames></author></authors>
+<title>The entropy formula for the Ricci flow and its geometric applications</title></arXiv>
+</metadata></record>
+</ListRecords></OAI-PMH>"""
+
+BIB = """@string{bstj = {Bell System Tech. J.}}
+@article{shannon48, author = {Shannon, C. E.}, title = {A mathematical theory of communication},
+  journal = {Bell System Tech. J.}, year = {1948}, mrnumber = {MR0026286}}
+"""
+
+
+def test_metadata_store(tmp_path):
+    bibtex = '@article{x,\n    title = "A title",\n    DOI = "10.1000/x"\n}\n'
+    assert decompress(compress(bibtex)) == bibtex
+    store = MetadataStore(str(tmp_path / "store.sqlite"))
+    store.add_many([(["10.1000/x", "2101.00001"], bibtex)])
+    store.add_many([(["2101.00001"], bibtex.replace("A title", "A new title"))])
+    assert len(store) == 1
+    assert "A new title" in store.get("10.1000/X")
+    assert store.get("arXiv:2101.00001v2") == store.get("10.1000/x")
+    assert store.get("10.1000/y") is None
+
+    crossref = tmp_path / "works.jsonl.gz"
+    with gzip.open(crossref, "wt") as file:
+        file.write(json.dumps({"items": [CROSSREF_ITEM, {"DOI": "10.1000/bad", "author": "not a list"}]}) + "\n")
+    assert detect_format(str(crossref)) == "crossref"
+    assert import_dump(store, str(crossref), workers=1) == (1, 1)
+    assert "chain-terminating" in store.get("10.1073/PNAS.74.12.5463")
+    store.close()
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_offline_lookups(tmp_path, workers):
+    arxiv = tmp_path / "arxiv-metadata-oai-snapshot.json"
+    arxiv.write_text("".join(json.dumps(record) + "\n" for record in ARXIV_RECORDS))
+    (tmp_path / "works.jsonl").write_text(json.dumps(CROSSREF_ITEM) + "\n")
+    (tmp_path / "oai.xml").write_text(ARXIV_OAI)
+    (tmp_path / "collection.bib").write_text(BIB)
+    requests = []
+
+    async def run():
+        async with Bibget(transport=mock_transport(requests), offline=True) as bibget:
+            for name in ["arxiv-metadata-oai-snapshot.json", "works.jsonl", "oai.xml", "collection.bib"]:
+                assert bibget.import_metadata(str(tmp_path / name), workers=workers) == (len(ARXIV_RECORDS) if name.startswith("arxiv") else 1, 0)
+            return await bibget.citations(["2101.00001", "2101.00002v1", "math/0211159", "MR26286", "10.1073/pnas.74.12.5463", "10.1000/missing"])
+
+    bib_data = asyncio.run(run())
+    assert not requests
+    assert set(bib_data.entries) == {"2101.00001", "2101.00002v1", "math/0211159", "MR26286", "10.1073/pnas.74.12.5463"}
+    assert bib_data.entries["2101.00001"].fields["year"] == "2002"
+    assert bib_data.entries["2101.00001"].fields["eprint"] == "2101.00001"
+    # the published version answers the preprint
+    assert bib_data.entries["2101.00002v1"].fields["volume"] == "74"
+    assert bib_data.entries["2101.00002v1"].fields["eprint"] == "2101.00002"
+    assert "{Ricci} flow" in bib_data.entries["math/0211159"].fields["title"]
+    assert bib_data.entries["MR26286"].fields["journal"] == "Bell System Tech. J."
+
+
+def test_import_command(tmp_path, user_data_dir, monkeypatch, capsys):
+    import pybibget
+    (tmp_path / "collection.bib").write_text(BIB)
+    monkeypatch.setattr(sys, "argv", ["pybibget", "import", str(tmp_path / "collection.bib"), "--workers", "1"])
+    pybibget.pybibget()
+    assert "Imported 1 records" in capsys.readouterr().out
+    assert (user_data_dir / "store.sqlite").exists()
+
+
+def test_string_macros(tmp_path, monkeypatch):
+    (tmp_path / "collection.bib").write_text("@string{bstj = {Bell Syst. Tech. J.}}\n"
+                                             "@article{shannon48, title = {Communication}, journal = bstj, mrnumber = {MR0026286}}\n"
+                                             "@article{doe, title = {Unknown}, journal = undefined, doi = {10.1000/doe}}\n")
+    entry = "@article{shannon, author = {Shannon, C.}, title = {Communication}, doi = {10.1000/shannon}}"
+    requests = []
+
+    async def run():
+        async with Bibget(transport=mock_transport(requests), offline=True) as bibget:
+            # the entry using an undefined macro cannot be imported
+            assert bibget.import_metadata(str(tmp_path / "collection.bib"), workers=1) == (1, 1)
+            bib_data = await bibget.citations(["MR0026286"])
+            # pybibupdate --offline does not ask for a Scopus API key
+            updates = await bibget.update_entries({"shannon": entry_from_string(entry)}, mode="interactive")
+        return bib_data, updates
+
+    def prompt(*args):
+        raise AssertionError("prompted for input")
+
+    monkeypatch.setattr("builtins.input", prompt)
+    bib_data, updates = asyncio.run(run())
+    assert not requests
+    assert bib_data.entries["MR0026286"].fields["journal"] == "Bell Syst. Tech. J."
+    assert updates["shannon"][1] == "error"
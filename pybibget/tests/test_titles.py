@@ -0,0 +1,83 @@
+import asyncio
+import json
+import httpx
+import pytest
+from pybibget.bibentry import Bibget, parse_bibtex
+from pybibget.titles import TitleIndex, normalize_title, title_similarity
+from pybibget.tests.test_offline import MSC_PAGE, mock_transport
+
+
+def test_title_index(tmp_path):
+    assert normalize_title("On the  Théorie of: Graphs!") == "on the theorie of graphs"
+    assert title_similarity("A mathematical theory of communication", "A Mathematical Theory of Communication.") == 1.0
+    assert title_similarity("A mathematical theory of communication", "Deep residual learning") < 0.2
+
+    index = TitleIndex(str(tmp_path / "titles.sqlite"))
+    index.add("A mathematical theory of communication", "@article{shannon}")
+    index.add("A mathematical theory of computation", "@article{mccarthy}")
+    index.add("DNA sequencing with chain-terminating inhibitors", "@article{sanger}")
+    index.add("DNA sequencing with chain-terminating inhibitors", "@article{sanger2}")
+    assert len(index) == 3
+    assert index.find("A Mathematical Theory of Communication") == ("@article{shannon}", 1.0)
+    bibtex, similarity = index.find("A mathematical theory of communications")
+    assert bibtex == "@article{shannon}" and 0.8 < similarity < 1
+    assert index.find("DNA sequencing with chain terminating inhibitors")[0] == "@article{sanger2}"
+    assert index.find("A mathematical theory of communication networks", threshold=0.95) is None
+    assert index.find("Something else entirely") is None
+    assert index.find("A Mathematical Theory of Communication", exclude_key="shannon") is None
+    assert index.find("A mathematical theory of communications", exclude_key="shannon") is None
+    index.close()
+    assert len(TitleIndex(str(tmp_path / "titles.sqlite"))) == 3
+
+
+def test_update_uses_title_index(user_data_dir):
+    (user_data_dir / "config.json").write_text(json.dumps({"scopus_api_key": "key", "scopus_rate_limit": 6}))
+    requests = []
+
+    async def run():
+        async with Bibget(transport=mock_transport(requests)) as bibget:
+            await bibget.citations(["10.1073/pnas.74.12.5463"])
+            requests.clear()
+            entries = parse_bibtex("@article{sanger, title = {{DNA} Sequencing with Chain Terminating Inhibitors}}").entries
+            return await bibget.update_all(entries, mode="accept")
+
+    updated = asyncio.run(run()).entries
+    assert updated["sanger"].fields["doi"] == "10.1073/pnas.74.12.5463"
+    assert all(request.url.host != "api.elsevier.com" for request in requests)
+
+
+def test_update_does_not_match_itself(tmp_path):
+    bib_file = tmp_path / "references.bib"
+    bib_file.write_text("@article{sanger, title = {{DNA} Sequencing with Chain Terminating Inhibitors}}\n")
+    requests = []
+
+    async def run():
+        async with Bibget(transport=mock_transport(requests)) as bibget:
+            assert bibget.import_titles(str(bib_file)) == 1
+            return await bibget.update_entries(parse_bibtex(bib_file.read_text()).entries, mode="accept")
+
+    assert asyncio.run(run())["sanger"][1] == "unchecked"
+
+
+def test_lookup_scopus_most_similar(user_data_dir):
+    (user_data_dir / "config.json").write_text(json.dumps({"scopus_api_key": "key", "scopus_rate_limit": 6}))
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        if request.url.host == "api.elsevier.com":
+            return httpx.Response(200, json={"search-results": {"entry": [
+                {"dc:title": "A note on communication", "prism:doi": "10.1000/note"},
+                {"dc:title": "A mathematical theory of communication", "prism:doi": "10.1000/shannon"}]}})
+        if "shannon" in str(request.url):
+            return httpx.Response(200, text=MSC_PAGE)
+        return httpx.Response(200, text="<html><head><title>No results</title></head></html>")
+
+    async def run(title):
+        async with Bibget(transport=httpx.MockTransport(handler), cache=False) as bibget:
+            return await bibget.lookup_title(title)
+
+    entry, similarity = asyncio.run(run("A Mathematical Theory of Communication"))
+    assert entry.fields["journal"] == "Bell System Tech. J." and similarity == 1.0
+    with pytest.raises(ValueError, match="similarity"):
+        asyncio.run(run("Deep residual learning for image recognition"))
@@ -0,0 +1,144 @@
+import os
+import re
+import sqlite3
+import hashlib
+import unicodedata
+import logging as log
+
+NUM_PERM = 32
+BANDS = 16  # of NUM_PERM // BANDS rows each: titles with similarity 0.5 are found with probability 0.9997
+PRIME = (1 << 61) - 1
+# fixed random permutations (a * h + b) mod PRIME of the shingle hashes
+PERMUTATIONS = [(int.from_bytes(hashlib.blake2b(b"a%d" % i, digest_size=8).digest(), "big") % PRIME | 1,
+                 int.from_bytes(hashlib.blake2b(b"b%d" % i, digest_size=8).digest(), "big") % PRIME) for i in range(NUM_PERM)]
+DEFAULT_THRESHOLD = 0.8
+BIBTEX_KEY = re.compile(r"\s*@\w+\s*[{(]\s*([^,\s{}()]*)")
+
+
+def normalize_title(title):
+    """
+    Normalize a (plain text) title for matching: strips accents, case, punctuation and repeated whitespace.
+    """
+    title = unicodedata.normalize("NFKD", title)
+    title = "".join(char for char in title if not unicodedata.combining(char)).lower()
+    return " ".join(re.findall(r"[^\W_]+", title))
+
+
+def shingles(normalized):
+    """
+    The set of character 3-grams of a normalized title.
+    """
+    padded = f" {normalized} "
+    return {padded[i:i + 3] for i in range(max(1, len(padded) - 2))}
+
+
+def title_similarity(title1, title2):
+    """
+    Jaccard similarity (between 0 and 1) of the 3-grams of two plain text titles.
+    """
+    shingles1, shingles2 = shingles(normalize_title(title1)), shingles(normalize_title(title2))
+    return len(shingles1 & shingles2) / len(shingles1 | shingles2)
+
+
+def minhash(shingle_set):
+    """
+    MinHash signature of a set of shingles.
+    """
+    hashes = [int.from_bytes(hashlib.blake2b(shingle.encode(), digest_size=8).digest(), "big") for shingle in shingle_set]
+    return [min((a * h + b) % PRIME for h in hashes) for a, b in PERMUTATIONS]
+
+
+def band_hashes(signature):
+    """
+    Locality sensitive hashes of a MinHash signature, one per band.
+    """
+    rows = NUM_PERM // BANDS
+    return [int.from_bytes(hashlib.blake2b(repr(signature[band * rows:(band + 1) * rows]).encode(), digest_size=8).digest(), "big", signed=True)
+            for band in range(BANDS)]
+
+
+class TitleIndex():
+    """
+    Persistent SQLite index of the titles of known bibentries, for fuzzy title matching.
+
+    Titles are compared by the Jaccard similarity of their character 3-grams. Candidates are found by locality sensitive
+    hashing of MinHash signatures, so that lookups do not scan the whole index.
+
+    Parameters
+    ----------
+    path : str
+        Location of the SQLite database.
+    """
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.db = sqlite3.connect(path, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("""CREATE TABLE IF NOT EXISTS titles (
+            id INTEGER PRIMARY KEY,
+            normalized TEXT NOT NULL UNIQUE,
+            title TEXT NOT NULL,
+            bibtex TEXT NOT NULL,
+            source TEXT)""")
+        self.db.execute("CREATE TABLE IF NOT EXISTS bands (band INTEGER NOT NULL, hash INTEGER NOT NULL, title_id INTEGER NOT NULL)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS bands_hash ON bands (band, hash)")
+
+    def add(self, title, bibtex, source=None):
+        """
+        Add (or replace) the bibentry with the given plain text title, serialized as BibTeX string.
+        """
+        normalized = normalize_title(title)
+        if not normalized:
+            return
+        self.db.execute("BEGIN")
+        try:
+            row = self.db.execute("SELECT id FROM titles WHERE normalized = ?", (normalized,)).fetchone()
+            if row is not None:
+                self.db.execute("UPDATE titles SET title = ?, bibtex = ?, source = ? WHERE id = ?", (title, bibtex, source, row[0]))
+            else:
+                title_id = self.db.execute("INSERT INTO titles (normalized, title, bibtex, source) VALUES (?, ?, ?, ?)", (normalized, title, bibtex, source)).lastrowid
+                self.db.executemany("INSERT INTO bands VALUES (?, ?, ?)", [(band, value, title_id) for band, value in enumerate(band_hashes(minhash(shingles(normalized))))])
+            self.db.execute("COMMIT")
+        except BaseException:
+            self.db.execute("ROLLBACK")
+            raise
+
+    def find(self, title, threshold=DEFAULT_THRESHOLD, exclude_key=None):
+        """
+        Find the indexed bibentry whose title is most similar to title. Entries with the citation key exclude_key are
+        skipped, so that an entry is not matched to itself when its own .bib file was indexed.
+
+        Returns
+        ---------
+        match : tuple or None
+            (bibtex, similarity) of the best match, or None if no indexed title has at least the given similarity.
+        """
+        normalized = normalize_title(title)
+        if not normalized:
+            return None
+        def excluded(bibtex):
+            return exclude_key is not None and (match := BIBTEX_KEY.match(bibtex)) is not None and match.group(1) == exclude_key
+
+        row = self.db.execute("SELECT bibtex FROM titles WHERE normalized = ?", (normalized,)).fetchone()
+        if row is not None and not excluded(row[0]):
+            return row[0], 1.0
+        query = shingles(normalized)
+        conditions = " OR ".join(["(band = ? AND hash = ?)"] * BANDS)
+        values = [x for pair in enumerate(band_hashes(minhash(query))) for x in pair]
+        candidates = self.db.execute(f"SELECT normalized, bibtex FROM titles WHERE id IN (SELECT title_id FROM bands WHERE {conditions})", values).fetchall()
+        best = None
+        for candidate, bibtex in candidates:
+            if excluded(bibtex):
+                continue
+            other = shingles(candidate)
+            similarity = len(query & other) / len(query | other)
+            if similarity >= threshold and (best is None or similarity > best[1]):
+                best = bibtex, similarity
+        log.debug(f'"{title}": {len(candidates)} candidates in the title index, best similarity {best[1] if best else 0:.2f}')
+        return best
+
+    def __len__(self):
+        return self.db.execute("SELECT COUNT(*) FROM titles").fetchone()[0]
+
+    def close(self):
+        self.db.close()
@@ -0,0 +1,230 @@
+import os
+import sys
+import json
+import time
+import contextvars
+from collections import Counter, defaultdict
+
+CURRENT_SPAN = contextvars.ContextVar("pybibget_span", default=None)
+
+
+class Span():
+    """
+    A timed step of a lookup, e.g. a citation key, a backend lookup, an HTTP request or parsing a response.
+
+    Spans opened while another span is open (in the same task, or in a task created inside it) become its children,
+    so each citation key gets a tree covering its fallback chain.
+    """
+    __slots__ = ("name", "attributes", "parent", "children", "span_id", "trace_id", "start", "end", "status")
+
+    def __init__(self, name, parent=None, **attributes):
+        self.name = name
+        self.attributes = attributes
+        self.parent = parent
+        self.children = []
+        self.span_id = os.urandom(8).hex()
+        self.trace_id = parent.trace_id if parent else os.urandom(16).hex()
+        self.start = time.time_ns()
+        self.end = None
+        self.status = "ok"
+
+    def set(self, **attributes):
+        """
+        Set attributes of the span.
+        """
+        self.attributes.update(attributes)
+
+    def add(self, name, value):
+        """
+        Add value to the numeric attribute name.
+        """
+        self.attributes[name] = self.attributes.get(name, 0) + value
+
+    @property
+    def duration(self):
+        """
+        Duration in seconds (up to now if the span is still open).
+        """
+        return ((self.end or time.time_ns()) - self.start) / 1e9
+
+    def walk(self):
+        yield self
+        for child in self.children:
+            yield from child.walk()
+
+
+class NullSpan():
+    """
+    Stand-in for Span when tracing is disabled.
+    """
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def set(self, **attributes):
+        pass
+
+    def add(self, name, value):
+        pass
+
+
+NULL_SPAN = NullSpan()
+
+
+class SpanContext():
+    def __init__(self, tracer, name, attributes):
+        self.tracer = tracer
+        self.name = name
+        self.attributes = attributes
+
+    def __enter__(self):
+        parent = CURRENT_SPAN.get()
+        self.span = Span(self.name, parent, **self.attributes)
+        (parent.children if parent else self.tracer.roots).append(self.span)
+        self.token = CURRENT_SPAN.set(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc, traceback):
+        span = self.span
+        span.end = time.time_ns()
+        if exc_type is not None:
+            # backends signal a missing entry with ValueError
+            span.status = "not_found" if issubclass(exc_type, ValueError) else "cancelled" if exc_type.__name__ == "CancelledError" else "error"
+            span.attributes.setdefault("error", str(exc) or exc_type.__name__)
+        try:
+            CURRENT_SPAN.reset(self.token)
+        except ValueError:
+            # exited in another context than entered, e.g. by a generator closed from elsewhere
+            CURRENT_SPAN.set(span.parent)
+        return False
+
+
+class Tracer():
+    """
+    Records Spans of a Bibget run, summarizes them (stats()) and exports them as OTLP/JSON (export()).
+
+    Usage:
+
+        tracer = Tracer()
+        async with Bibget(tracer=tracer) as bibget:
+            await bibget.citations(keys)
+        tracer.print_stats()
+        tracer.export("trace.json")
+    """
+    def __init__(self):
+        self.roots = []
+        self.start = time.time_ns()
+
+    def span(self, name, **attributes):
+        """
+        Context manager opening a child span of the current span (or a new root span).
+        """
+        return SpanContext(self, name, attributes)
+
+    def spans(self):
+        for root in self.roots:
+            yield from root.walk()
+
+    def stats(self):
+        """
+        Summarize the recorded spans.
+
+        Returns
+        ---------
+        stats : dict
+            Dictionary with the keys
+              - "seconds": wall time since the tracer was created,
+              - "backends": {backend: {"lookups", "found", "not_found", "errors", "cache_hits", "coalesced", "seconds", "p50", "max"}},
+              - "hosts": {host: {"requests", "attempts", "bytes", "seconds", "limiter_wait"}},
+              - "parse": {"count", "seconds"},
+              - "paths": {resolution path: number of citation keys or updated entries}, e.g. "mathscinet:not_found > crossref:ok".
+        """
+        backends = defaultdict(lambda: {"lookups": 0, "found": 0, "not_found": 0, "errors": 0, "cache_hits": 0, "coalesced": 0, "durations": []})
+        hosts = defaultdict(lambda: {"requests": 0, "attempts": 0, "bytes": 0, "seconds": 0.0, "limiter_wait": 0.0})
+        parse = {"count": 0, "seconds": 0.0}
+        paths = Counter()
+        for span in self.spans():
+            if "backend" in span.attributes:
+                backend = backends[span.attributes["backend"]]
+                backend["lookups"] += 1
+                backend["found" if span.status == "ok" else "not_found" if span.status == "not_found" else "errors"] += 1
+                backend["cache_hits"] += span.attributes.get("cache") == "hit"
+                backend["coalesced"] += bool(span.attributes.get("coalesced"))
+                backend["durations"].append(span.duration)
+            elif span.name == "http":
+                host = hosts[span.attributes.get("host")]
+                host["requests"] += 1
+                host["attempts"] += span.attributes.get("attempts", 0)
+                host["bytes"] += span.attributes.get("bytes", 0)
+                host["seconds"] += span.duration
+                host["limiter_wait"] += span.attributes.get("limiter_wait", 0.0)
+            elif span.name == "parse":
+                parse["count"] += 1
+                parse["seconds"] += span.duration
+            if span.parent is None and span.name in ("citation", "update"):
+                path = [f"{child.attributes['backend']}:{child.status}" for child in span.children if "backend" in child.attributes]
+                paths[" > ".join(path) or span.status] += 1
+        for backend in backends.values():
+            durations = sorted(backend.pop("durations"))
+            backend["seconds"] = sum(durations)
+            backend["p50"] = durations[len(durations) // 2] if durations else 0.0
+            backend["max"] = durations[-1] if durations else 0.0
+        return {"seconds": (time.time_ns() - self.start) / 1e9, "backends": dict(backends), "hosts": dict(hosts), "parse": parse, "paths": dict(paths)}
+
+    def print_stats(self, file=sys.stderr):
+        """
+        Print stats() as tables.
+        """
+        stats = self.stats()
+        print(f"\n{'backend':<12} {'lookups':>8} {'found':>6} {'missing':>8} {'errors':>7} {'cached':>7} {'shared':>7} {'p50 s':>7} {'max s':>7}", file=file)
+        for name, backend in sorted(stats["backends"].items()):
+            print(f"{name:<12} {backend['lookups']:>8} {backend['found']:>6} {backend['not_found']:>8} {backend['errors']:>7} {backend['cache_hits']:>7} "
+                  f"{backend['coalesced']:>7} {backend['p50']:>7.2f} {backend['max']:>7.2f}", file=file)
+        print(f"\n{'host':<26} {'requests':>8} {'retries':>8} {'kB':>9} {'http s':>8} {'wait s':>8}", file=file)
+        for name, host in sorted(stats["hosts"].items()):
+            print(f"{name:<26} {host['requests']:>8} {host['attempts'] - host['requests']:>8} {host['bytes'] / 1000:>9.1f} {host['seconds']:>8.2f} "
+                  f"{host['limiter_wait']:>8.2f}", file=file)
+        if stats["paths"]:
+            print(f"\n{'keys':>6}  resolution path", file=file)
+            for path, count in sorted(stats["paths"].items(), key=lambda item: -item[1]):
+                print(f"{count:>6}  {path}", file=file)
+        print(f"\nParsed {stats['parse']['count']} responses in {stats['parse']['seconds']:.2f}s, total time {stats['seconds']:.2f}s", file=file)
+
+    def export(self, file_name):
+        """
+        Write the recorded spans to file_name in the OTLP/JSON trace format (one resource, one scope).
+        """
+        spans = []
+        for span in self.spans():
+            spans.append({
+                "traceId": span.trace_id,
+                "spanId": span.span_id,
+                "parentSpanId": span.parent.span_id if span.parent else "",
+                "name": span.name,
+                "kind": 3 if span.name == "http" else 1,
+                "startTimeUnixNano": str(span.start),
+                "endTimeUnixNano": str(span.end or time.time_ns()),
+                "attributes": [{"key": key, "value": otlp_value(value)} for key, value in span.attributes.items()],
+                "status": {"code": 1} if span.status == "ok" else {"code": 2, "message": span.status},
+            })
+        trace = {"resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": "pybibget"}}]},
+            "scopeSpans": [{"scope": {"name": "pybibget"}, "spans": spans}],
+        }]}
+        with open(file_name, "w") as file:
+            json.dump(trace, file)
+
+
+def otlp_value(value):
+    """
+    Encode an attribute value as OTLP/JSON AnyValue.
+    """
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
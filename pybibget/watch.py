@@ -0,0 +1,136 @@
+import os
+import sys
+import asyncio
+import importlib.util
+import logging as log
+from pybibget.blg import scan_blg, resolve_bib_file
+from pybibget.keys import normalize_key
+
+DEFAULT_INTERVAL = 1.0
+
+
+def file_state(path):
+    try:
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+    except FileNotFoundError:
+        return None
+
+
+async def changes(paths, interval=DEFAULT_INTERVAL):
+    """
+    Yield the set of files among paths which changed, once at the start (all files) and then whenever some changed.
+
+    Uses inotify (through the optional inotify_simple package) to watch the directories of the files, so that files
+    which are replaced instead of rewritten are followed, and otherwise polls the modification time and size of the
+    files every interval seconds.
+    """
+    paths = [os.path.abspath(path) for path in paths]
+    states = {path: file_state(path) for path in paths}
+    yield set(paths)
+    if importlib.util.find_spec("inotify_simple") is not None:
+        from inotify_simple import INotify, flags
+        inotify = INotify()
+        for directory in {os.path.dirname(path) for path in paths}:
+            inotify.add_watch(directory, flags.CLOSE_WRITE | flags.MOVED_TO | flags.CREATE)
+        event = asyncio.Event()
+
+        def read_events():
+            # the reader is called as long as there are unread events
+            inotify.read(timeout=0)
+            event.set()
+
+        loop = asyncio.get_running_loop()
+        loop.add_reader(inotify.fileno(), read_events)
+        try:
+            while True:
+                await event.wait()
+                # a single compile writes a file several times
+                await asyncio.sleep(interval / 10)
+                event.clear()
+                changed = {path for path in paths if file_state(path) != states[path]}
+                states.update({path: file_state(path) for path in changed})
+                if changed:
+                    yield changed
+        finally:
+            loop.remove_reader(inotify.fileno())
+            inotify.close()
+    log.debug(f"inotify_simple is not installed, polling every {interval:g}s")
+    while True:
+        await asyncio.sleep(interval)
+        changed = {path for path in paths if file_state(path) != states[path]}
+        states.update({path: file_state(path) for path in changed})
+        if changed:
+            yield changed
+
+
+async def watch(base_file_name, file=None, interval=DEFAULT_INTERVAL, **options):
+    """
+    Follow the .blg and .aux files of a LaTeX document, and look up each citation key as soon as it is reported missing.
+
+    Whenever one of the files changes, the .blg file is scanned again (see scan_blg()). Only keys which were not
+    reported before (up to normalization, see normalize_key()) are looked up, while earlier lookups may still be
+    running; keys which were not found, or are no longer reported, are looked up again when reported again. Entries are appended to file (or written to stdout) as soon as they are found. Keys which file already
+    answers are handled as by pybibget.local_citations(). Runs until cancelled.
+
+    Parameters
+    ----------
+    base_file_name : str
+        The LaTeX document without extension.
+    file : str, optional
+        The .bib file to append to. The default is None, which writes to stdout, or, if "auto", the first .bib file
+        found in the .blg file (see resolve_bib_file()).
+    interval : float, optional
+        Polling interval in seconds if inotify is not available. The default is 1.
+    **options
+        Keyword arguments for Bibget.
+    """
+    from pybibget import local_citations
+    from pybibget.bibentry import Bibget, entry_to_string
+    seen = set()
+    failures = {}
+
+    def append(entries):
+        obj = open(file, 'a') if file else sys.stdout
+        try:
+            for key, entry in entries:
+                obj.write("\n" + entry_to_string(entry, key))
+            obj.flush()
+        finally:
+            if file:
+                obj.close()
+
+    async def missing_keys():
+        nonlocal file
+        async for _ in changes([base_file_name + ".blg", base_file_name + ".aux"], interval):
+            try:
+                with open(base_file_name + ".blg") as blg:
+                    missing_cites, bib_file_names = scan_blg(blg.read())
+            except FileNotFoundError:
+                continue
+            if file == "auto":
+                if not bib_file_names:
+                    continue
+                file = resolve_bib_file(bib_file_names[0], base_file_name + ".blg")
+                log.info(f"Appending to {file}")
+            seen.intersection_update(normalize_key(key) for key in missing_cites)
+            while failures:
+                seen.discard(normalize_key(failures.popitem()[0]))
+            keys = []
+            for key in missing_cites:
+                if (identifier := normalize_key(key)) not in seen:
+                    seen.add(identifier)
+                    keys.append(key)
+            if not keys:
+                continue
+            log.info(f"New missing citations: {', '.join(keys)}")
+            if file and os.path.exists(file):
+                keys, local = local_citations(keys, file)
+                append(local.items())
+            for key in keys:
+                yield key
+
+    async with Bibget(mathscinet=True, interactive=False, **options) as bibget:
+        async for key, entry in bibget.iter_citations(missing_keys(), failures):
+            append([(key, entry)])
+            print(f"{key}: Appended to {file}" if file else f"{key}: Found", file=sys.stderr)
@@ -0,0 +1,106 @@
+import os
+import asyncio
+import itertools
+import logging as log
+from pybibget.batch import Batcher
+
+POOL_KINDS = ("inline", "thread", "process")
+
+
+def run_jobs(jobs):
+    """
+    Run a batch of (function, args) jobs in a worker. Returns a list of (True, result) or (False, exception) pairs.
+    """
+    results = []
+    for function, args in jobs:
+        try:
+            results.append((True, function(*args)))
+        except Exception as exc:
+            results.append((False, exc))
+    return results
+
+
+class ParsePool():
+    """
+    Runs CPU-bound parse and sanitize jobs off the event loop, in a thread or process pool.
+
+    Jobs submitted within delay seconds of each other are handed to a worker together (see pybibget.batch.Batcher), up
+    to batch_size jobs per round-trip, so that many small jobs do not pay for one round-trip each while large runs still
+    spread over all workers. Only a process pool uses several cores for pure Python parsers (pybtex, pylatexenc); its
+    jobs must be module level functions with picklable arguments and results.
+
+    Parameters
+    ----------
+    kind : str, optional
+        "inline" (run jobs directly on the event loop), "thread" or "process". The default is "inline".
+    workers : int, optional
+        Number of workers. The default is the number of CPUs.
+    batch_size : int, optional
+        Maximal number of jobs per round-trip. The default is 16.
+    delay : float, optional
+        Time in seconds to wait for further jobs before handing a batch to a worker. The default is 0.002.
+    """
+    def __init__(self, kind="inline", workers=None, batch_size=16, delay=0.002):
+        if kind not in POOL_KINDS:
+            raise ValueError(f"Unknown parse pool {kind!r}, must be one of {', '.join(POOL_KINDS)}")
+        self.kind = kind
+        self.workers = workers or os.cpu_count() or 1
+        self.executor = None
+        self.jobs = {}
+        self.ids = itertools.count()
+        self.batcher = Batcher(self.run_batch, max_size=batch_size, delay=delay)
+
+    async def run(self, function, *args):
+        """
+        Run function(*args) in the pool and return its result (or raise its exception).
+        """
+        if self.kind == "inline":
+            return function(*args)
+        job = next(self.ids)
+        self.jobs[job] = (function, args)
+        ok, result = await self.batcher.get(job)
+        if not ok:
+            raise result
+        return result
+
+    async def run_batch(self, job_ids):
+        jobs = [self.jobs.pop(job) for job in job_ids]
+        if self.executor is None:
+            from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+            log.debug(f"Starting {self.workers} {self.kind} workers for parsing")
+            self.executor = (ProcessPoolExecutor if self.kind == "process" else ThreadPoolExecutor)(self.workers)
+        results = await asyncio.get_running_loop().run_in_executor(self.executor, run_jobs, jobs)
+        return dict(zip(job_ids, results))
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+
+def imap_bounded(function, arguments, workers=None):
+    """
+    Yield function(*args) for each tuple args of the iterable arguments, in order, computed in a process pool.
+
+    At most two calls per worker are pending at any time, so that arguments can be a stream of any length (unlike
+    Executor.map(), which submits all of them at once). With workers=1 the calls are made in this process.
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        for args in arguments:
+            yield function(*args)
+        return
+    from collections import deque
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(workers) as executor:
+        pending = deque()
+        try:
+            for args in arguments:
+                pending.append(executor.submit(function, *args))
+                if len(pending) >= 2 * workers:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()